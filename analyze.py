@@ -0,0 +1,53 @@
+import json
+import sys
+
+from src.analytics import (analyze_cohort, np, DEFAULT_GRANULARITY, DEFAULT_DEPTH_POINTS)
+
+
+def parse_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Aggregate statistics over recorded .y86t trace files')
+    parser.add_argument('paths', nargs='+',
+                        help='trace files or directories (searched recursively)')
+    parser.add_argument('--granularity', type=int, default=DEFAULT_GRANULARITY,
+                        help='bytes per region of the memory access histogram')
+    parser.add_argument('--points', type=int, default=DEFAULT_DEPTH_POINTS,
+                        help='points of the normalized stack depth curve')
+    parser.add_argument('--out', metavar='FILE', default=None,
+                        help='write the statistics as JSON to FILE instead of stdout')
+    parser.add_argument('--verbose', action='store_true',
+                        help='print each trace as it is analyzed')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    if np is None:
+        print("analyze.py requires NumPy (pip install numpy)", file=sys.stderr)
+        return 1
+    if args.granularity <= 0 or args.points <= 0:
+        print("--granularity and --points must be positive", file=sys.stderr)
+        return 1
+
+    def progress(path, result):
+        print(f"{path}: {result['steps']} steps, {result['status']}", file=sys.stderr)
+
+    stats, errors = analyze_cohort(args.paths, args.granularity, args.points,
+                                   progress if args.verbose else None)
+    report = stats.to_dict()
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    for path, error in errors:
+        print(f"{path}: {error}", file=sys.stderr)
+    print(f"{stats.traces} trace(s), {stats.steps} step(s), {len(errors)} error(s)",
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
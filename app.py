@@ -1,16 +1,32 @@
 import os
-import yaml
-from flask import Flask, render_template, request, jsonify, send_from_directory
+import threading
+from flask import (Flask, Response, render_template, request, jsonify, send_from_directory,
+                   stream_with_context)
 from werkzeug.utils import secure_filename
+from src.breakpoints import Breakpoints, run_until
+from src.checkpoint import Checkpoint, CHECKPOINT_MAGIC, is_checkpoint
 from src.cpu import Y86CPU
-from src.utils import parse_yo_file, Y86Error
+from src.jobs import (JobManager, DEFAULT_CPU_TIME, DEFAULT_MEMORY_LIMIT,
+                      DEFAULT_MAX_STEPS as JOB_MAX_STEPS)
+from src.loader import ImageCache
+from src.output import generate_yaml_output, output_path_for, write_text_if_changed
+from src.profiler import DEFAULT_HOT_SPOTS
+from src.results import ResultCache, result_key
+from src.sessions import (SimulatorPool, DEFAULT_MAX_SESSIONS, DEFAULT_SESSION_TTL,
+                          DEFAULT_MEMORY_BUDGET)
+from src.stream import (iter_run_batches, to_ndjson, to_sse, DEFAULT_BATCH_STEPS,
+                        DEFAULT_BATCH_INTERVAL, DEFAULT_MAX_STEPS)
+from src.timetravel import History
+from src.trace import DeltaTrace
+from src.tracefile import TraceReader, TRACE_SUFFIX
+from src.utils import Y86Error, SessionError, JobError
 import time
 
 app = Flask(__name__)
 
 # 配置文件上传
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'yo'}
+ALLOWED_EXTENSIONS = {'yo', 'ys'}
 # 确保上传文件夹存在
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
@@ -20,131 +36,116 @@ OUTPUT_FOLDER = 'output'
 if not os.path.exists(OUTPUT_FOLDER):
     os.makedirs(OUTPUT_FOLDER)
 
+# 解析后的程序镜像缓存，内容相同的上传无需再次解析
+IMAGE_CACHE_FOLDER = os.path.join('cache', 'images')
+image_cache = ImageCache(IMAGE_CACHE_FOLDER)
+
+# 执行结果缓存，相同程序的上传直接返回缓存的输出与轨迹
+RESULT_CACHE_FOLDER = os.path.join('cache', 'results')
+result_cache = ResultCache(RESULT_CACHE_FOLDER)
+
+# 归档的二进制轨迹（cpu.py --trace生成的.y86t文件）
+TRACE_FOLDER = 'traces'
 
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['TRACE_FOLDER'] = TRACE_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 限制文件大小为16MB
 
+# 会话池配置: 会话数上限、空闲超时（秒）和内存预算（字节）
+app.config['MAX_SESSIONS'] = DEFAULT_MAX_SESSIONS
+app.config['SESSION_TTL'] = DEFAULT_SESSION_TTL
+app.config['SESSION_MEMORY_BUDGET'] = DEFAULT_MEMORY_BUDGET
+
+# 作业进程池配置: 工作进程数（None为CPU核数）、每个作业的CPU时间（秒）与内存上限（字节）
+app.config['JOB_WORKERS'] = None
+app.config['JOB_CPU_TIME'] = DEFAULT_CPU_TIME
+app.config['JOB_MEMORY_LIMIT'] = DEFAULT_MEMORY_LIMIT
+
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def generate_yaml_output(filename, state):
-    """生成YAML格式的输出文件，所有数值使用十进制格式"""
-    try:
-        if not filename or not isinstance(filename, str):
-            filename = "output"
-        safe_filename = "".join(c for c in filename if c.isalnum() or c in ('-', '_')) or "output"
-
-        # 确保所有值都转换为整数
-        registers = {
-            'rax': int(state.get('registers', {}).get('rax', 0)),
-            'rcx': int(state.get('registers', {}).get('rcx', 0)),
-            'rdx': int(state.get('registers', {}).get('rdx', 0)),
-            'rbx': int(state.get('registers', {}).get('rbx', 0)),
-            'rsp': int(state.get('registers', {}).get('rsp', 0)),
-            'rbp': int(state.get('registers', {}).get('rbp', 0)),
-            'rsi': int(state.get('registers', {}).get('rsi', 0)),
-            'rdi': int(state.get('registers', {}).get('rdi', 0)),
-            'r8': int(state.get('registers', {}).get('r8', 0)),
-            'r9': int(state.get('registers', {}).get('r9', 0)),
-            'r10': int(state.get('registers', {}).get('r10', 0)),
-            'r11': int(state.get('registers', {}).get('r11', 0)),
-            'r12': int(state.get('registers', {}).get('r12', 0)),
-            'r13': int(state.get('registers', {}).get('r13', 0)),
-            'r14': int(state.get('registers', {}).get('r14', 0))
-        }
-
-        # 构建输出数据
-        output_data = [{
-            'PC': int(state.get('pc', 0)),
-            'REG': registers,
-            'CC': {
-                'ZF': int(state.get('flags', {}).get('ZF', 0)),
-                'SF': int(state.get('flags', {}).get('SF', 0)),
-                'OF': int(state.get('flags', {}).get('OF', 0))
-            },
-            'MEM': format_memory_dump(state.get('memory', {})),
-            'STAT': 1 if state.get('status') == 'HLT' else 2
-        }]
-
-        # 使用特定的YAML格式化选项
-        class NoAliasDumper(yaml.SafeDumper):
-            def ignore_aliases(self, data):
-                return True
-
-        output_path = os.path.join(OUTPUT_FOLDER, f"{safe_filename}.yml")
-
-        # 使用自定义的表示样式
-        def represent_int(dumper, data):
-            return dumper.represent_scalar('tag:yaml.org,2002:int', str(data))
-
-        NoAliasDumper.add_representer(int, represent_int)
-
-        # 写入文件时使用自定义的dumper
-        with open(output_path, 'w', encoding='utf-8') as f:
-            yaml.dump(output_data, f,
-                      Dumper=NoAliasDumper,
-                      default_flow_style=False,
-                      sort_keys=False,
-                      width=float("inf"))  # 防止长行被折断
+TRACE_MODES = ('full', 'delta')
 
-        return output_path
+# 上传后逐步执行的指令数上限
+UPLOAD_MAX_STEPS = 10000
+# 一次请求最多返回的轨迹记录数
+TRACE_MAX_RECORDS = 1000
 
-    except Exception as e:
-        # print(f"Error generating output file: {str(e)}")
-        raise Y86Error(f"Failed to generate output file: {str(e)}")
+# 估算轨迹占用内存时每个状态/增量的固定开销与每个内存条目的开销（字节）
+STATE_OVERHEAD = 2048
+DELTA_OVERHEAD = 512
+MEMORY_ENTRY_SIZE = 100
 
-def format_memory_dump(memory):
-    """
-    格式化内存转储:
-    - 按8字节对齐
-    - 使用小端法解释为十进制有符号整数
-    - 只保留非零值
-    """
-    non_zero_memory = {}
-    if not memory:
-        return non_zero_memory
-
-    # 获取所有地址并按8字节对齐
-    all_addresses = set(memory.keys())
-    aligned_addresses = set(addr - (addr % 8) for addr in all_addresses)
-
-    for base_addr in sorted(aligned_addresses):
-        # 使用小端法读取8字节
-        value = 0
-        bytes_present = False
-        for i in range(8):
-            curr_addr = base_addr + i
-            if curr_addr in memory:
-                bytes_present = True
-                value |= (memory[curr_addr] & 0xFF) << (i * 8)
-
-        # 只在实际有字节的地址处保存值
-        if bytes_present:
-            # 转换为有符号整数（64位）
-            if value & (1 << 63):  # 如果最高位为1（负数）
-                value = -(((~value) + 1) & ((1 << 64) - 1))
-            non_zero_memory[base_addr] = value
-
-    return non_zero_memory
 
 class CPUSimulator:
-    def __init__(self):
+    def __init__(self, trace_mode='full'):
         self.cpu = Y86CPU()
         self.instruction_count = 0
         self.execution_time = 0
         self.instruction_log = []
+        # 'full'模式每步保存完整状态，'delta'模式只记录增量
+        self.trace_mode = trace_mode
+        self.trace = None
+        # 可逆执行历史，支持后退与跳转到任意一步
+        self.history = None
+        # 断点在重新加载程序后保留，只能通过/api/breakpoints修改
+        self.breakpoints = Breakpoints()
+        # 置位时中止正在进行的流式执行
+        self.cancel_event = threading.Event()
+
+    def set_trace_mode(self, mode):
+        """设置轨迹记录模式，在下次加载程序时生效"""
+        if mode not in TRACE_MODES:
+            raise Y86Error(f"Unknown trace mode: {mode}")
+        self.trace_mode = mode
+
+    def _start_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+        if self.trace_mode == 'delta':
+            self.trace = DeltaTrace(self.cpu)
+            self.instruction_log = []
+        else:
+            self.trace = None
+            self.instruction_log = [self.cpu.get_state()]
+        self.history = History(self.cpu)
 
     def reset(self):
         """重置模拟器状态"""
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+        self.history = None
         self.cpu.reset()
         self.instruction_count = 0
         self.execution_time = 0
         self.instruction_log = []
 
+    def rewind(self):
+        """回到程序刚加载完成时的状态（复用已加载的内存镜像）"""
+        self.cpu.rewind()
+        self.instruction_count = 0
+        self.execution_time = 0
+        self._start_trace()
+
+    def load_checkpoint(self, checkpoint):
+        """从检查点恢复CPU状态，轨迹从恢复后的状态重新开始"""
+        self.reset()
+        self.cpu.restore_checkpoint(checkpoint)
+        self._start_trace()
+
+    def get_state_at(self, index):
+        """获取第index步之后的完整状态，0表示初始状态"""
+        if self.trace is not None:
+            return self.trace.state_at(index)
+        if not -len(self.instruction_log) <= index < len(self.instruction_log):
+            raise Y86Error(f"Trace step out of range: {index}")
+        return self.instruction_log[index]
+
     def load_program(self, program):
         """加载程序到CPU"""
         try:
@@ -154,24 +155,12 @@ class CPUSimulator:
             if not program:
                 raise Y86Error("Empty program")
 
-            # 找到程序的最小起始地址
-            min_addr = min(program.keys())
-
-            # 打印程序加载信息
-            # print(f"\nLoading program:")
-            # print(f"Start address: 0x{min_addr:x}")
-            # print("Program content:")
-            # for addr in sorted(program.keys()):
-            #     print(f"0x{addr:03x}: {program[addr]:02x}")
-
-            # 设置PC并加载程序
-            self.cpu.pc = min_addr  # 确保PC设置为程序的起始地址
+            # 加载程序，PC被设置为程序的起始地址
             success = self.cpu.load_program(program)
 
             if success:
                 # 确保初始状态被正确记录
-                initial_state = self.cpu.get_state()
-                self.instruction_log = [initial_state]  # 重置指令日志
+                self._start_trace()
                 # print(f"\nProgram loaded successfully")
                 # print(f"Initial PC: 0x{self.cpu.pc:x}")
                 # print(f"Initial state: {initial_state}")
@@ -186,9 +175,16 @@ class CPUSimulator:
         """执行单个指令步骤"""
         try:
             start_time = time.time()
-            success = self.cpu.step()
+            success = self.history.step() if self.history is not None else self.cpu.step()
             self.execution_time += time.time() - start_time
 
+            if self.trace is not None:
+                # 增量模式下只返回本步的变化
+                delta = self.trace.record()
+                if success:
+                    self.instruction_count += 1
+                return success, delta
+
             if success:
                 self.instruction_count += 1
                 current_state = self.cpu.get_state()
@@ -206,29 +202,150 @@ class CPUSimulator:
             # print(f"Error during step execution: {str(e)}")
             return False, self.cpu.get_state()
 
+    def run(self, max_steps=None, engine='interp'):
+        """不记录轨迹地连续执行，返回最终状态"""
+        if self.trace is not None:
+            # 快速执行不产生逐步记录，原轨迹不再完整
+            self.trace.close()
+            self.trace = None
+        start_time = time.time()
+        state, steps = self.cpu.run(max_steps, engine)
+        self.execution_time += time.time() - start_time
+        self.instruction_count += steps
+        # 快速执行不保存撤销记录，历史从执行后的状态重新开始
+        self.history = History(self.cpu, origin=self.instruction_count)
+        return state
+
+    def run_stream(self, max_steps=DEFAULT_MAX_STEPS, batch_steps=DEFAULT_BATCH_STEPS,
+                   batch_interval=DEFAULT_BATCH_INTERVAL):
+        """流式执行，逐批产生消息（见src.stream.iter_run_batches）"""
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+        self.cancel_event.clear()
+        if self.history is None:
+            self.history = History(self.cpu, origin=self.instruction_count)
+        start_time = time.time()
+        try:
+            for message in iter_run_batches(self.cpu, max_steps, batch_steps,
+                                            batch_interval, self.cancel_event,
+                                            self.history.step):
+                if message['type'] == 'end':
+                    self.instruction_count += message['steps']
+                    self.execution_time += time.time() - start_time
+                    message['statistics'] = self.get_statistics()
+                yield message
+        finally:
+            self.cancel_event.clear()
+
+    def run_until(self, max_steps=DEFAULT_MAX_STEPS, breakpoints=None):
+        """
+        执行到第一个命中的断点（默认使用会话中设置的断点），返回{'reason', 'hit', 'steps'}。
+        有观察点或寄存器条件时逐步执行并记录历史，执行过程可以用step_back/goto回退；
+        只有PC断点时由解释循环快速执行，与run()一样历史从停下的位置重新开始。
+        """
+        if breakpoints is None:
+            breakpoints = self.breakpoints
+        self._drop_trace()
+        fast = not (breakpoints.watchpoints or breakpoints.conditions)
+        if self.history is None and not fast:
+            self.history = History(self.cpu, origin=self.instruction_count)
+        start_time = time.time()
+        result = run_until(self.cpu, breakpoints, max_steps,
+                           None if fast else self.history.step)
+        self.execution_time += time.time() - start_time
+        self.instruction_count += result['steps']
+        if fast:
+            self.history = History(self.cpu, origin=self.instruction_count)
+        return result
+
+    def cancel(self):
+        """请求中止正在进行的流式执行"""
+        self.cancel_event.set()
+
+    def step_back(self):
+        """后退一步，返回是否成功（已在历史起点时为False）"""
+        if self.history is None:
+            raise Y86Error("No execution history")
+        self._drop_trace()
+        moved = self.history.step_back()
+        self._sync_history()
+        return moved
+
+    def goto(self, step):
+        """跳转到第step步之后的状态，返回实际到达的步数"""
+        if self.history is None:
+            raise Y86Error("No execution history")
+        self._drop_trace()
+        reached = self.history.goto(step)
+        self._sync_history()
+        return reached
+
+    def _drop_trace(self):
+        # 时间旅行会跳过或撤销步骤，增量轨迹不再连续
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def _sync_history(self):
+        self.instruction_count = self.history.instruction_count()
+        # 完整模式的日志只保留当前步之前的状态
+        del self.instruction_log[self.instruction_count + 1:]
+
+    def footprint(self):
+        """估算模拟器占用的内存（字节），供会话池做内存预算"""
+        size = self.cpu.memory.footprint()
+        for state in self.instruction_log:
+            size += STATE_OVERHEAD + len(state.get('memory', ())) * MEMORY_ENTRY_SIZE
+        if self.trace is not None:
+            size += len(self.trace.deltas) * DELTA_OVERHEAD
+        if self.history is not None:
+            size += self.history.footprint()
+        return size
+
+    def set_profiling(self, enabled):
+        """开启或关闭执行剖析，开启期间step与run都会记录统计"""
+        if enabled:
+            self.cpu.enable_profiling()
+        else:
+            self.cpu.disable_profiling()
+
+    def get_profile(self, limit=DEFAULT_HOT_SPOTS):
+        """返回剖析结果与热点表，未开启剖析时为None"""
+        profiler = self.cpu.profiler
+        if profiler is None:
+            return None
+        return {'profile': profiler.to_dict(), 'hot_spots': profiler.hot_spots(limit)}
+
     def get_statistics(self):
         return {
             'instruction_count': self.instruction_count,
             'execution_time': self.execution_time,
-            'status': self.cpu.status
+            'status': self.cpu.status,
+            'step': self.history.position if self.history is not None else None
         }
 
     def run_and_generate_output(self, filename):
-        """运行程序并生成输出文件"""
+        """
+        运行程序并生成输出文件。
+        'full'模式返回每一步的完整状态列表，'delta'模式返回DeltaTrace。
+        """
         try:
             states = []
-            initial_state = self.cpu.get_state()
-            states.append(initial_state)
+            if self.trace is None:
+                initial_state = self.cpu.get_state()
+                states.append(initial_state)
             # print(f"\nStarting execution:")
             # print(f"Initial PC: 0x{initial_state['pc']:x}")
 
             step_count = 0
-            while step_count < 10000:  # 防止无限循环
+            while step_count < UPLOAD_MAX_STEPS:  # 防止无限循环
                 # print(f"\nStep {step_count + 1}:")
                 # print(f"Current PC: 0x{self.cpu.pc:x}")
 
                 success, state = self.step()
-                states.append(state)
+                if self.trace is None:
+                    states.append(state)
 
                 # print(f"Instruction executed at 0x{state['pc']:x}")
                 # print(f"Status: {state['status']}")
@@ -238,9 +355,11 @@ class CPUSimulator:
                     if state['status'] == 'HLT':
                         # print(f"\nProgram halted normally")
                         # print(f"Final state: {state}")
-                        output_path = generate_yaml_output(filename, state)
+                        if self.trace is not None:
+                            state = self.cpu.get_state()
+                        output_path = generate_yaml_output(filename, state, OUTPUT_FOLDER)
                         # print(f"Generated output file: {output_path}")
-                        return states
+                        return states if self.trace is None else self.trace
                     else:
                         raise Y86Error(f"Program failed: {state['status']}")
 
@@ -253,7 +372,36 @@ class CPUSimulator:
             raise
 
 
-simulator = CPUSimulator()
+# 每个会话一个模拟器，按会话ID隔离并发用户
+pool = SimulatorPool(CPUSimulator,
+                     max_sessions=app.config['MAX_SESSIONS'],
+                     ttl=app.config['SESSION_TTL'],
+                     memory_budget=app.config['SESSION_MEMORY_BUDGET'],
+                     sizeof=CPUSimulator.footprint)
+
+
+def _session_id():
+    """从请求头X-Session-ID、查询参数、表单或JSON请求体中取得会话ID"""
+    session_id = (request.headers.get('X-Session-ID')
+                  or request.args.get('session_id')
+                  or request.form.get('session_id'))
+    if not session_id:
+        options = request.get_json(silent=True)
+        if isinstance(options, dict):
+            session_id = options.get('session_id')
+    return session_id
+
+
+# 长时间运行的程序交给工作进程执行，进程池在第一次提交时创建
+jobs = JobManager(max_workers=app.config['JOB_WORKERS'],
+                  cpu_time=app.config['JOB_CPU_TIME'],
+                  memory_limit=app.config['JOB_MEMORY_LIMIT'])
+
+
+@app.errorhandler(SessionError)
+@app.errorhandler(JobError)
+def not_found_error(e):
+    return jsonify({'error': str(e)}), 404
 
 
 @app.route('/')
@@ -277,6 +425,8 @@ def upload_program():
             return jsonify({'error': 'No selected file'}), 400
 
         filename = secure_filename(file.filename)
+        if not allowed_file(filename):
+            return jsonify({'error': 'Only .yo and .ys files are supported'}), 400
         base_filename = os.path.splitext(filename)[0]
 
         # 保存文件到 uploads 文件夹
@@ -284,57 +434,112 @@ def upload_program():
         file.save(file_path)
         # print(f"File saved to: {file_path}")
 
-        # 读取保存的文件内容
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        program = parse_yo_file(content)
+        # 按内容哈希查找已解析的镜像，未命中时解析.yo或汇编.ys
+        program = image_cache.load_file(file_path)
         # print(f"Processing file: {filename}")
 
-        program = parse_yo_file(content)
-
         if not program:
             return jsonify({'error': 'No valid instructions found in file'}), 400
 
         # print(f"Program loaded with addresses: {sorted(program.keys())}")
 
-        if not simulator.load_program(program):
-            return jsonify({'error': 'Failed to load program into simulator'}), 400
-
+        # 复用请求中仍然有效的会话，否则创建新会话
         try:
-            states = simulator.run_and_generate_output(base_filename)
-            # 确保states不为None且包含必要的数据
-            if not states or not all('pc' in state for state in states):
-                return jsonify({'error': 'Invalid program state generated'}), 400
-
-            output_file = f"{base_filename}.yml"
-            output_path = os.path.join(OUTPUT_FOLDER, output_file)
-
-            if os.path.exists(output_path):
-                # print(f"Output file successfully generated at: {output_path}")
-                # 添加状态验证的日志
-                # print(f"Number of states: {len(states)}")
-                # print(f"First state PC: {states[0].get('pc', 'missing')}")
-
-                return jsonify({
-                    'message': 'Program executed and output generated successfully',
-                    'states': states,
-                    'statistics': simulator.get_statistics(),
-                    'output_file': output_file
-                })
-            else:
-                return jsonify({'error': 'Failed to generate output file'}), 500
-
-        except Y86Error as e:
-            # print(f"Y86Error: {str(e)}")
-            return jsonify({'error': str(e)}), 400
+            lease = pool.session(_session_id())
+        except SessionError:
+            lease = pool.create()
+        with lease as simulator:
+            return _run_upload(simulator, lease.session_id, program, base_filename)
 
     except Exception as e:
         # print(f"Unexpected error: {str(e)}")
         return jsonify({'error': f'Error: {str(e)}'}), 400
 
 
+def _run_upload(simulator, session_id, program, base_filename):
+    """在已加锁的会话模拟器上加载并运行上传的程序"""
+    trace_mode = request.form.get('trace', 'full')
+    simulator.set_trace_mode(trace_mode)
+    if not simulator.load_program(program):
+        return jsonify({'error': 'Failed to load program into simulator'}), 400
+
+    key = result_key(program, UPLOAD_MAX_STEPS)
+    entry = result_cache.get(key)
+    # 旧格式的条目保存逐步的完整状态，按未命中处理并被覆盖
+    if entry is not None and 'deltas' in (entry['traces'].get(trace_mode) or {}):
+        # 命中缓存: 不再执行，模拟器停在程序加载后的初始状态
+        cached = entry['traces'][trace_mode]
+        output_path = output_path_for(base_filename, OUTPUT_FOLDER)
+        write_text_if_changed(entry['yaml'], output_path)
+        response = {
+            'message': 'Program output loaded from cache',
+            'session_id': session_id,
+            'cached': True,
+            'statistics': simulator.get_statistics(),
+            'output_file': os.path.basename(output_path)
+        }
+        if trace_mode == 'delta':
+            response['states'] = [cached['initial']]
+            response['trace'] = cached
+        else:
+            # 缓存中只有增量轨迹，逐步的完整状态在这里重建
+            response['states'] = list(DeltaTrace.from_dict(cached).states())
+        return jsonify(response)
+
+    try:
+        result = simulator.run_and_generate_output(base_filename)
+        if isinstance(result, DeltaTrace):
+            # 增量模式: 只返回初始状态和每步的变化
+            states = [result.initial]
+            trace = result.to_dict()
+        else:
+            states = result
+            trace = None
+        # 确保states不为None且包含必要的数据
+        if not states or not all('pc' in state for state in states):
+            return jsonify({'error': 'Invalid program state generated'}), 400
+
+        output_file = f"{base_filename}.yml"
+        output_path = os.path.join(OUTPUT_FOLDER, output_file)
+
+        if os.path.exists(output_path):
+            with open(output_path, 'r', encoding='utf-8') as f:
+                yaml_text = f.read()
+            # 缓存最终状态与增量轨迹，不保存逐步的完整状态
+            cached = trace if trace is not None else DeltaTrace.from_states(states).to_dict()
+            result_cache.put(key, simulator.cpu.get_state(), simulator.instruction_count,
+                             yaml_text, trace_mode, cached)
+            # print(f"Output file successfully generated at: {output_path}")
+            # 添加状态验证的日志
+            # print(f"Number of states: {len(states)}")
+            # print(f"First state PC: {states[0].get('pc', 'missing')}")
+
+            response = {
+                'message': 'Program executed and output generated successfully',
+                'session_id': session_id,
+                'states': states,
+                'statistics': simulator.get_statistics(),
+                'output_file': output_file
+            }
+            if trace is not None:
+                response['trace'] = trace
+            return jsonify(response)
+        else:
+            return jsonify({'error': 'Failed to generate output file'}), 500
+
+    except Y86Error as e:
+        # print(f"Y86Error: {str(e)}")
+        # 返回会话ID: 超出步数上限时模拟器停在当前状态，可下载检查点后继续执行
+        return jsonify({'error': str(e), 'session_id': session_id}), 400
+
+
 @app.route('/api/step', methods=['POST'])
 def step():
+    with pool.session(_session_id()) as simulator:
+        return _step(simulator)
+
+
+def _step(simulator):
     try:
         before_state = simulator.cpu.get_state()
         success = simulator.step()
@@ -350,7 +555,7 @@ def step():
             'statistics': simulator.get_statistics(),
             'debug_info': {
                 'pc': hex(simulator.cpu.pc),
-                'instruction': simulator.cpu.curr_inst,
+                'instruction': simulator.cpu.curr_inst.copy(),
                 'status': simulator.cpu.status
             }
         })
@@ -360,9 +565,32 @@ def step():
 
 @app.route('/api/run', methods=['POST'])
 def run():
+    with pool.session(_session_id()) as simulator:
+        return _run(simulator)
+
+
+def _run(simulator):
     try:
+        options = request.get_json(silent=True) or {}
+        # 限制指令数，避免死循环一直占用工作线程（逐步记录时还会耗尽内存）
+        max_steps = options.get('max_steps') or DEFAULT_MAX_STEPS
+        if not options.get('trace', True):
+            # 不需要轨迹时只返回最终状态
+            engine = options.get('engine', 'interp')
+            state = simulator.run(max_steps, engine)
+            response = {
+                'states': [state],
+                'statistics': simulator.get_statistics()
+            }
+            cpu = simulator.cpu
+            # 开启剖析时由剖析器逐条执行，没有流水线统计
+            if engine == 'pipe' and cpu.profiler is None and cpu.pipeline is not None:
+                # 流水线模型的周期、CPI与各类指令的气泡统计
+                response['pipeline'] = cpu.pipeline.get_stats()
+            return jsonify(response)
+
         states = []
-        while True:
+        while len(states) < max_steps:
             success, state = simulator.step()
             states.append(state)
             if not success:
@@ -376,11 +604,320 @@ def run():
         return jsonify({'error': str(e)}), 400
 
 
+def _stream_option(options, name, default, convert):
+    value = options.get(name)
+    return default if value in (None, '') else convert(value)
+
+
+@app.route('/api/run/stream', methods=['GET', 'POST'])
+def run_stream():
+    """
+    流式执行: 默认按NDJSON逐行推送，format=sse时使用Server-Sent Events。
+    选项可以放在JSON请求体或查询参数中: max_steps, batch_steps, batch_interval。
+    """
+    try:
+        options = dict(request.args)
+        options.update(request.get_json(silent=True) or {})
+        max_steps = _stream_option(options, 'max_steps', DEFAULT_MAX_STEPS, int)
+        batch_steps = max(1, _stream_option(options, 'batch_steps', DEFAULT_BATCH_STEPS, int))
+        batch_interval = _stream_option(options, 'batch_interval', DEFAULT_BATCH_INTERVAL, float)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid stream option: {str(e)}'}), 400
+
+    # 在返回响应前租用会话，会话不存在时直接返回404
+    lease = pool.session(options.get('session_id') or _session_id())
+
+    def messages():
+        # 整个流式执行期间持有该会话的锁
+        with lease as simulator:
+            yield from simulator.run_stream(max_steps, batch_steps, batch_interval)
+
+    if options.get('format') == 'sse':
+        body, mimetype = to_sse(messages()), 'text/event-stream'
+    else:
+        body, mimetype = to_ndjson(messages()), 'application/x-ndjson'
+    # 客户端断开时生成器被关闭，执行随之停止
+    response = Response(stream_with_context(body), mimetype=mimetype,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # 生成器未启动就被丢弃时也要归还会话
+    response.call_on_close(lease.close)
+    return response
+
+
+@app.route('/api/run/cancel', methods=['POST'])
+def cancel_run():
+    # 不获取会话锁，正在流式执行的请求持有该锁
+    pool.peek(_session_id()).cancel()
+    return jsonify({'message': 'Cancellation requested'})
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """提交程序异步执行，立即返回作业ID"""
+    try:
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({'error': 'No file part'}), 400
+        filename = secure_filename(request.files['file'].filename)
+        if not (allowed_file(filename) or is_checkpoint(filename)):
+            return jsonify({'error': 'Only .yo, .ys and .ckpt files are supported'}), 400
+
+        if is_checkpoint(filename):
+            # 检查点: 从保存的状态继续执行
+            program = Checkpoint.from_bytes(request.files['file'].read())
+        else:
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            request.files['file'].save(file_path)
+            program = image_cache.load_file(file_path)
+            if not program:
+                return jsonify({'error': 'No valid instructions found in file'}), 400
+
+        max_steps = request.form.get('max_steps', JOB_MAX_STEPS, type=int)
+        engine = request.form.get('engine', 'interp')
+        job = jobs.submit(program, max_steps, engine)
+        return jsonify(job.to_dict()), 200 if job.done.is_set() else 202
+    except Y86Error as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    return jsonify(jobs.get(job_id).to_dict(include_result=False))
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if not job.done.is_set():
+        return jsonify(job.to_dict(include_result=False)), 409
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """按NDJSON推送作业进度，作业结束时推送包含结果的最后一条"""
+    job = jobs.get(job_id)
+    interval = request.args.get('interval', 0.2, type=float)
+
+    def events():
+        while not job.done.wait(interval):
+            yield job.to_dict(include_result=False)
+        yield job.to_dict()
+
+    return Response(stream_with_context(to_ndjson(events())),
+                    mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/jobs/<job_id>/checkpoint', methods=['GET'])
+def job_checkpoint(job_id):
+    """下载未执行完的作业的检查点，可作为文件重新提交以继续执行"""
+    job = jobs.get(job_id)
+    if job.checkpoint is None:
+        return jsonify({'error': 'Job has no checkpoint'}), 404
+    return _checkpoint_response(job.checkpoint, f"{job_id}.ckpt")
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    cancelled = jobs.cancel(job_id)
+    return jsonify({'job_id': job_id, 'cancelled': cancelled})
+
+
+@app.route('/api/profile', methods=['GET', 'POST'])
+def profile():
+    """GET返回当前会话的剖析结果，POST {"enabled": bool}开启或关闭剖析"""
+    try:
+        with pool.session(_session_id()) as simulator:
+            if request.method == 'POST':
+                options = request.get_json(silent=True) or {}
+                simulator.set_profiling(bool(options.get('enabled', True)))
+            limit = int(request.args.get('limit', DEFAULT_HOT_SPOTS))
+            result = simulator.get_profile(limit)
+            return jsonify({'enabled': result is not None, **(result or {})})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def _checkpoint_response(blob, filename):
+    return Response(blob, mimetype='application/octet-stream',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+@app.route('/api/checkpoint', methods=['GET'])
+def download_checkpoint():
+    """下载当前会话的模拟器状态检查点"""
+    with pool.session(_session_id()) as simulator:
+        blob = simulator.cpu.checkpoint().to_bytes()
+    return _checkpoint_response(blob, 'state.ckpt')
+
+
+@app.route('/api/checkpoint', methods=['POST'])
+def upload_checkpoint():
+    """上传检查点并恢复到会话中，之后可以继续单步或连续执行"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file part'}), 400
+        blob = request.files['file'].read()
+        if not blob.startswith(CHECKPOINT_MAGIC):
+            return jsonify({'error': 'Not a checkpoint file'}), 400
+        checkpoint = Checkpoint.from_bytes(blob)
+
+        try:
+            lease = pool.session(_session_id())
+        except SessionError:
+            lease = pool.create()
+        with lease as simulator:
+            simulator.load_checkpoint(checkpoint)
+            return jsonify({
+                'message': 'Checkpoint restored',
+                'session_id': lease.session_id,
+                'state': simulator.cpu.get_state(),
+                'statistics': simulator.get_statistics()
+            })
+    except Y86Error as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/state_at', methods=['GET'])
+def state_at():
+    try:
+        index = int(request.args.get('step', 0))
+        with pool.session(_session_id()) as simulator:
+            return jsonify({'step': index, 'state': simulator.get_state_at(index)})
+    except (ValueError, Y86Error) as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/breakpoints', methods=['GET', 'POST', 'DELETE'])
+def breakpoints():
+    """
+    查看、设置或清除会话的断点。POST的请求体整体替换现有断点:
+    {'pcs': [地址], 'watchpoints': [{'address', 'size'}], 'conditions': [{'register', 'op', 'value'}]}
+    """
+    try:
+        with pool.session(_session_id()) as simulator:
+            if request.method == 'POST':
+                simulator.breakpoints = Breakpoints.from_dict(request.get_json(silent=True) or {})
+            elif request.method == 'DELETE':
+                simulator.breakpoints.clear()
+            return jsonify({'breakpoints': simulator.breakpoints.to_dict()})
+    except Y86Error as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/run_until', methods=['POST'])
+def run_until_breakpoint():
+    """
+    执行到第一个命中的断点、停机或出错，只返回停下时的状态。
+    请求体可选: max_steps，以及只用于本次执行的breakpoints（格式同/api/breakpoints）。
+    """
+    try:
+        options = request.get_json(silent=True) or {}
+        max_steps = _stream_option(options, 'max_steps', DEFAULT_MAX_STEPS, int)
+        spec = options.get('breakpoints')
+        once = Breakpoints.from_dict(spec) if spec is not None else None
+        with pool.session(_session_id()) as simulator:
+            result = simulator.run_until(max_steps, once)
+            result['state'] = simulator.cpu.get_state()
+            result['statistics'] = simulator.get_statistics()
+            return jsonify(result)
+    except (TypeError, ValueError, Y86Error) as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/step_back', methods=['POST'])
+def step_back():
+    """撤销最近一步（时间旅行调试）"""
+    try:
+        with pool.session(_session_id()) as simulator:
+            moved = simulator.step_back()
+            return jsonify({
+                'success': moved,
+                'state': simulator.cpu.get_state(),
+                'statistics': simulator.get_statistics()
+            })
+    except Y86Error as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/goto', methods=['GET', 'POST'])
+def goto():
+    """跳转到第step步之后的状态，已执行过的步最多重新执行一个关键帧间隔"""
+    try:
+        data = request.get_json(silent=True) or {}
+        step = int(request.args.get('step', data.get('step', 0)))
+        with pool.session(_session_id()) as simulator:
+            reached = simulator.goto(step)
+            return jsonify({
+                'step': reached,
+                'state': simulator.cpu.get_state(),
+                'statistics': simulator.get_statistics()
+            })
+    except (ValueError, TypeError, Y86Error) as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/traces', methods=['GET'])
+def list_traces():
+    """列出已归档的二进制轨迹"""
+    folder = app.config['TRACE_FOLDER']
+    names = sorted(name for name in os.listdir(folder)
+                   if name.endswith(TRACE_SUFFIX)) if os.path.isdir(folder) else []
+    return jsonify({'traces': [
+        {'name': name, 'size': os.path.getsize(os.path.join(folder, name))} for name in names
+    ]})
+
+
+@app.route('/api/traces/<name>', methods=['GET'])
+def read_trace(name):
+    """
+    读取归档轨迹中从step开始的count条记录，文件通过mmap按块读取，不整体载入。
+    state=registers时附带执行step步之后的寄存器状态，state=full时附带完整状态（含内存）。
+    """
+    path = os.path.join(app.config['TRACE_FOLDER'], secure_filename(name))
+    if not name.endswith(TRACE_SUFFIX) or not os.path.isfile(path):
+        return jsonify({'error': f'Trace not found: {name}'}), 404
+    try:
+        step = int(request.args.get('step', 0))
+        count = min(int(request.args.get('count', 100)), TRACE_MAX_RECORDS)
+        with TraceReader(path) as reader:
+            response = {
+                'name': name,
+                'steps': len(reader),
+                'compression': reader.compression,
+                'block_steps': reader.block_steps,
+                'records': list(reader.records(step, step + count))
+            }
+            state = request.args.get('state')
+            if state == 'registers':
+                response['state'] = reader.registers_at(step)
+            elif state == 'full':
+                response['state'] = reader.state_at(step)
+            return jsonify(response)
+    except (ValueError, Y86Error) as e:
+        return jsonify({'error': str(e)}), 400
+
+
 @app.route('/api/reset', methods=['POST'])
 def reset():
-    simulator.reset()
+    with pool.session(_session_id()) as simulator:
+        simulator.reset()
     return jsonify({'message': 'Simulator reset successfully'})
 
 
+@app.route('/api/rewind', methods=['POST'])
+def rewind():
+    try:
+        with pool.session(_session_id()) as simulator:
+            simulator.rewind()
+            return jsonify({
+                'message': 'Simulator rewound to program start',
+                'state': simulator.cpu.get_state(),
+                'statistics': simulator.get_statistics()
+            })
+    except Y86Error as e:
+        return jsonify({'error': str(e)}), 400
+
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,67 @@
+import json
+import sys
+
+from src.bench import (run_benchmarks, compare, corpus_files, program_name, format_row,
+                       TABLE_HEADER, MEMORY_BACKENDS, DEFAULT_REPEAT, DEFAULT_MAX_STEPS,
+                       DEFAULT_THRESHOLD)
+from src.cpu import ENGINES
+
+# 默认的基准程序目录
+DEFAULT_CORPUS = 'bench'
+
+
+def parse_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Y86-64 simulator benchmarks')
+    parser.add_argument('--corpus', metavar='DIR', default=DEFAULT_CORPUS,
+                        help='directory of .yo/.ys benchmark programs')
+    parser.add_argument('--program', action='append', default=None,
+                        help='only run this program (repeatable)')
+    parser.add_argument('--engine', action='append', choices=ENGINES, default=None,
+                        help='only use this engine (repeatable)')
+    parser.add_argument('--memory', action='append', choices=tuple(MEMORY_BACKENDS),
+                        default=None, help='only use this memory backend (repeatable)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='timed runs per benchmark, the best one is reported')
+    parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS,
+                        help='stop each program after this many instructions')
+    parser.add_argument('--out', metavar='FILE', default=None,
+                        help='write the results as JSON to FILE')
+    parser.add_argument('--baseline', metavar='FILE', default=None,
+                        help='compare against earlier results and fail on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative change treated as a regression')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    paths = corpus_files(args.corpus)
+    if args.program:
+        paths = [path for path in paths if program_name(path) in args.program]
+
+    print(TABLE_HEADER)
+    results = run_benchmarks(
+        paths, args.engine or ENGINES, args.memory or tuple(MEMORY_BACKENDS),
+        args.repeat, args.max_steps, progress=lambda row: print(format_row(row), flush=True)
+    )
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, results, args.threshold)
+        for item in regressions:
+            print(f"REGRESSION {item['program']} {item['engine']} {item['memory']} "
+                  f"{item['metric']}: {item['baseline']:.6g} -> {item['current']:.6g} "
+                  f"({item['change']:+.1%})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
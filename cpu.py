@@ -1,65 +1,344 @@
+import time
+
+# 记录进程进入本模块的时刻，用于--time-startup
+_START_TIME = time.perf_counter()
+
+import os
 import sys
-import yaml
 
-from app import format_memory_dump
-from src.cpu import Y86CPU
-from src.utils import parse_yo_file, Y86Error
+from src.checkpoint import is_checkpoint, read_checkpoint, write_checkpoint
+from src.cpu import Y86CPU, ENGINES
+from src.output import dump_yaml_output
+from src.loader import ImageCache, read_program_file
+from src.utils import Y86Error
 
+_IMPORTED_TIME = time.perf_counter()
+
+# 检查时间限制的间隔（指令数）
+TIME_CHECK_INTERVAL = 10000
 
-def main(input_file, output_file):
-    """处理命令行输入并执行Y86程序"""
-    try:
-        # 从文件读取.yo文件内容
-        with open(input_file, 'r') as file:
-            content = file.read()
 
-        # 初始化CPU和解析程序
+def execute(cpu, max_steps=None, time_limit=None, engine='interp'):
+    """
+    执行已加载的程序，返回(最终状态, 指令数, 是否因限制而停止)。
+    有时间限制时按TIME_CHECK_INTERVAL条指令分段执行并检查耗时。
+    """
+    if time_limit is None:
+        state, steps = cpu.run(max_steps, engine)
+        return state, steps, state['status'] == 'AOK'
+
+    deadline = time.monotonic() + time_limit
+    steps = 0
+    while True:
+        chunk = TIME_CHECK_INTERVAL
+        if max_steps is not None:
+            chunk = min(chunk, max_steps - steps)
+        state, count = cpu.run(chunk, engine)
+        steps += count
+        if state['status'] != 'AOK':
+            return state, steps, False
+        if (max_steps is not None and steps >= max_steps) or time.monotonic() >= deadline:
+            return state, steps, True
+
+
+def run_file(input_file, output_file, max_steps=None, time_limit=None, engine='interp',
+             image_cache=None, result_cache=None, profile=False, checkpoint_file=None,
+             trace_file=None, trace_compression='zlib', uarch=None):
+    """
+    执行单个.yo/.ys文件并写出结果，返回该文件的执行摘要。
+    输入为.ckpt检查点时从保存的状态继续执行。
+    image_cache为缓存目录时复用已解析的程序镜像，
+    result_cache为缓存目录时相同程序直接使用缓存的输出而不再执行。
+    profile为True时开启执行剖析，摘要中的'profile'为剖析结果。
+    checkpoint_file不为None时把执行结束时的状态写入该检查点文件。
+    trace_file不为None时逐条执行并把二进制轨迹写入该文件（见src.tracefile）。
+    uarch为微体系结构配置字符串时挂载对应的模型（见src.uarch.parse_machine），
+    摘要中的'uarch'为命中率与估计周期数。
+    """
+    start_time = time.perf_counter()
+    summary = {
+        'input': input_file,
+        'output': output_file,
+        'status': 'ERROR',
+        'steps': 0,
+        'wall_time': 0.0
+    }
+    try:
         cpu = Y86CPU()
-        program = parse_yo_file(content)
-
-        if not program:
-            raise Y86Error("No valid program found in input")
-
-        # 加载并执行程序
-        cpu.load_program(program)
-        final_state = None
-
-        while cpu.status == 'AOK':
-            success = cpu.step()
-            if not success:
-                final_state = cpu.get_state()
-                break
-
-        # 生成YAML格式输出
-        if final_state:
-            output_data = [{
-                'PC': int(final_state.get('pc', 0)),
-                'REG': {
-                    reg: int(val) for reg, val in final_state.get('registers', {}).items()
-                },
-                'CC': {
-                    'ZF': int(final_state.get('flags', {}).get('ZF', 0)),
-                    'SF': int(final_state.get('flags', {}).get('SF', 0)),
-                    'OF': int(final_state.get('flags', {}).get('OF', 0))
-                },
-                'MEM': format_memory_dump(final_state.get('memory', {})),
-                'STAT': 1 if final_state.get('status') == 'HLT' else 2
-            }]
-
-            # 使用yaml库输出到文件
-            with open(output_file, 'w') as file:
-                yaml.dump(output_data, file, default_flow_style=False, sort_keys=False)
+        if is_checkpoint(input_file):
+            # 从检查点继续执行，不重新执行之前的指令
+            cpu.restore_checkpoint(read_checkpoint(input_file))
+            program = None
+            use_cache = False
+        else:
+            # 解析程序（有缓存时直接读取二进制镜像）
+            if image_cache:
+                program = ImageCache(image_cache).load_file(input_file)
+            else:
+                program = read_program_file(input_file)
+
+            if not program:
+                raise Y86Error("No valid program found in input")
 
+            # 流水线统计、剖析结果、模型统计、轨迹与检查点只能通过执行得到，此时不使用结果缓存
+            use_cache = result_cache and engine != 'pipe' and not profile and not trace_file \
+                and uarch is None and not checkpoint_file
+            if use_cache:
+                from src.results import ResultCache, result_key
+
+                cache = ResultCache(result_cache)
+                key = result_key(program, max_steps)
+                entry = cache.get(key)
+                if entry is not None:
+                    with open(output_file, 'w', encoding='utf-8') as file:
+                        file.write(entry['yaml'])
+                    status = entry['state']['status']
+                    summary['status'] = 'LIMIT' if status == 'AOK' else status
+                    summary['steps'] = entry['steps']
+                    summary['cached'] = True
+                    summary['wall_time'] = time.perf_counter() - start_time
+                    return summary
+
+        # 加载并执行程序（不需要逐步状态，直接使用快速执行循环）
+        if program is not None:
+            cpu.load_program(program)
+        if profile:
+            cpu.enable_profiling()
+        if uarch is not None:
+            from src.uarch import parse_machine
+
+            cpu.attach_uarch(parse_machine(uarch))
+        if trace_file:
+            from src.tracefile import record_trace
+
+            final_state, steps = record_trace(cpu, trace_file, max_steps, trace_compression,
+                                              time_limit=time_limit)
+            limited = final_state['status'] == 'AOK'
+            summary['trace'] = trace_file
+        else:
+            final_state, steps, limited = execute(cpu, max_steps, time_limit, engine)
+        yaml_text = dump_yaml_output(final_state)
+        with open(output_file, 'w', encoding='utf-8') as file:
+            file.write(yaml_text)
+
+        summary['status'] = 'LIMIT' if limited else final_state['status']
+        summary['steps'] = steps
+        if checkpoint_file:
+            write_checkpoint(cpu, checkpoint_file)
+            summary['checkpoint'] = checkpoint_file
+        # 因时间限制而停止的结果与机器负载有关，不缓存
+        if profile:
+            summary['profile'] = cpu.profiler.to_dict()
+            summary['hot_spots'] = cpu.profiler.hot_spots()
+        elif engine == 'pipe':
+            summary['pipeline'] = cpu.pipeline.get_stats()
+        if uarch is not None:
+            summary['uarch'] = cpu.uarch.get_stats()
+        if use_cache and (not limited or steps == max_steps):
+            cache.put(key, final_state, steps, yaml_text)
     except Exception as e:
-        # print(f"Error: {str(e)}", file=sys.stderr)
-        sys.exit(1)
+        summary['error'] = str(e)
 
+    summary['wall_time'] = time.perf_counter() - start_time
+    return summary
 
-if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        # print("Usage: python cpu.py <input_file> <output_file>")
+
+def _batch_worker(task):
+    """进程池中执行的任务，参数为(输入文件, 输出文件, 选项)"""
+    input_file, output_file, options = task
+    return run_file(input_file, output_file, **options)
+
+
+def run_batch(input_dir, output_dir, jobs=None, max_steps=None, time_limit=None,
+              engine='interp', image_cache=None, result_cache=None, trace_dir=None,
+              trace_compression='zlib'):
+    """
+    批量执行目录下的所有.yo/.ys文件。
+    每个输入生成一个同名.yml，并在输出目录写出manifest.json汇总。
+    trace_dir不为None时把每个程序的二进制轨迹写入该目录下的同名.y86t文件。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    names = sorted(name for name in os.listdir(input_dir)
+                   if name.endswith(('.yo', '.ys')))
+    options = {'max_steps': max_steps, 'time_limit': time_limit, 'engine': engine,
+               'image_cache': image_cache, 'result_cache': result_cache}
+    tasks = [
+        (os.path.join(input_dir, name),
+         os.path.join(output_dir, os.path.splitext(name)[0] + '.yml'),
+         options)
+        for name in names
+    ]
+    if trace_dir:
+        from src.tracefile import TRACE_SUFFIX
+
+        os.makedirs(trace_dir, exist_ok=True)
+        tasks = [
+            (input_file, output_file,
+             dict(options, trace_compression=trace_compression,
+                  trace_file=os.path.join(trace_dir, os.path.splitext(
+                      os.path.basename(input_file))[0] + TRACE_SUFFIX)))
+            for input_file, output_file, options in tasks
+        ]
+
+    start_time = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        results = [_batch_worker(task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        # 工作进程在整个批次中复用，只付出一次解释器启动和导入的开销
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_batch_worker, tasks, chunksize=chunksize))
+
+    manifest = {
+        'input_dir': input_dir,
+        'output_dir': output_dir,
+        'jobs': jobs,
+        'max_steps': max_steps,
+        'time_limit': time_limit,
+        'engine': engine,
+        'total': len(results),
+        'halted': sum(1 for result in results if result['status'] == 'HLT'),
+        'wall_time': time.perf_counter() - start_time,
+        'files': results
+    }
+    import json
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def main(input_file, output_file, max_steps=None, time_limit=None, engine='interp',
+         image_cache=None, result_cache=None, profile_file=None, checkpoint_file=None,
+         trace_file=None, trace_compression='zlib', uarch=None):
+    """处理命令行输入并执行Y86程序"""
+    summary = run_file(input_file, output_file, max_steps, time_limit, engine,
+                       image_cache, result_cache, profile=profile_file is not None,
+                       checkpoint_file=checkpoint_file, trace_file=trace_file,
+                       trace_compression=trace_compression, uarch=uarch)
+    if 'profile' in summary:
+        import json
+        from src.profiler import format_hot_spots
+
+        with open(profile_file, 'w') as file:
+            json.dump(summary['profile'], file, indent=2)
+        sys.stderr.write(format_hot_spots(summary['hot_spots']))
+    if 'pipeline' in summary:
+        import json
+        json.dump(summary['pipeline'], sys.stderr, indent=2)
+        sys.stderr.write('\n')
+    if 'uarch' in summary:
+        import json
+        json.dump(summary['uarch'], sys.stderr, indent=2)
+        sys.stderr.write('\n')
+    if summary['status'] == 'ERROR':
+        # print(f"Error: {summary['error']}", file=sys.stderr)
         sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    main(input_file, output_file)
\ No newline at end of file
+
+def write_listing(input_file, listing_file):
+    """把.ys源码汇编后的.yo清单写入listing_file"""
+    from src.assembler import assemble_listing
+
+    with open(input_file, 'r', encoding='utf-8') as file:
+        _, listing = assemble_listing(file)
+    with open(listing_file, 'w', encoding='utf-8') as file:
+        file.write(listing)
+
+
+def report_startup(stream=sys.stderr):
+    """输出启动耗时: 模块导入耗时以及到目前为止的总耗时（秒）"""
+    now = time.perf_counter()
+    stream.write(
+        f"startup: imports={_IMPORTED_TIME - _START_TIME:.6f}s "
+        f"total={now - _START_TIME:.6f}s\n"
+    )
+
+
+def parse_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Y86-64 simulator')
+    parser.add_argument('input_file', nargs='?',
+                        help='.yo or .ys program to run, or a .ckpt checkpoint to resume')
+    parser.add_argument('output_file', nargs='?', help='YAML output file')
+    parser.add_argument('--batch', metavar='DIR', help='run every .yo/.ys file in DIR')
+    parser.add_argument('--out', metavar='DIR', help='output directory for --batch')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes for --batch')
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help='stop each program after this many instructions')
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help='stop each program after this many seconds')
+    parser.add_argument('--engine', choices=ENGINES, default='interp',
+                        help='execution engine')
+    parser.add_argument('--image-cache', metavar='DIR', default=None,
+                        help='cache parsed program images in DIR')
+    parser.add_argument('--result-cache', metavar='DIR', default=None,
+                        help='reuse cached results of identical programs from DIR')
+    parser.add_argument('--listing', metavar='FILE', default=None,
+                        help='write the .yo listing of a .ys input to FILE')
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                        help='profile execution, write JSON to FILE and print hot spots')
+    parser.add_argument('--checkpoint', metavar='FILE', default=None,
+                        help='save the final simulator state to FILE (resume with FILE as input)')
+    parser.add_argument('--trace', metavar='PATH', default=None,
+                        help='write a binary execution trace to PATH '
+                             '(a directory of .y86t files with --batch)')
+    parser.add_argument('--trace-compression', choices=('none', 'zlib', 'lzma'),
+                        default='zlib', help='block compression of --trace files')
+    parser.add_argument('--uarch', metavar='SPEC', default=None,
+                        help='simulate branch predictor and caches, e.g. '
+                             '"predictor=2bit,icache=4096:2:64,dcache=4096:2:64"; '
+                             'prints hit rates and estimated cycles')
+    parser.add_argument('--time-startup', action='store_true',
+                        help='report import and total run time on stderr')
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        if not args.out:
+            parser.error('--batch requires --out')
+        if args.profile:
+            parser.error('--profile is not supported with --batch')
+        if args.checkpoint:
+            parser.error('--checkpoint is not supported with --batch')
+        if args.uarch is not None:
+            parser.error('--uarch is not supported with --batch (use sweep.py on --trace files)')
+    elif not (args.input_file and args.output_file):
+        parser.error('expected <input_file> <output_file> or --batch DIR --out DIR')
+    elif args.listing and not args.input_file.lower().endswith('.ys'):
+        parser.error('--listing requires a .ys input file')
+    if args.uarch is not None:
+        from src.uarch import parse_machine
+
+        if args.profile:
+            parser.error('--uarch cannot be combined with --profile')
+        if args.engine != 'interp':
+            parser.error('--uarch models every step and requires --engine interp')
+        try:
+            parse_machine(args.uarch)
+        except Y86Error as e:
+            parser.error(f'--uarch: {e}')
+    if args.trace and args.engine != 'interp':
+        parser.error('--trace records every step and requires --engine interp')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    if args.batch:
+        run_batch(args.batch, args.out, args.jobs, args.max_steps, args.time_limit,
+                  args.engine, args.image_cache, args.result_cache, args.trace,
+                  args.trace_compression)
+    else:
+        try:
+            if args.listing:
+                write_listing(args.input_file, args.listing)
+            main(args.input_file, args.output_file, args.max_steps, args.time_limit,
+                 args.engine, args.image_cache, args.result_cache, args.profile,
+                 args.checkpoint, args.trace, args.trace_compression, args.uarch)
+        finally:
+            if args.time_startup:
+                report_startup()
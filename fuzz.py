@@ -0,0 +1,46 @@
+import json
+import sys
+
+from src.cpu import ENGINES
+from src.fuzz import fuzz, DEFAULT_LENGTH, DEFAULT_MAX_STEPS
+
+
+def parse_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Differential fuzzing of the execution engines against Y86CPU.step')
+    parser.add_argument('--iterations', type=int, default=1000,
+                        help='number of random programs to check')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first program; program i uses seed+i')
+    parser.add_argument('--length', type=int, default=DEFAULT_LENGTH,
+                        help='random instructions per program')
+    parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS,
+                        help='stop each program after this many instructions')
+    parser.add_argument('--engine', action='append', choices=ENGINES, default=None,
+                        help='only check this engine (repeatable)')
+    parser.add_argument('--stop', action='store_true',
+                        help='stop at the first failing program')
+    parser.add_argument('--out', metavar='FILE', default=None,
+                        help='write failing programs as JSON to FILE')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    failures = fuzz(args.iterations, args.seed, args.length, args.engine or ENGINES,
+                    args.max_steps, args.stop)
+    for failure in failures:
+        fields = sorted({f"{item['engine']}:{item['field']}" for item in failure.mismatches})
+        print(f"seed {failure.seed}: mismatch in {', '.join(fields)}")
+        print(failure.shrunk_source)
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump([failure.to_dict() for failure in failures], file, indent=2)
+    print(f"{len(failures)} failing program(s)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
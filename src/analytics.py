@@ -0,0 +1,259 @@
+# src/analytics.py
+
+try:
+    import numpy as np
+except ImportError:  # NumPy是可选依赖，只有轨迹统计需要
+    np = None
+
+from .checkpoint import STATUS_CODES
+from .cpu import CONDITIONS
+from .decoder import REG_NAMES
+from .profiler import mnemonic
+from .tracefile import TraceReader, RECORD_SIZE, WROTE_MEMORY, trace_files
+from .utils import Y86Error
+
+# 内存访问直方图的默认粒度（字节），与常见的缓存行大小相同
+DEFAULT_GRANULARITY = 64
+# 栈深度曲线按归一化的执行进度取的点数
+DEFAULT_DEPTH_POINTS = 100
+
+MASK64 = (1 << 64) - 1
+_RSP = 4
+_HALT = 0x0
+_JUMP = 0x7
+_MRMOVQ = 0x5
+_RET = 0x9
+_POPQ = 0xB
+
+# 与src.tracefile中的定长记录逐字节对应
+RECORD_FIELDS = [
+    ('pc', '<u8'), ('valC', '<u8'), ('valP', '<u8'), ('code', 'u1'), ('regs', 'u1'),
+    ('status', 'u1'), ('cc', 'u1'), ('flags', 'u1'), ('register', 'u1'),
+    ('value', '<u8'), ('address', '<u8'), ('data', '<u8')
+]
+
+
+def _require_numpy():
+    if np is None:
+        raise Y86Error("NumPy is required for trace analytics (pip install numpy)")
+
+
+def record_dtype():
+    """轨迹记录的NumPy结构化类型"""
+    _require_numpy()
+    dtype = np.dtype(RECORD_FIELDS)
+    assert dtype.itemsize == RECORD_SIZE
+    return dtype
+
+
+def load_records(reader):
+    """把TraceReader中的全部记录载入一个结构化数组"""
+    dtype = record_dtype()
+    chunks = [np.frombuffer(block, dtype=dtype) for block in reader.blocks()]
+    if not chunks:
+        return np.zeros(0, dtype=dtype)
+    return np.concatenate(chunks)
+
+
+def register_series(records, register, initial):
+    """
+    第register个寄存器在每一步执行后的值（按64位无符号数），initial为开始时的值。
+    记录只保存改变的寄存器，这里向前填充；popq同时改变的%rsp由记录推出。
+    """
+    count = len(records)
+    changed = records['register'] == register
+    last = np.maximum.accumulate(np.where(changed, np.arange(count), -1))
+    known = last >= 0
+    series = np.where(known, records['value'][np.maximum(last, 0)],
+                      np.uint64(initial & MASK64))
+    if register == _RSP:
+        # popq rA（rA不是%rsp）只记录rA，%rsp隐含加8
+        implied = ((records['code'] >> 4) == _POPQ) & (records['register'] != _RSP) \
+            & (records['register'] < len(REG_NAMES))
+        added = np.cumsum(implied, dtype=np.uint64) * np.uint64(8)
+        series = series + added - np.where(known, added[np.maximum(last, 0)], np.uint64(0))
+    return series
+
+
+def _before(series, initial):
+    """每一步执行前的值"""
+    if not len(series):
+        return series
+    return np.concatenate(([np.uint64(initial & MASK64)], series[:-1]))
+
+
+def _histogram(addresses, granularity):
+    regions, counts = np.unique(addresses // np.uint64(granularity), return_counts=True)
+    return dict(zip((regions * np.uint64(granularity)).tolist(), counts.tolist()))
+
+
+def analyze_records(records, initial_registers, granularity=DEFAULT_GRANULARITY,
+                    points=DEFAULT_DEPTH_POINTS):
+    """
+    用向量化运算统计一条轨迹，返回字典:
+    - steps: 记录数；status: 最终状态
+    - mix: 长度256的数组，下标为icode<<4|ifun，值为执行次数（不含出错的那一步）
+    - branches: (16, 2)数组，每种条件跳转的执行次数与跳转次数
+    - reads/writes: {区域起始地址: 访问次数}，区域大小为granularity字节
+    - max_depth: 栈的最大深度（字节）；depth_curve: 按执行进度等分为points段，每段的最大栈深度
+    """
+    _require_numpy()
+    steps = len(records)
+    codes = records['code']
+    icodes = codes >> 4
+    status = records['status']
+    # 出错的那一步没有执行完，取指失败时记录的还是上一条指令
+    executed = (status == STATUS_CODES.index('AOK')) \
+        | ((status == STATUS_CODES.index('HLT')) & (icodes == _HALT))
+
+    mix = np.bincount(codes[executed], minlength=256)
+
+    jumps = executed & (icodes == _JUMP)
+    ifuns = codes[jumps] & 0xF
+    # jXX不改变条件码，由记录的条件码与ifun求出实际方向（跳转目标可能就是下一条指令）
+    taken = np.asarray(CONDITIONS, dtype=bool)[ifuns, records['cc'][jumps] & 0x7]
+    branches = np.stack([np.bincount(ifuns, minlength=16),
+                         np.bincount(ifuns[taken], minlength=16)], axis=1)
+
+    writes = records['address'][(records['flags'] & WROTE_MEMORY) != 0]
+
+    rsp = register_series(records, _RSP, initial_registers[_RSP])
+    rsp_before = _before(rsp, initial_registers[_RSP])
+    stack_reads = executed & ((icodes == _RET) | (icodes == _POPQ))
+    reads = [rsp_before[stack_reads]]
+    loads = executed & (icodes == _MRMOVQ)
+    bases = records['regs'][loads] & 0xF
+    for base in np.unique(bases).tolist():
+        if base >= len(REG_NAMES):
+            continue
+        series = rsp if base == _RSP else register_series(records, base,
+                                                          initial_registers[base])
+        selected = np.flatnonzero(loads)[bases == base]
+        reads.append(_before(series, initial_registers[base])[selected]
+                     + records['valC'][selected])
+    reads = np.concatenate(reads)
+
+    # 以%rsp的最大值为栈底；%rsp还未设置（为0）的步不计深度
+    depth = np.zeros(steps, dtype=np.int64)
+    if steps:
+        active = rsp != 0
+        if active.any():
+            base = rsp[active].max()
+            depth = np.where(active, (base - rsp).astype(np.int64), 0)
+    if steps:
+        bounds = np.unique(np.linspace(0, steps, min(points, steps) + 1).astype(np.int64)[:-1])
+        curve = np.maximum.reduceat(depth, bounds)
+    else:
+        curve = np.zeros(0, dtype=np.int64)
+
+    return {
+        'steps': steps,
+        'status': STATUS_CODES[int(status[-1])] if steps else None,
+        'mix': mix,
+        'branches': branches,
+        'reads': _histogram(reads, granularity),
+        'writes': _histogram(writes, granularity),
+        'max_depth': int(depth.max()) if steps else 0,
+        'depth_curve': curve
+    }
+
+
+def analyze_trace(path, granularity=DEFAULT_GRANULARITY, points=DEFAULT_DEPTH_POINTS):
+    """统计一个.y86t轨迹文件"""
+    with TraceReader(path) as reader:
+        records = load_records(reader)
+        initial = reader.initial_checkpoint().registers
+    return analyze_records(records, initial, granularity, points)
+
+
+def _add_counts(total, counts):
+    for key, value in counts.items():
+        total[key] = total.get(key, 0) + value
+
+
+class CohortStats:
+    """多条轨迹的汇总统计，逐条add()，每条轨迹的记录统计完即可丢弃"""
+
+    def __init__(self, granularity=DEFAULT_GRANULARITY, points=DEFAULT_DEPTH_POINTS):
+        _require_numpy()
+        self.granularity = granularity
+        self.points = points
+        self.traces = 0
+        self.steps = 0
+        self.status = {}
+        self.mix = np.zeros(256, dtype=np.int64)
+        self.branches = np.zeros((16, 2), dtype=np.int64)
+        self.reads = {}
+        self.writes = {}
+        self.max_depth = 0
+        self.depth_total = 0
+        # 各轨迹的栈深度曲线插值到相同的点数后求和
+        self.depth_curve = np.zeros(points, dtype=np.float64)
+        self.curves = 0
+
+    def add(self, result):
+        """加入一条轨迹的analyze_records结果"""
+        self.traces += 1
+        self.steps += result['steps']
+        _add_counts(self.status, {result['status']: 1})
+        self.mix += result['mix']
+        self.branches += result['branches']
+        _add_counts(self.reads, result['reads'])
+        _add_counts(self.writes, result['writes'])
+        self.max_depth = max(self.max_depth, result['max_depth'])
+        self.depth_total += result['max_depth']
+        curve = result['depth_curve']
+        if len(curve):
+            positions = np.linspace(0, 1, len(curve))
+            self.depth_curve += np.interp(np.linspace(0, 1, self.points), positions, curve)
+            self.curves += 1
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        mix = {mnemonic(code >> 4, code & 0xF): int(self.mix[code])
+               for code in np.flatnonzero(self.mix).tolist()}
+        branches = {}
+        for ifun in np.flatnonzero(self.branches[:, 0]).tolist():
+            executed, taken = self.branches[ifun].tolist()
+            branches[mnemonic(_JUMP, ifun)] = {
+                'executed': executed, 'taken': taken, 'taken_rate': taken / executed
+            }
+        regions = sorted(set(self.reads) | set(self.writes))
+        return {
+            'traces': self.traces,
+            'steps': self.steps,
+            'status': self.status,
+            'instruction_mix': dict(sorted(mix.items(), key=lambda item: -item[1])),
+            'branches': branches,
+            'memory': {
+                'granularity': self.granularity,
+                # [区域起始地址, 读次数, 写次数]
+                'regions': [[region, self.reads.get(region, 0), self.writes.get(region, 0)]
+                            for region in regions]
+            },
+            'stack_depth': {
+                'max': self.max_depth,
+                'mean_max': self.depth_total / max(self.traces, 1),
+                'curve': (self.depth_curve / max(self.curves, 1)).tolist()
+            }
+        }
+
+
+def analyze_cohort(paths, granularity=DEFAULT_GRANULARITY, points=DEFAULT_DEPTH_POINTS,
+                   progress=None):
+    """
+    一遍扫描全部轨迹文件并汇总，返回(CohortStats, 出错的文件列表[(路径, 错误)])。
+    每条轨迹统计完即丢弃，progress(path, result)在每条轨迹统计完后调用。
+    """
+    stats = CohortStats(granularity, points)
+    errors = []
+    for path in trace_files(paths):
+        try:
+            result = analyze_trace(path, granularity, points)
+        except (OSError, Y86Error) as e:
+            errors.append((path, str(e)))
+            continue
+        stats.add(result)
+        if progress is not None:
+            progress(path, result)
+    return stats, errors
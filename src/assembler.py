@@ -0,0 +1,282 @@
+# src/assembler.py
+
+import re
+
+from .decoder import REG_NAMES, RNONE
+from .loader import ProgramImage
+from .utils import AssemblyError
+
+# 汇编器版本，输出编码变化时递增以使镜像缓存失效
+ASSEMBLER_VERSION = 1
+
+REGISTERS = {name: index for index, name in enumerate(REG_NAMES)}
+
+# 助记符 -> (icode, ifun, 操作数格式)
+INSTRUCTIONS = {
+    'halt': (0x0, 0x0, ''),
+    'nop': (0x1, 0x0, ''),
+    'rrmovq': (0x2, 0x0, 'rr'),
+    'cmovle': (0x2, 0x1, 'rr'),
+    'cmovl': (0x2, 0x2, 'rr'),
+    'cmove': (0x2, 0x3, 'rr'),
+    'cmovne': (0x2, 0x4, 'rr'),
+    'cmovge': (0x2, 0x5, 'rr'),
+    'cmovg': (0x2, 0x6, 'rr'),
+    'irmovq': (0x3, 0x0, 'ir'),
+    'rmmovq': (0x4, 0x0, 'rm'),
+    'mrmovq': (0x5, 0x0, 'mr'),
+    'addq': (0x6, 0x0, 'rr'),
+    'subq': (0x6, 0x1, 'rr'),
+    'andq': (0x6, 0x2, 'rr'),
+    'xorq': (0x6, 0x3, 'rr'),
+    'jmp': (0x7, 0x0, 'd'),
+    'jle': (0x7, 0x1, 'd'),
+    'jl': (0x7, 0x2, 'd'),
+    'je': (0x7, 0x3, 'd'),
+    'jne': (0x7, 0x4, 'd'),
+    'jge': (0x7, 0x5, 'd'),
+    'jg': (0x7, 0x6, 'd'),
+    'call': (0x8, 0x0, 'd'),
+    'ret': (0x9, 0x0, ''),
+    'pushq': (0xA, 0x0, 'r'),
+    'popq': (0xB, 0x0, 'r'),
+}
+
+# 各操作数格式对应的指令长度
+LENGTHS = {'': 1, 'r': 2, 'rr': 2, 'ir': 10, 'rm': 10, 'mr': 10, 'd': 9}
+
+_LABEL = re.compile(r'^\s*([A-Za-z_.][\w.]*)\s*:')
+_MEMORY = re.compile(r'^(.*)\(\s*(%\w+)\s*\)$')
+_SYMBOL = re.compile(r'^[A-Za-z_.][\w.]*$')
+_COMMENT = re.compile(r'/\*.*?\*/|#.*$')
+
+
+class _Line:
+    """一行源码的汇编结果"""
+
+    __slots__ = ('lineno', 'text', 'addr', 'labelled', 'op', 'args', 'data')
+
+    def __init__(self, lineno, text, addr, op=None, args=()):
+        self.lineno = lineno
+        self.text = text
+        self.addr = addr
+        self.labelled = False
+        self.op = op
+        self.args = args
+        self.data = b''
+
+
+def _split_args(operands):
+    """按逗号拆分操作数，括号内的逗号不拆分"""
+    if not operands:
+        return []
+    args = []
+    depth = 0
+    current = ''
+    for char in operands:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            args.append(current.strip())
+            current = ''
+        else:
+            current += char
+    args.append(current.strip())
+    return args
+
+
+class Assembler:
+    """
+    两遍汇编器: 第一遍确定每行的地址并收集标号，第二遍生成机器码。
+    支持标号、.pos、.align、.quad以及全部Y86-64指令。
+    """
+
+    def __init__(self):
+        self.symbols = {}
+        self.lines = []
+
+    def error(self, line, message):
+        raise AssemblyError(f"Line {line.lineno}: {message}: {line.text.strip()}")
+
+    def first_pass(self, source):
+        addr = 0
+        for lineno, text in enumerate(source, 1):
+            text = text.rstrip('\n')
+            code = _COMMENT.sub('', text).strip()
+            line = _Line(lineno, text, addr)
+            self.lines.append(line)
+
+            match = _LABEL.match(code)
+            while match:
+                label = match.group(1)
+                if label in self.symbols:
+                    self.error(line, f"duplicate label '{label}'")
+                self.symbols[label] = addr
+                line.labelled = True
+                code = code[match.end():].strip()
+                match = _LABEL.match(code)
+            if not code:
+                continue
+
+            parts = code.split(None, 1)
+            op = parts[0]
+            line.args = _split_args(parts[1] if len(parts) > 1 else '')
+            line.op = op
+
+            if op == '.pos':
+                addr = self.constant(line, line.args)
+                line.addr = addr
+            elif op == '.align':
+                alignment = self.constant(line, line.args)
+                if alignment <= 0:
+                    self.error(line, "invalid alignment")
+                addr = -(-addr // alignment) * alignment
+                line.addr = addr
+            elif op == '.quad':
+                if len(line.args) != 1:
+                    self.error(line, ".quad takes one operand")
+                addr += 8
+            elif op in INSTRUCTIONS:
+                addr += LENGTHS[INSTRUCTIONS[op][2]]
+            else:
+                self.error(line, f"unknown instruction '{op}'")
+
+    def constant(self, line, args):
+        """.pos/.align的参数必须是数字"""
+        if len(args) != 1:
+            self.error(line, f"{line.op} takes one operand")
+        try:
+            return int(args[0], 0)
+        except ValueError:
+            self.error(line, f"invalid number '{args[0]}'")
+
+    def value(self, line, text):
+        """解析数字或标号"""
+        text = text.strip()
+        if text.startswith('$'):
+            text = text[1:].strip()
+        if _SYMBOL.match(text):
+            if text not in self.symbols:
+                self.error(line, f"undefined label '{text}'")
+            return self.symbols[text]
+        try:
+            return int(text, 0)
+        except ValueError:
+            pass
+        try:
+            # 允许带前导零的十进制数
+            return int(text, 10)
+        except ValueError:
+            self.error(line, f"invalid value '{text}'")
+
+    def register(self, line, text):
+        name = text.strip()
+        if not name.startswith('%') or name[1:] not in REGISTERS:
+            self.error(line, f"invalid register '{name}'")
+        return REGISTERS[name[1:]]
+
+    def memory_operand(self, line, text):
+        """解析D(%reg)形式的内存操作数，偏移量可以省略"""
+        match = _MEMORY.match(text.strip())
+        if not match:
+            self.error(line, f"invalid memory operand '{text}'")
+        displacement = match.group(1).strip()
+        return (self.value(line, displacement) if displacement else 0,
+                self.register(line, match.group(2)))
+
+    def encode(self, line):
+        """第二遍: 生成一行的机器码"""
+        op = line.op
+        args = line.args
+        if op == '.quad':
+            return self.quad(line, self.value(line, args[0]))
+
+        icode, ifun, form = INSTRUCTIONS[op]
+        if len(args) != len(form):
+            self.error(line, f"'{op}' expects {len(form)} operand(s)")
+
+        head = bytes([(icode << 4) | ifun])
+        if form == '':
+            return head
+        if form == 'r':
+            return head + bytes([(self.register(line, args[0]) << 4) | RNONE])
+        if form == 'rr':
+            rA = self.register(line, args[0])
+            rB = self.register(line, args[1])
+            return head + bytes([(rA << 4) | rB])
+        if form == 'ir':
+            rB = self.register(line, args[1])
+            return (head + bytes([(RNONE << 4) | rB])
+                    + self.quad(line, self.value(line, args[0])))
+        if form == 'rm':
+            rA = self.register(line, args[0])
+            valC, rB = self.memory_operand(line, args[1])
+            return head + bytes([(rA << 4) | rB]) + self.quad(line, valC)
+        if form == 'mr':
+            valC, rB = self.memory_operand(line, args[0])
+            rA = self.register(line, args[1])
+            return head + bytes([(rA << 4) | rB]) + self.quad(line, valC)
+        # 'd': jXX/call
+        return head + self.quad(line, self.value(line, args[0]))
+
+    def quad(self, line, value):
+        if not -(1 << 63) <= value < (1 << 64):
+            self.error(line, f"value out of range: {value}")
+        return (value & ((1 << 64) - 1)).to_bytes(8, 'little')
+
+    def second_pass(self):
+        for line in self.lines:
+            if line.op is not None and line.op not in ('.pos', '.align'):
+                line.data = self.encode(line)
+
+    def image(self):
+        """按地址顺序合并为连续段"""
+        segments = []
+        for line in self.lines:
+            if not line.data:
+                continue
+            if segments and segments[-1][0] + len(segments[-1][1]) == line.addr:
+                segments[-1][1].extend(line.data)
+            else:
+                segments.append((line.addr, bytearray(line.data)))
+        return ProgramImage(segments)
+
+    def listing(self):
+        """生成与yas输出格式一致的.yo清单"""
+        output = []
+        for line in self.lines:
+            if line.data:
+                output.append(f"0x{line.addr:03x}: {line.data.hex():<20} | {line.text}")
+            elif line.op is not None or line.labelled:
+                output.append(f"0x{line.addr:03x}: {'':20} | {line.text}")
+            else:
+                output.append(f"{'':28}| {line.text}")
+        return '\n'.join(output) + '\n'
+
+
+def _run(source):
+    if isinstance(source, str):
+        source = source.splitlines()
+    assembler = Assembler()
+    assembler.first_pass(source)
+    assembler.second_pass()
+    return assembler
+
+
+def assemble(source):
+    """汇编.ys源码（字符串或按行迭代的文本文件对象），返回ProgramImage"""
+    return _run(source).image()
+
+
+def assemble_listing(source):
+    """汇编.ys源码，返回(ProgramImage, .yo清单文本)"""
+    assembler = _run(source)
+    return assembler.image(), assembler.listing()
+
+
+def assemble_file(path):
+    """汇编磁盘上的.ys文件"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        return assemble(file)
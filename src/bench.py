@@ -0,0 +1,187 @@
+# src/bench.py
+
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+from .cpu import Y86CPU, ENGINES, ENGINE_VERSION
+from .loader import read_program_file
+from .memory import Memory, SparseMemory
+from .trace import DeltaTrace
+from .utils import Y86Error
+
+# 基准结果文件的格式版本
+RESULT_VERSION = 1
+
+# 可选的内存实现
+MEMORY_BACKENDS = {'paged': Memory, 'sparse': SparseMemory}
+
+# 计时重复次数（取最好的一次），每个程序的指令数上限
+DEFAULT_REPEAT = 3
+DEFAULT_MAX_STEPS = 10000000
+# 测量轨迹大小时最多记录的步数
+TRACE_STEPS = 10000
+# 比较结果时视为退化的相对变化
+DEFAULT_THRESHOLD = 0.2
+
+# 比较时检查的指标: 指标名 -> 数值越大越好
+METRICS = {'ips': True, 'load_time': False, 'peak_memory': False, 'trace_bytes': False}
+
+
+def corpus_files(directory):
+    """返回目录下按文件名排序的.yo/.ys程序路径"""
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.endswith(('.yo', '.ys'))]
+
+
+def program_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def measure_load(path, memory_factory):
+    """解析并加载程序，返回(已加载的CPU, 耗时秒数)"""
+    start = time.perf_counter()
+    program = read_program_file(path)
+    if not program:
+        raise Y86Error(f"No valid program found in {path}")
+    cpu = Y86CPU(memory_factory)
+    cpu.load_program(program)
+    return cpu, time.perf_counter() - start
+
+
+def measure_peak_memory(path, memory_factory, engine, max_steps):
+    """加载并执行期间Python堆内存的峰值（字节），单独执行一次以免影响计时"""
+    tracemalloc.start()
+    try:
+        cpu, _ = measure_load(path, memory_factory)
+        cpu.run(max_steps, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_trace(path, max_steps=TRACE_STEPS):
+    """逐步记录增量轨迹，返回记录的步数与JSON序列化后的字节数"""
+    cpu, _ = measure_load(path, Memory)
+    trace = DeltaTrace(cpu)
+    steps = 0
+    while steps < max_steps:
+        ok = cpu.step()
+        trace.record()
+        if not ok:
+            break
+        steps += 1
+    size = len(json.dumps(trace.to_dict(), separators=(',', ':')))
+    trace.close()
+    return {'trace_steps': len(trace) - 1, 'trace_bytes': size}
+
+
+def bench_program(path, engine='interp', memory='paged', repeat=DEFAULT_REPEAT,
+                  max_steps=DEFAULT_MAX_STEPS):
+    """
+    对一个程序在指定引擎与内存实现下计时，返回一行结果。
+    load_time与run_time取repeat次中最快的一次，ips为每秒执行的指令数。
+    """
+    memory_factory = MEMORY_BACKENDS[memory]
+    load_time = run_time = None
+    for _ in range(repeat):
+        cpu, elapsed = measure_load(path, memory_factory)
+        load_time = elapsed if load_time is None else min(load_time, elapsed)
+        start = time.perf_counter()
+        state, steps = cpu.run(max_steps, engine)
+        elapsed = time.perf_counter() - start
+        run_time = elapsed if run_time is None else min(run_time, elapsed)
+
+    return {
+        'program': program_name(path),
+        'engine': engine,
+        'memory': memory,
+        'status': state['status'],
+        'instructions': steps,
+        'load_time': load_time,
+        'run_time': run_time,
+        'ips': steps / run_time if run_time else 0.0,
+        'peak_memory': measure_peak_memory(path, memory_factory, engine, max_steps)
+    }
+
+
+def run_benchmarks(paths, engines=ENGINES, memories=tuple(MEMORY_BACKENDS),
+                   repeat=DEFAULT_REPEAT, max_steps=DEFAULT_MAX_STEPS, progress=None):
+    """
+    对每个程序、引擎与内存实现的组合运行基准，返回可JSON序列化的结果。
+    轨迹大小与引擎无关，每个程序只测量一次并附加到该程序的每一行。
+    progress为回调时每完成一行调用progress(row)。
+    """
+    for memory in memories:
+        if memory not in MEMORY_BACKENDS:
+            raise Y86Error(f"Unknown memory backend: {memory}")
+    for engine in engines:
+        if engine not in ENGINES:
+            raise Y86Error(f"Unknown engine: {engine}")
+
+    results = []
+    for path in paths:
+        trace = measure_trace(path)
+        for engine in engines:
+            for memory in memories:
+                row = bench_program(path, engine, memory, repeat, max_steps)
+                row.update(trace)
+                results.append(row)
+                if progress is not None:
+                    progress(row)
+
+    return {
+        'version': RESULT_VERSION,
+        'engine_version': ENGINE_VERSION,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'created': time.time(),
+        'repeat': repeat,
+        'max_steps': max_steps,
+        'results': results
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    与基线结果比较，返回退化列表。
+    ips下降或其他指标上升超过threshold（相对值）即视为退化，
+    只比较两边都存在的(程序, 引擎, 内存实现)组合。
+    """
+    def key(row):
+        return row['program'], row['engine'], row['memory']
+
+    previous = {key(row): row for row in baseline['results']}
+    regressions = []
+    for row in current['results']:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before = old.get(metric)
+            after = row.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append({
+                    'program': row['program'], 'engine': row['engine'],
+                    'memory': row['memory'], 'metric': metric,
+                    'baseline': before, 'current': after, 'change': change
+                })
+    return regressions
+
+
+def format_row(row):
+    """把一行结果格式化为一行文本"""
+    return (f"{row['program']:<12} {row['engine']:<7} {row['memory']:<7} "
+            f"{row['instructions']:>10} {row['ips'] / 1e6:>8.3f} "
+            f"{row['load_time'] * 1000:>9.2f} {row['peak_memory'] / 1024:>10.0f} "
+            f"{row['trace_bytes'] / max(row['trace_steps'], 1):>8.1f}")
+
+
+TABLE_HEADER = (f"{'program':<12} {'engine':<7} {'memory':<7} {'instr':>10} "
+                f"{'Minstr/s':>8} {'load(ms)':>9} {'peak(KiB)':>10} {'B/step':>8}")
@@ -0,0 +1,198 @@
+# src/breakpoints.py
+
+import operator
+
+from .decoder import REG_NAMES
+from .utils import Y86Error
+
+MASK64 = (1 << 64) - 1
+SIGN_BIT = 1 << 63
+# 观察点默认监视的字节数（一个四字）
+DEFAULT_WATCH_SIZE = 8
+
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge
+}
+
+
+def _signed(value):
+    """按64位有符号数解释寄存器值（寄存器中可能是有符号或无符号的Python整数）"""
+    value &= MASK64
+    return value - (1 << 64) if value & SIGN_BIT else value
+
+
+def _integer(value, name):
+    """把JSON中的整数或'0x..'形式的字符串转换为整数"""
+    if isinstance(value, bool):
+        raise Y86Error(f"Invalid {name}: {value!r}")
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value), 0)
+    except ValueError:
+        raise Y86Error(f"Invalid {name}: {value!r}") from None
+
+
+class Condition:
+    """寄存器条件，例如%rax == 5，按64位有符号数比较"""
+
+    __slots__ = ('register', 'op', 'value', '_index', '_compare')
+
+    def __init__(self, register, op, value):
+        register = register.lstrip('%')
+        if register not in REG_NAMES:
+            raise Y86Error(f"Unknown register: {register}")
+        if op not in COMPARISONS:
+            raise Y86Error(f"Unknown comparison: {op}")
+        self.register = register
+        self.op = op
+        self.value = _signed(value)
+        self._index = REG_NAMES.index(register)
+        self._compare = COMPARISONS[op]
+
+    def check(self, regs):
+        return self._compare(_signed(regs[self._index]), self.value)
+
+    def to_dict(self):
+        return {'register': self.register, 'op': self.op, 'value': self.value}
+
+
+class Breakpoints:
+    """
+    断点集合: PC断点、内存写入观察点（地址区间）与寄存器条件。
+    PC断点在执行到该地址的指令之前停下；观察点在写入区间的指令执行完后停下；
+    寄存器条件在某条指令执行完后条件成立时停下。
+    """
+
+    def __init__(self):
+        self.pcs = set()
+        # [(起始地址, 结束地址)]，不包括结束地址
+        self.watchpoints = []
+        self.conditions = []
+
+    def __bool__(self):
+        return bool(self.pcs or self.watchpoints or self.conditions)
+
+    def add_breakpoint(self, pc):
+        self.pcs.add(pc)
+
+    def add_watchpoint(self, address, size=DEFAULT_WATCH_SIZE):
+        if size < 1:
+            raise Y86Error(f"Invalid watchpoint size: {size}")
+        self.watchpoints.append((address, address + size))
+
+    def add_condition(self, register, op, value):
+        self.conditions.append(Condition(register, op, value))
+
+    def clear(self):
+        self.pcs.clear()
+        self.watchpoints.clear()
+        self.conditions.clear()
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典，格式与from_dict接受的相同"""
+        return {
+            'pcs': sorted(self.pcs),
+            'watchpoints': [{'address': start, 'size': end - start}
+                            for start, end in self.watchpoints],
+            'conditions': [condition.to_dict() for condition in self.conditions]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        从字典创建断点集合:
+        {'pcs': [地址], 'watchpoints': [{'address', 'size'}], 'conditions': [{'register', 'op', 'value'}]}
+        地址与数值可以是整数或'0x..'字符串，格式错误时抛出Y86Error。
+        """
+        if not isinstance(data, dict):
+            raise Y86Error("Breakpoints must be an object")
+        breakpoints = cls()
+        try:
+            for pc in data.get('pcs') or ():
+                breakpoints.add_breakpoint(_integer(pc, 'breakpoint address'))
+            for watch in data.get('watchpoints') or ():
+                breakpoints.add_watchpoint(
+                    _integer(watch['address'], 'watchpoint address'),
+                    _integer(watch.get('size', DEFAULT_WATCH_SIZE), 'watchpoint size'))
+            for condition in data.get('conditions') or ():
+                breakpoints.add_condition(str(condition['register']),
+                                          condition.get('op', '=='),
+                                          _integer(condition['value'], 'condition value'))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise Y86Error(f"Invalid breakpoint specification: {e}") from None
+        return breakpoints
+
+
+def run_until(cpu, breakpoints, max_steps=None, step=None):
+    """
+    从当前状态执行，直到命中断点、停机、出错或执行满max_steps条指令。
+    step为执行一步的函数，默认cpu.step。返回{'reason', 'hit', 'steps'}:
+    reason为'breakpoint'/'watchpoint'/'condition'/'halt'/'error'/'limit'，
+    hit为命中的断点（{'pc'}、{'address', 'size'}或寄存器条件），其他情况为None。
+    从断点所在的PC开始执行时不会立即停下，便于从断点处继续运行。
+    只有PC断点且不需要逐步回调时由Y86CPU.run的解释循环直接检查，
+    观察点与寄存器条件才逐条执行。
+    """
+    pcs = breakpoints.pcs
+    conditions = breakpoints.conditions
+    watchpoints = breakpoints.watchpoints
+    if (step is None and not watchpoints and not conditions
+            and cpu.profiler is None and cpu.uarch is None):
+        return _run_to_pc(cpu, pcs, max_steps)
+    if step is None:
+        step = cpu.step
+    writes = []
+
+    def on_write(addr, size):
+        for start, end in watchpoints:
+            if addr < end and addr + size > start:
+                writes.append({'address': addr, 'size': size})
+                return
+
+    observers = cpu.memory.observers
+    if watchpoints:
+        observers.append(on_write)
+    steps = 0
+    reason = hit = None
+    try:
+        while reason is None:
+            if cpu.status != 'AOK':
+                reason = 'halt' if cpu.status == 'HLT' else 'error'
+                break
+            if max_steps is not None and steps >= max_steps:
+                reason = 'limit'
+                break
+            if step():
+                steps += 1
+            if writes:
+                reason, hit = 'watchpoint', writes[0]
+            elif cpu.status == 'AOK':
+                if cpu.pc in pcs:
+                    reason, hit = 'breakpoint', {'pc': cpu.pc}
+                elif conditions:
+                    regs = cpu.regs
+                    for condition in conditions:
+                        if condition.check(regs):
+                            reason, hit = 'condition', condition.to_dict()
+                            break
+    finally:
+        if on_write in observers:
+            observers.remove(on_write)
+    return {'reason': reason, 'hit': hit, 'steps': steps}
+
+
+def _run_to_pc(cpu, pcs, max_steps):
+    """只有PC断点时的快速路径，结果与逐条执行相同"""
+    _, steps = cpu.run(max_steps, stop_pcs=pcs)
+    if cpu.status != 'AOK':
+        return {'reason': 'halt' if cpu.status == 'HLT' else 'error', 'hit': None,
+                'steps': steps}
+    if steps and cpu.pc in pcs:
+        return {'reason': 'breakpoint', 'hit': {'pc': cpu.pc}, 'steps': steps}
+    return {'reason': 'limit', 'hit': None, 'steps': steps}
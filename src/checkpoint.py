@@ -0,0 +1,161 @@
+# src/checkpoint.py
+
+import os
+import struct
+import zlib
+
+from .decoder import REG_NAMES
+from .utils import ParseError
+
+# 检查点格式: 文件头(魔数, 版本)之后是zlib压缩的正文；
+# 正文为状态头、寄存器与PC等数值、当前指令，以及与程序镜像相同的(地址, 长度)加原始字节的内存段
+CHECKPOINT_MAGIC = b'Y86C'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = '.ckpt'
+_HEADER = struct.Struct('<4sH')
+# 状态编号, 条件码, 负值位图, 内存段数
+_STATE = struct.Struct('<BBII')
+# 各寄存器、PC、valC、valP，按64位无符号保存，负数记录在负值位图中
+_VALUES = struct.Struct(f'<{len(REG_NAMES) + 3}Q')
+# icode, ifun, rA, rB
+_INSTRUCTION = struct.Struct('<BBBB')
+_SEGMENT = struct.Struct('<QI')
+
+STATUS_CODES = ('AOK', 'HLT', 'ADR', 'INS')
+MASK64 = (1 << 64) - 1
+# 压缩级别: 检查点主要是内存页，最快的级别已能压缩掉绝大部分零字节
+COMPRESS_LEVEL = 1
+
+
+def _signed(value, negative):
+    return value - (1 << 64) if negative else value
+
+
+class Checkpoint:
+    """
+    CPU完整状态的检查点: 寄存器、条件码、PC、状态、当前指令与非零内存段。
+    寄存器、PC等按Python整数的原值保存（负数记录在位图中），恢复后get_state()完全一致。
+    """
+
+    __slots__ = ('registers', 'cc', 'pc', 'status', 'instruction', 'segments')
+
+    def __init__(self, registers, cc, pc, status, instruction, segments):
+        self.registers = list(registers)
+        self.cc = cc
+        self.pc = pc
+        self.status = status
+        self.instruction = tuple(instruction)
+        self.segments = [(addr, bytes(data)) for addr, data in segments if data]
+
+    @classmethod
+    def capture(cls, cpu):
+        """从CPU当前状态创建检查点"""
+        inst = cpu.curr_inst
+        instruction = (inst.icode, inst.ifun, inst.rA, inst.rB, inst.valC, inst.valP)
+        return cls(cpu.regs, cpu.cc, cpu.pc, cpu.status, instruction,
+                   cpu.memory.segments())
+
+    def apply(self, cpu):
+        """把检查点的状态写入CPU，内存先清空再按段写入"""
+        cpu.regs[:] = self.registers
+        cpu.cc = self.cc
+        cpu.pc = self.pc
+        cpu.status = self.status
+        cpu.curr_inst.load(self.instruction)
+        cpu.memory.clear()
+        for addr, data in self.segments:
+            cpu.memory.write_bytes(addr, data)
+
+    def __eq__(self, other):
+        if not isinstance(other, Checkpoint):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def to_bytes(self):
+        """序列化为压缩的二进制格式"""
+        icode, ifun, rA, rB, valC, valP = self.instruction
+        values = self.registers + [self.pc, valC, valP]
+        negative = 0
+        for index, value in enumerate(values):
+            if value < 0:
+                negative |= 1 << index
+        parts = [
+            _STATE.pack(STATUS_CODES.index(self.status), self.cc, negative,
+                        len(self.segments)),
+            _VALUES.pack(*(value & MASK64 for value in values)),
+            _INSTRUCTION.pack(icode, ifun, rA, rB)
+        ]
+        for addr, data in self.segments:
+            parts.append(_SEGMENT.pack(addr, len(data)))
+            parts.append(data)
+        body = zlib.compress(b''.join(parts), COMPRESS_LEVEL)
+        return _HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION) + body
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """从to_bytes的结果恢复检查点"""
+        if len(blob) < _HEADER.size:
+            raise ParseError("Truncated checkpoint")
+        magic, version = _HEADER.unpack_from(blob, 0)
+        if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+            raise ParseError("Unsupported checkpoint format")
+        try:
+            view = memoryview(zlib.decompress(blob[_HEADER.size:]))
+        except zlib.error:
+            raise ParseError("Corrupted checkpoint") from None
+
+        fixed = _STATE.size + _VALUES.size + _INSTRUCTION.size
+        if len(view) < fixed:
+            raise ParseError("Truncated checkpoint")
+        status, cc, negative, count = _STATE.unpack_from(view, 0)
+        if status >= len(STATUS_CODES):
+            raise ParseError("Invalid checkpoint status")
+        values = [_signed(value, (negative >> index) & 1) for index, value
+                  in enumerate(_VALUES.unpack_from(view, _STATE.size))]
+        registers = values[:len(REG_NAMES)]
+        pc, valC, valP = values[len(REG_NAMES):]
+        instruction = _INSTRUCTION.unpack_from(view, _STATE.size + _VALUES.size) + (valC, valP)
+
+        segments = []
+        pos = fixed
+        for _ in range(count):
+            if pos + _SEGMENT.size > len(view):
+                raise ParseError("Truncated checkpoint")
+            addr, length = _SEGMENT.unpack_from(view, pos)
+            pos += _SEGMENT.size
+            if pos + length > len(view):
+                raise ParseError("Truncated checkpoint")
+            segments.append((addr, bytes(view[pos:pos + length])))
+            pos += length
+        if pos != len(view):
+            raise ParseError("Trailing data in checkpoint")
+
+        return cls(registers, cc, pc, STATUS_CODES[status], instruction, segments)
+
+
+def is_checkpoint(path):
+    """按扩展名判断是否为检查点文件"""
+    return path.lower().endswith(CHECKPOINT_SUFFIX)
+
+
+def write_checkpoint(cpu, path):
+    """把CPU状态写入检查点文件（先写临时文件再替换，不会留下半个文件）"""
+    import tempfile
+
+    blob = Checkpoint.capture(cpu).to_bytes()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(blob)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(blob)
+
+
+def read_checkpoint(path):
+    """读取检查点文件"""
+    with open(path, 'rb') as file:
+        return Checkpoint.from_bytes(file.read())
@@ -1,52 +1,220 @@
 # from typing import Dict, List, Tuple, Union
 from .memory import Memory
+from .decoder import DecodeCache, DecodedInstruction, RNONE, REG_NAMES, FLAG_BITS
+from .loader import ProgramImage
 from .utils import Y86Error, MemoryError, InvalidInstructionError
+# 执行引擎、剖析器、检查点与断点只在用到时才导入，不增加命令行的启动开销
 
 # import logging
 #
 # # 配置logging
 # logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 可选的执行引擎: 'interp'为解释执行循环，'block'为基本块编译执行，
+# 'pipe'为逐条执行并按PIPE流水线模型统计周期
+ENGINES = ('interp', 'block', 'pipe')
+
+# 指令语义版本，语义变化时递增以使结果缓存失效
+ENGINE_VERSION = 3
+
+MASK64 = (1 << 64) - 1
+
+# 寄存器名 -> 编号
+REG_INDEX = {name: index for index, name in enumerate(REG_NAMES)}
+
+
+def _condition(ifun, cc):
+    zf = cc & 1
+    sf = (cc >> 1) & 1
+    of = (cc >> 2) & 1
+    if ifun == 0:  # 无条件
+        return True
+    elif ifun == 1:  # le
+        return bool((sf ^ of) | zf)
+    elif ifun == 2:  # l
+        return bool(sf ^ of)
+    elif ifun == 3:  # e
+        return bool(zf)
+    elif ifun == 4:  # ne
+        return not zf
+    elif ifun == 5:  # ge
+        return not (sf ^ of)
+    elif ifun == 6:  # g
+        return not (sf ^ of) and not zf
+    return False
+
+
+# CONDITIONS[ifun][cc]: cmovXX/jXX在给定条件码下是否成立
+CONDITIONS = tuple(tuple(_condition(ifun, cc) for cc in range(8)) for ifun in range(16))
+
+
+class RegisterView:
+    """按寄存器名访问寄存器数组的视图，保持原先字典的使用方式"""
+    __slots__ = ('regs',)
+
+    def __init__(self, regs):
+        self.regs = regs
+
+    def __getitem__(self, name):
+        return self.regs[REG_INDEX[name]]
+
+    def __setitem__(self, name, value):
+        self.regs[REG_INDEX[name]] = value
+
+    def __iter__(self):
+        return iter(REG_NAMES)
+
+    def __len__(self):
+        return len(REG_NAMES)
+
+    def __eq__(self, other):
+        return self.copy() == dict(other)
+
+    def keys(self):
+        return list(REG_NAMES)
+
+    def values(self):
+        return list(self.regs)
+
+    def items(self):
+        return list(zip(REG_NAMES, self.regs))
+
+    def update(self, values):
+        for name, value in values.items():
+            self[name] = value
+
+    def copy(self):
+        return dict(zip(REG_NAMES, self.regs))
+
+
+class FlagsView:
+    """按名字访问打包条件码的视图，保持原先字典的使用方式"""
+    __slots__ = ('cpu',)
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+
+    def __getitem__(self, name):
+        return (self.cpu.cc >> FLAG_BITS[name]) & 1
+
+    def __setitem__(self, name, value):
+        bit = 1 << FLAG_BITS[name]
+        if value:
+            self.cpu.cc |= bit
+        else:
+            self.cpu.cc &= ~bit
+
+    def __iter__(self):
+        return iter(FLAG_BITS)
+
+    def __len__(self):
+        return len(FLAG_BITS)
+
+    def __eq__(self, other):
+        return self.copy() == dict(other)
+
+    def keys(self):
+        return list(FLAG_BITS)
+
+    def items(self):
+        return list(self.copy().items())
+
+    def update(self, values):
+        for name, value in values.items():
+            self[name] = value
+
+    def copy(self):
+        cc = self.cpu.cc
+        return {'ZF': cc & 1, 'SF': (cc >> 1) & 1, 'OF': (cc >> 2) & 1}
+
+
 class Y86CPU:
-    def __init__(self):
-        # 初始化寄存器
-        self.registers = {
-            'rax': 0, 'rcx': 0, 'rdx': 0, 'rbx': 0,
-            'rsp': 0, 'rbp': 0, 'rsi': 0, 'rdi': 0,
-            'r8': 0, 'r9': 0, 'r10': 0, 'r11': 0,
-            'r12': 0, 'r13': 0, 'r14': 0
-        }
+    __slots__ = ('regs', 'cc', 'status', 'pc', 'decode_cache', 'memory_factory',
+                 'memory', 'loaded_image', 'block_engine', 'pipeline', 'profiler', 'uarch',
+                 '_inst', 'handlers')
 
-        # 寄存器编号映射
-        self.reg_map = {
-            0: 'rax', 1: 'rcx', 2: 'rdx', 3: 'rbx',
-            4: 'rsp', 5: 'rbp', 6: 'rsi', 7: 'rdi',
-            8: 'r8', 9: 'r9', 10: 'r10', 11: 'r11',
-            12: 'r12', 13: 'r13', 14: 'r14'
-        }
+    def __init__(self, memory_factory=Memory):
+        # 初始化寄存器，按寄存器编号存放
+        self.regs = [0] * len(REG_NAMES)
 
-        # 状态标志
-        self.flags = {'ZF': 0, 'SF': 0, 'OF': 0}
+        # 状态标志，打包为一个整数: bit0=ZF, bit1=SF, bit2=OF
+        self.cc = 0
 
         # CPU状态
         self.status = 'AOK'
         self.pc = 0
 
+        # 已解码指令缓存
+        self.decode_cache = DecodeCache()
+
         # 内存管理器
-        self.memory = Memory()
+        self.memory_factory = memory_factory
+        self.memory = memory_factory()
+        self.memory.observers.append(self.decode_cache.invalidate)
+
+        # 加载完成时的快照
+        self.loaded_image = None
+
+        # 基本块编译引擎，首次使用时创建
+        self.block_engine = None
+        self.pipeline = None
+
+        # 执行剖析器，enable_profiling()开启后才存在
+        self.profiler = None
+
+        # 微体系结构模型（src.uarch.Microarchitecture），attach_uarch()挂载后才存在
+        self.uarch = None
 
         # 当前指令信息
-        self.curr_inst = {
-            'icode': 0,
-            'ifun': 0,
-            'rA': 0,
-            'rB': 0,
-            'valC': 0,
-            'valP': 0
-        }
+        self._inst = DecodedInstruction()
+
+        # 按icode索引的执行函数表
+        self.handlers = [
+            self.execute_halt,            # 0x0 halt
+            self.execute_nop,             # 0x1 nop
+            self.execute_move,            # 0x2 rrmovq/cmovXX
+            self.execute_immediate_move,  # 0x3 irmovq
+            self.execute_memory_store,    # 0x4 rmmovq
+            self.execute_memory_load,     # 0x5 mrmovq
+            self.execute_operation,       # 0x6 OPq
+            self.execute_jump,            # 0x7 jXX
+            self.execute_call,            # 0x8 call
+            self.execute_return,          # 0x9 ret
+            self.execute_push,            # 0xA pushq
+            self.execute_pop,             # 0xB popq
+        ] + [None] * 4
+
+    @property
+    def registers(self):
+        """按寄存器名访问的寄存器视图"""
+        return RegisterView(self.regs)
+
+    @registers.setter
+    def registers(self, values):
+        self.regs[:] = [values.get(name, 0) for name in REG_NAMES]
+
+    @property
+    def flags(self):
+        """按名字访问的条件码视图"""
+        return FlagsView(self)
+
+    @flags.setter
+    def flags(self, values):
+        self.cc = ((1 if values.get('ZF') else 0)
+                   | (2 if values.get('SF') else 0)
+                   | (4 if values.get('OF') else 0))
+
+    @property
+    def curr_inst(self):
+        """当前指令信息"""
+        return self._inst
+
+    @curr_inst.setter
+    def curr_inst(self, fields):
+        self._inst.update(fields)
 
     def load_program(self, program):
-        """加载程序到内存"""
+        """加载程序到内存，program为ProgramImage或{地址: 字节}字典"""
         try:
             # 重置CPU状态
             self.reset()
@@ -54,18 +222,27 @@ class Y86CPU:
             if not program:
                 raise Y86Error("Empty program")
 
-            # 找到程序的最小起始地址
-            min_addr = min(program.keys())
+            if isinstance(program, ProgramImage):
+                # 按段批量写入
+                min_addr = program.entry
+                for addr, data in program.segments:
+                    self.memory.write_bytes(addr, data)
+            else:
+                # 找到程序的最小起始地址
+                min_addr = min(program.keys())
 
-            # 将程序加载到内存
-            for addr, value in program.items():
-                # print(f"Loading byte: addr=0x{addr:x}, value=0x{value:02x}")  # Debug print
-                self.memory.write_byte(addr, value)
+                # 将程序加载到内存
+                for addr, value in program.items():
+                    # print(f"Loading byte: addr=0x{addr:x}, value=0x{value:02x}")  # Debug print
+                    self.memory.write_byte(addr, value)
 
             # 设置PC为程序的起始地址
             self.pc = min_addr
             # print(f"Setting initial PC to: 0x{self.pc:x}")  # Debug print
 
+            # 记录加载后的镜像，供rewind/fork复用
+            self.loaded_image = self.snapshot()
+
             # 获取初始状态
             initial_state = self.get_state()
             # print(f"Initial CPU state: {initial_state}")  # Debug print
@@ -81,69 +258,90 @@ class Y86CPU:
         current_pc = self.pc
 
         # 重置寄存器
-        for reg in self.registers:
-            self.registers[reg] = 0
+        self.regs[:] = [0] * len(REG_NAMES)
 
         # 重置标志位
-        self.flags = {'ZF': 0, 'SF': 0, 'OF': 0}
+        self.cc = 0
 
         # 重置状态（但保持PC不变）
         self.status = 'AOK'
 
-        # 清空内存
-        self.memory = Memory()
+        # 清空内存及已解码指令缓存
+        self.memory.clear()
+        self.decode_cache.clear()
+        self.loaded_image = None
+        if self.pipeline is not None:
+            self.pipeline.reset()
+        if self.profiler is not None:
+            self.profiler.reset()
+        if self.uarch is not None:
+            self.uarch.reset()
 
         # 重置当前指令信息
-        self.curr_inst = {
-            'icode': 0,
-            'ifun': 0,
-            'rA': 0,
-            'rB': 0,
-            'valC': 0,
-            'valP': 0
-        }
+        self._inst.load((0, 0, 0, 0, 0, 0))
 
         # 恢复PC值
         self.pc = current_pc
 
+    def snapshot(self):
+        """创建CPU快照，内存页以写时复制方式共享"""
+        return {
+            'registers': self.registers.copy(),
+            'flags': self.flags.copy(),
+            'pc': self.pc,
+            'status': self.status,
+            'current_instruction': self.curr_inst.copy(),
+            'memory': self.memory.snapshot()
+        }
+
+    def restore(self, snapshot):
+        """恢复到快照时的CPU状态"""
+        self.registers.update(snapshot['registers'])
+        self.flags = snapshot['flags'].copy()
+        self.pc = snapshot['pc']
+        self.status = snapshot['status']
+        self.curr_inst = snapshot['current_instruction'].copy()
+        self.memory.restore(snapshot['memory'])
+
+    def rewind(self):
+        """回到程序刚加载完成时的状态，无需重新解析和加载"""
+        if self.loaded_image is None:
+            raise Y86Error("No program loaded")
+        self.restore(self.loaded_image)
+        if self.pipeline is not None:
+            self.pipeline.reset()
+        if self.profiler is not None:
+            self.profiler.reset()
+        if self.uarch is not None:
+            self.uarch.reset()
+
+    def fork(self):
+        """创建一个与当前CPU状态相同的新CPU，内存页共享"""
+        cpu = Y86CPU(self.memory_factory)
+        cpu.restore(self.snapshot())
+        cpu.loaded_image = self.loaded_image
+        return cpu
+
+    def checkpoint(self):
+        """创建可序列化的完整状态检查点（见src.checkpoint）"""
+        from .checkpoint import Checkpoint
+
+        return Checkpoint.capture(self)
+
+    def restore_checkpoint(self, checkpoint):
+        """
+        从检查点恢复完整状态，之后可以继续执行而无需重新执行之前的指令。
+        恢复后的状态作为rewind()的起点。
+        """
+        self.reset()
+        checkpoint.apply(self)
+        self.loaded_image = self.snapshot()
+
     def fetch(self):
         """取指阶段"""
         try:
-            # 读取指令的第一个字节
-            byte1 = self.memory.read_byte(self.pc)
-            self.curr_inst['icode'] = byte1 >> 4  # 高4位为指令码
-            self.curr_inst['ifun'] = byte1 & 0xF  # 低4位为功能码
-
-            next_pc = self.pc + 1
-
-            # 根据不同指令获取额外字节
-            if self.curr_inst['icode'] in [0x2, 0x3, 0x4, 0x5, 0x6]:  # 需要寄存器字节
-                regbyte = self.memory.read_byte(next_pc)
-                self.curr_inst['rA'] = regbyte >> 4
-                self.curr_inst['rB'] = regbyte & 0xF
-                next_pc += 1
-
-            if self.curr_inst['icode'] in [0x3, 0x4, 0x5]:  # 需要常数字节
-                # 使用小端序读取8字节常数
-                bytes_list = []
-                for i in range(8):
-                    bytes_list.append(self.memory.read_byte(next_pc + i))
-
-                # 将字节列表转换为整数值
-                value = int.from_bytes(bytes_list, byteorder='little', signed=True)
-                self.curr_inst['valC'] = value
-                next_pc += 8
-
-            self.curr_inst['valP'] = next_pc
-
-            # print(f"\nFetch Debug Info:")
-            # print(f"PC: 0x{self.pc:x}")
-            # print(f"Instruction: icode={hex(self.curr_inst['icode'])}, ifun={hex(self.curr_inst['ifun'])}")
-            # print(f"rA: {self.curr_inst.get('rA', 'N/A')}")
-            # print(f"rB: {self.curr_inst.get('rB', 'N/A')}")
-            # print(f"valC: {hex(self.curr_inst.get('valC', 0))}")
-            # print(f"Raw bytes: {[hex(b) for b in bytes_list] if 'bytes_list' in locals() else 'N/A'}")
-            # print(f"Next PC: 0x{next_pc:x}")
+            # 从已解码指令缓存中取出记录，未命中时才逐字节读取内存
+            self._inst.load(self.decode_cache.fetch(self.memory, self.pc))
 
             return True
 
@@ -153,117 +351,70 @@ class Y86CPU:
             return False
 
 
+    def get_decode_stats(self):
+        """获取已解码指令缓存的命中统计"""
+        return self.decode_cache.get_stats()
+
     def execute(self):
         """执行阶段"""
         try:
-            icode = self.curr_inst['icode']
+            inst = self._inst
+            icode = inst.icode
 
             # print(f"Executing instruction with icode: {hex(icode)}")  # 调试输出
 
-            if icode == 0x0:  # halt
-                self.status = 'HLT'
-
-            elif icode == 0x1:  # nop
-                pass
-
-            elif icode == 0x2:  # rrmovq/cmovXX
-                self.execute_move()
-
-            elif icode == 0x3:  # irmovq
-                self.execute_immediate_move()
-
-            elif icode == 0x4:  # rmmovq
-                self.execute_memory_store()
-
-            elif icode == 0x5:  # mrmovq
-                self.execute_memory_load()
-
-            elif icode == 0x6:  # OPq
-                self.execute_operation()
-
-            elif icode == 0x7:  # jXX
-                self.execute_jump()
-
-            elif icode == 0x8:  # call
-                self.execute_call()
-
-            elif icode == 0x9:  # ret
-                self.execute_return()
-
-            elif icode == 0xA:  # pushq
-                self.execute_push()
-
-            elif icode == 0xB:  # popq
-                self.execute_pop()
-
-            else:
+            handler = self.handlers[icode] if 0 <= icode < len(self.handlers) else None
+            if handler is None:
                 raise InvalidInstructionError(f"Invalid instruction code: {icode}")
 
+            inst.valP = handler(inst.ifun, inst.rA, inst.rB, inst.valC, inst.valP)
+
         except Exception as e:
             self.status = 'INS'
             raise Y86Error(f"Execute error: {str(e)}")
-    def execute_move(self):
-        """执行移动指令"""
-        rA = self.reg_map[self.curr_inst['rA']]
-        rB = self.reg_map[self.curr_inst['rB']]
-        ifun = self.curr_inst['ifun']
-
-        should_move = False
-        if ifun == 0:  # 无条件移动
-            should_move = True
-        elif ifun == 1:  # le
-            should_move = (self.flags['SF'] ^ self.flags['OF']) | self.flags['ZF']
-        elif ifun == 2:  # l
-            should_move = self.flags['SF'] ^ self.flags['OF']
-        elif ifun == 3:  # e
-            should_move = self.flags['ZF']
-        elif ifun == 4:  # ne
-            should_move = not self.flags['ZF']
-        elif ifun == 5:  # ge
-            should_move = not (self.flags['SF'] ^ self.flags['OF'])
-        elif ifun == 6:  # g
-            should_move = not (self.flags['SF'] ^ self.flags['OF']) and not self.flags['ZF']
-
-        if should_move:
-            self.registers[rB] = self.registers[rA]
-
-    def execute_operation(self):
-        """执行算术运算"""
-        rA = self.reg_map[self.curr_inst['rA']]
-        rB = self.reg_map[self.curr_inst['rB']]
-        ifun = self.curr_inst['ifun']
-
-        valA = self.registers[rA]
-        valB = self.registers[rB]
-
-        # print(f"Debug - operation:")
-        # print(f"  Operation type: {'addq' if ifun == 0 else 'subq'}")
-        # print(f"  Register A ({rA}): {valA}")
-        # print(f"  Register B ({rB}): {valB}")
-
-        try:
-            if ifun == 0:  # addq
-                result = valB + valA
-            elif ifun == 1:  # subq
-                result = valB - valA
-
-            # print(f"  Result before masking: {result}")
-
-            result = result & ((1 << 64) - 1)
-            self.registers[rB] = result
 
-            # print(f"  Final result: {result}")
-            # print(f"  Updated register {rB}: {self.registers[rB]}")
-
-        except Exception as e:
-            raise Y86Error(f"Operation error: {str(e)}")
+    def enable_profiling(self):
+        """开启执行剖析，返回Profiler；已开启时沿用原有统计"""
+        if self.uarch is not None:
+            raise Y86Error("Profiling cannot be combined with uarch models")
+        if self.profiler is None:
+            from .profiler import Profiler
+
+            self.profiler = Profiler(self)
+        return self.profiler
+
+    def disable_profiling(self):
+        """关闭执行剖析，返回已收集统计的Profiler（未开启时为None）"""
+        profiler = self.profiler
+        self.profiler = None
+        return profiler
+
+    def attach_uarch(self, uarch):
+        """
+        挂载微体系结构模型（src.uarch.Microarchitecture），返回uarch。
+        挂载后step()与run()都经由uarch逐条执行并把取指、跳转与数据访问输入各模型。
+        """
+        if self.profiler is not None:
+            raise Y86Error("Uarch models cannot be combined with profiling")
+        self.uarch = uarch
+        return uarch
+
+    def detach_uarch(self):
+        """卸下微体系结构模型，返回已收集统计的模型（未挂载时为None）"""
+        uarch = self.uarch
+        self.uarch = None
+        return uarch
 
     def step(self):
         """执行一个指令周期"""
+        if self.profiler is not None:
+            return self.profiler.step()
+        if self.uarch is not None:
+            return self.uarch.step(self)
         try:
             if self.fetch():
                 self.execute()
-                self.pc = self.curr_inst['valP']
+                self.pc = self._inst.valP
                 return self.status == 'AOK'
             return False
 
@@ -271,121 +422,227 @@ class Y86CPU:
             # print(f"Step error: {str(e)}")  # 调试输出
             return False
 
+    def run(self, max_steps=None, engine='interp', stop_pcs=None):
+        """
+        连续执行直到停机、出错或执行满max_steps条指令。
+        与逐条调用step()的结果完全一致，但不在每步之间保存状态。
+        返回(最终状态, 成功执行的指令数)，停机指令本身不计入。
+        开启剖析或挂载微体系结构模型时总是逐条解释执行，engine只做检查。
+        stop_pcs为PC断点集合，某条指令执行后PC落在其中时停下（只用于解释执行）。
+        """
+        if stop_pcs and (engine != 'interp' or self.profiler is not None
+                         or self.uarch is not None):
+            raise Y86Error("PC breakpoints are only supported by the plain interpreter")
+        if self.profiler is not None:
+            if engine not in ENGINES:
+                raise Y86Error(f"Unknown engine: {engine}")
+            return self.profiler.run(max_steps)
+        if self.uarch is not None:
+            if engine not in ENGINES:
+                raise Y86Error(f"Unknown engine: {engine}")
+            return self.uarch.run(self, max_steps)
+        if engine == 'block':
+            if self.block_engine is None:
+                from .jit import BlockEngine
+
+                self.block_engine = BlockEngine(self)
+            return self.block_engine.run(max_steps)
+        if engine == 'pipe':
+            if self.pipeline is None:
+                from .pipeline import PipelineEngine
+
+                self.pipeline = PipelineEngine(self)
+            return self.pipeline.run(max_steps)
+        if engine != 'interp':
+            raise Y86Error(f"Unknown engine: {engine}")
+
+        if self.status != 'AOK':
+            return self.get_state(), 0
+
+        handlers = self.handlers
+        cache = self.decode_cache
+        records = cache.records
+        memory = self.memory
+        pc = self.pc
+        steps = 0
+        hits = 0
+        limit = -1 if max_steps is None else max_steps
+        stops = stop_pcs or None
+        last = None
+        next_pc = None
+
+        try:
+            while steps != limit:
+                record = records.get(pc)
+                if record is None:
+                    try:
+                        record = cache.fetch(memory, pc)
+                    except Exception:
+                        self.status = 'HLT'
+                        break
+                else:
+                    hits += 1
+
+                last = record
+                next_pc = None
+                icode, ifun, rA, rB, valC, valP = record
+                if icode == 0x0:  # halt
+                    self.status = 'HLT'
+                    next_pc = pc = valP
+                    break
+
+                handler = handlers[icode]
+                if handler is None:
+                    self.status = 'INS'
+                    break
+                try:
+                    next_pc = handler(ifun, rA, rB, valC, valP)
+                except Exception:
+                    self.status = 'INS'
+                    break
+
+                pc = next_pc
+                steps += 1
+                if stops is not None and pc in stops:
+                    break
+        finally:
+            self.pc = pc
+            cache.hits += hits
+            if last is not None:
+                self._inst.load(last)
+                if next_pc is not None:
+                    self._inst.valP = next_pc
+
+        return self.get_state(), steps
+
+    def run_until(self, breakpoints, max_steps=None):
+        """
+        执行直到命中breakpoints中的断点、停机、出错或执行满max_steps条指令，
+        返回{'reason', 'hit', 'steps'}（见src.breakpoints.run_until）。
+        """
+        from .breakpoints import run_until
+
+        return run_until(self, breakpoints, max_steps)
+
     def get_state(self):
         """获取CPU当前状态"""
         return {
-            'registers': self.registers.copy(),
+            'registers': dict(zip(REG_NAMES, self.regs)),
             'flags': self.flags.copy(),
             'pc': self.pc,
             'status': self.status,
             'memory': self.memory.get_nonzero_memory(),  # 获取非零内存值
-            'current_instruction': self.curr_inst.copy()  # 添加当前指令信息
+            'current_instruction': self._inst.copy()  # 添加当前指令信息
         }
 
-    def execute_jump(self):
-        """执行跳转指令"""
-        ifun = self.curr_inst['ifun']
-        dest = self.curr_inst['valC']
-
-        should_jump = False
-
-        if ifun == 0:  # jmp
-            should_jump = True
-        elif ifun == 1:  # jle
-            should_jump = (self.flags['SF'] ^ self.flags['OF']) | self.flags['ZF']
-        elif ifun == 2:  # jl
-            should_jump = self.flags['SF'] ^ self.flags['OF']
-        elif ifun == 3:  # je
-            should_jump = self.flags['ZF']
-        elif ifun == 4:  # jne
-            should_jump = not self.flags['ZF']
-        elif ifun == 5:  # jge
-            should_jump = not (self.flags['SF'] ^ self.flags['OF'])
-        elif ifun == 6:  # jg
-            should_jump = not (self.flags['SF'] ^ self.flags['OF']) and not self.flags['ZF']
-
-        if should_jump:
-            self.curr_inst['valP'] = dest
-
-    def execute_immediate_move(self):
-        """执行irmovq指令"""
-        try:
-            rB = self.reg_map[self.curr_inst['rB']]
-            value = self.curr_inst['valC']
+    # 以下各执行函数的参数均为解码后的指令字段，返回下一条指令的地址
 
-            # 如果值超过有符号64位整数范围，进行符号扩展
-            if value & (1 << 63):
-                value = value - (1 << 64)
+    def check_condition(self, ifun):
+        """根据条件码判断cmovXX/jXX的条件是否成立"""
+        return CONDITIONS[ifun][self.cc]
 
-            # print(f"\nirmovq Debug Info:")
-            # print(f"Target register: {rB}")
-            # print(f"Raw value (hex): 0x{self.curr_inst['valC']:x}")
-            # print(f"Processed value (decimal): {value}")
-            # print(f"Register state before: {self.registers[rB]}")
+    def execute_halt(self, ifun, rA, rB, valC, valP):
+        """执行halt指令"""
+        self.status = 'HLT'
+        return valP
 
-            self.registers[rB] = value
-
-            # print(f"Register state after: {self.registers[rB]}")
-            # print(f"All registers after execution: {self.registers}")
-
-        except Exception as e:
-            # print(f"irmovq execution error: {str(e)}")
-            raise Y86Error(f"irmovq execution error: {str(e)}")
+    def execute_nop(self, ifun, rA, rB, valC, valP):
+        """执行nop指令"""
+        return valP
 
+    def execute_move(self, ifun, rA, rB, valC, valP):
+        """执行移动指令"""
+        regs = self.regs
+        valA = regs[rA]
+        if rB >= RNONE:
+            raise InvalidInstructionError(f"Invalid register: {rB}")
+        if CONDITIONS[ifun][self.cc]:
+            regs[rB] = valA
+        return valP
+
+    def execute_immediate_move(self, ifun, rA, rB, valC, valP):
+        """执行irmovq指令（解码时valC已做符号扩展）"""
+        self.regs[rB] = valC
+        return valP
+
+    def execute_memory_store(self, ifun, rA, rB, valC, valP):
+        """执行内存存储指令"""
+        regs = self.regs
+        self.memory.write_quad(regs[rB] + valC, regs[rA])
+        return valP
 
-    def execute_memory_load(self):
+    def execute_memory_load(self, ifun, rA, rB, valC, valP):
         """执行内存加载指令"""
-        rA = self.reg_map[self.curr_inst['rA']]
-        rB = self.reg_map[self.curr_inst['rB']]
-        addr = self.registers[rB] + self.curr_inst['valC']
-        value = self.memory.read_quad(addr)
-        self.registers[rA] = value
-
-
-
-
-    def execute_push(self):
-        """执行压栈指令"""
-        rA = self.reg_map[self.curr_inst['rA']]
-        self.registers['rsp'] -= 8
-        self.memory.write_quad(self.registers['rsp'], self.registers[rA])
-
-    def execute_pop(self):
-        """执行出栈指令"""
-        rA = self.reg_map[self.curr_inst['rA']]
-        value = self.memory.read_quad(self.registers['rsp'])
-        self.registers[rA] = value
-        self.registers['rsp'] += 8
-
-    def execute_memory_store(self):
-        """执行内存存储指令"""
-        try:
-            rA = self.reg_map[self.curr_inst['rA']]
-            rB = self.reg_map[self.curr_inst['rB']]
-            addr = self.registers[rB] + self.curr_inst.get('valC', 0)
-            value = self.registers[rA]
-            self.memory.write_quad(addr, value)
-        except Exception as e:
-            raise Y86Error(f"Memory store error: {str(e)}")
+        regs = self.regs
+        if rA >= RNONE:
+            raise InvalidInstructionError(f"Invalid register: {rA}")
+        regs[rA] = self.memory.read_quad(regs[rB] + valC)
+        return valP
+
+    def execute_operation(self, ifun, rA, rB, valC, valP):
+        """执行算术/逻辑运算，并按结果设置条件码"""
+        regs = self.regs
+        valA = regs[rA] & MASK64
+        valB = regs[rB] & MASK64
+
+        if ifun == 0:  # addq
+            result = (valB + valA) & MASK64
+            of = ((valA ^ result) & (valB ^ result)) >> 63
+        elif ifun == 1:  # subq
+            result = (valB - valA) & MASK64
+            of = ((valB ^ valA) & (valB ^ result)) >> 63
+        elif ifun == 2:  # andq
+            result = valB & valA
+            of = 0
+        elif ifun == 3:  # xorq
+            result = valB ^ valA
+            of = 0
+        else:
+            raise InvalidInstructionError(f"Invalid operation: {ifun}")
+
+        regs[rB] = result
+        self.cc = (result == 0) | ((result >> 63) << 1) | (of << 2)
+        return valP
+
+    def execute_jump(self, ifun, rA, rB, valC, valP):
+        """执行跳转指令"""
+        if CONDITIONS[ifun][self.cc]:
+            return valC
+        return valP
 
-    def execute_call(self):
+    def execute_call(self, ifun, rA, rB, valC, valP):
         """执行调用指令"""
-        try:
-            # 保存返回地址
-            self.registers['rsp'] -= 8
-            self.memory.write_quad(self.registers['rsp'], self.curr_inst['valP'])
-            # 跳转到目标地址
-            self.curr_inst['valP'] = self.curr_inst['valC']
-        except Exception as e:
-            raise Y86Error(f"Call instruction error: {str(e)}")
-
-    def execute_return(self):
+        regs = self.regs
+        # 保存返回地址
+        regs[4] -= 8
+        self.memory.write_quad(regs[4], valP)
+        # 跳转到目标地址
+        return valC
+
+    def execute_return(self, ifun, rA, rB, valC, valP):
         """执行返回指令"""
-        try:
-            # 读取返回地址
-            ret_addr = self.memory.read_quad(self.registers['rsp'])
-            self.registers['rsp'] += 8
-            # 跳转到返回地址
-            self.curr_inst['valP'] = ret_addr
-        except Exception as e:
-            raise Y86Error(f"Return instruction error: {str(e)}")
\ No newline at end of file
+        regs = self.regs
+        # 读取返回地址
+        ret_addr = self.memory.read_quad(regs[4])
+        regs[4] += 8
+        # 跳转到返回地址
+        return ret_addr
+
+    def execute_push(self, ifun, rA, rB, valC, valP):
+        """执行压栈指令"""
+        regs = self.regs
+        if rA >= RNONE:
+            raise InvalidInstructionError(f"Invalid register: {rA}")
+        regs[4] -= 8
+        self.memory.write_quad(regs[4], regs[rA])
+        return valP
+
+    def execute_pop(self, ifun, rA, rB, valC, valP):
+        """执行出栈指令"""
+        regs = self.regs
+        if rA >= RNONE:
+            raise InvalidInstructionError(f"Invalid register: {rA}")
+        value = self.memory.read_quad(regs[4])
+        regs[rA] = value
+        regs[4] += 8
+        return valP
@@ -0,0 +1,210 @@
+# src/decoder.py
+
+# 无寄存器时使用的编号
+RNONE = 0xF
+
+# 按编号排列的寄存器名
+REG_NAMES = (
+    'rax', 'rcx', 'rdx', 'rbx', 'rsp', 'rbp', 'rsi', 'rdi',
+    'r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14'
+)
+
+# 条件码在打包整数中的位
+FLAG_BITS = {'ZF': 0, 'SF': 1, 'OF': 2}
+
+# 需要寄存器字节的指令: rrmovq/cmovXX, irmovq, rmmovq, mrmovq, OPq, pushq, popq
+NEEDS_REGIDS = frozenset((0x2, 0x3, 0x4, 0x5, 0x6, 0xA, 0xB))
+
+# 需要8字节常数的指令: irmovq, rmmovq, mrmovq, jXX, call
+NEEDS_VALC = frozenset((0x3, 0x4, 0x5, 0x7, 0x8))
+
+
+def decode_instruction(memory, pc):
+    """
+    解码pc处的一条指令，返回紧凑的元组记录:
+    (icode, ifun, rA, rB, valC, valP)
+    """
+    byte1 = memory.read_byte(pc)
+    icode = byte1 >> 4
+    ifun = byte1 & 0xF
+    rA = rB = RNONE
+    valC = 0
+    next_pc = pc + 1
+
+    if icode in NEEDS_REGIDS:
+        regbyte = memory.read_byte(next_pc)
+        rA = regbyte >> 4
+        rB = regbyte & 0xF
+        next_pc += 1
+
+    if icode in NEEDS_VALC:
+        # 使用小端序读取8字节常数
+        valC = memory.read_quad(next_pc)
+        if valC & (1 << 63):
+            valC -= 1 << 64
+        next_pc += 8
+
+    return (icode, ifun, rA, rB, valC, next_pc)
+
+
+class DecodedInstruction:
+    """
+    当前指令信息。
+
+    使用__slots__保存各字段，同时保留原先字典式的访问方式，
+    get_state()等对外接口通过copy()得到普通字典。
+    """
+    __slots__ = ('icode', 'ifun', 'rA', 'rB', 'valC', 'valP')
+
+    def __init__(self, icode=0, ifun=0, rA=0, rB=0, valC=0, valP=0):
+        self.icode = icode
+        self.ifun = ifun
+        self.rA = rA
+        self.rB = rB
+        self.valC = valC
+        self.valP = valP
+
+    def load(self, record):
+        """从解码记录元组载入各字段"""
+        self.icode, self.ifun, self.rA, self.rB, self.valC, self.valP = record
+
+    def update(self, fields):
+        """从字典载入各字段，缺少的寄存器字段视为无寄存器"""
+        self.icode = fields.get('icode', 0)
+        self.ifun = fields.get('ifun', 0)
+        self.rA = fields.get('rA', RNONE)
+        self.rB = fields.get('rB', RNONE)
+        self.valC = fields.get('valC', 0)
+        self.valP = fields.get('valP', 0)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def copy(self):
+        """转换为普通字典"""
+        return {
+            'icode': self.icode,
+            'ifun': self.ifun,
+            'rA': self.rA,
+            'rB': self.rB,
+            'valC': self.valC,
+            'valP': self.valP
+        }
+
+
+class CodeCache:
+    """
+    按起始地址缓存由代码字节派生出的条目（解码记录、编译后的基本块等）。
+
+    每个条目覆盖的字节范围会被登记，内存写入命中这些字节时对应条目失效，
+    从而保证自修改代码的正确性。
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.ends = {}  # 起始地址 -> 条目覆盖范围的结束地址
+        self.owners = {}  # 字节地址 -> 覆盖该字节的条目起始地址集合
+        self.lo = 0
+        self.hi = 0
+        self.invalidations = 0
+
+    def add(self, pc, end, entry):
+        """登记覆盖[pc, end)的条目"""
+        self.records[pc] = entry
+        self.ends[pc] = end
+        for addr in range(pc, end):
+            pcs = self.owners.get(addr)
+            if pcs is None:
+                self.owners[addr] = {pc}
+            else:
+                pcs.add(pc)
+
+        if len(self.records) == 1:
+            self.lo, self.hi = pc, end
+        else:
+            self.lo = min(self.lo, pc)
+            self.hi = max(self.hi, end)
+
+    def invalidate(self, addr, size):
+        """内存写入回调: 使与[addr, addr + size)重叠的条目失效"""
+        if addr >= self.hi or addr + size <= self.lo:
+            return
+        if addr <= self.lo and addr + size >= self.hi:
+            for pc, entry in self.records.items():
+                self.invalidations += 1
+                self.discard(pc, entry)
+            self.clear()
+            return
+        for a in range(max(addr, self.lo), min(addr + size, self.hi)):
+            pcs = self.owners.pop(a, None)
+            if pcs:
+                for pc in pcs:
+                    self._drop(pc)
+
+    def _drop(self, pc):
+        entry = self.records.pop(pc, None)
+        if entry is None:
+            return
+        self.invalidations += 1
+        self.discard(pc, entry)
+        for a in range(pc, self.ends.pop(pc)):
+            pcs = self.owners.get(a)
+            if pcs is not None:
+                pcs.discard(pc)
+                if not pcs:
+                    del self.owners[a]
+
+    def discard(self, pc, entry):
+        """条目失效时的回调，子类可以覆盖"""
+        pass
+
+    def clear(self):
+        """清空缓存（计数器保留）"""
+        self.records.clear()
+        self.ends.clear()
+        self.owners.clear()
+        self.lo = self.hi = 0
+
+
+class DecodeCache(CodeCache):
+    """按PC缓存已解码的指令记录"""
+
+    def __init__(self):
+        super().__init__()
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, memory, pc):
+        """返回pc处的解码记录，未命中时解码并缓存"""
+        record = self.records.get(pc)
+        if record is not None:
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        record = decode_instruction(memory, pc)
+        self.add(pc, record[5], record)
+        return record
+
+    def get_stats(self):
+        """返回命中/未命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'entries': len(self.records),
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,247 @@
+# src/fuzz.py
+
+import random
+import re
+
+from .assembler import assemble
+from .cpu import Y86CPU, ENGINES
+from .decoder import REG_NAMES
+from .output import format_memory_dump
+from .utils import Y86Error
+
+# 每个随机程序的指令条数与执行步数上限（随机跳转可能形成死循环）
+DEFAULT_LENGTH = 32
+DEFAULT_MAX_STEPS = 500
+
+# 数据区与栈的位置，程序代码从0开始，不会超过DATA_ADDRESS
+DATA_ADDRESS = 0x800
+DATA_QUADS = 16
+STACK_ADDRESS = 0xF00
+
+# 比较的字段
+FIELDS = ('status', 'pc', 'steps', 'registers', 'flags', 'current_instruction', 'memory')
+
+REGISTERS = [f'%{name}' for name in REG_NAMES]
+# 不改写栈指针的寄存器，随机写入目标主要从中选择
+DATA_REGISTERS = [reg for reg in REGISTERS if reg != '%rsp']
+
+OPERATIONS = ('addq', 'subq', 'andq', 'xorq')
+MOVES = ('rrmovq', 'cmovle', 'cmovl', 'cmove', 'cmovne', 'cmovge', 'cmovg')
+JUMPS = ('jmp', 'jle', 'jl', 'je', 'jne', 'jge', 'jg')
+
+_LABEL = re.compile(r'\bL(\d+)\b')
+
+# 指令种类 -> 权重
+WEIGHTS = {
+    'irmovq': 6, 'move': 4, 'operation': 8, 'rmmovq': 3, 'mrmovq': 3,
+    'jump': 4, 'call': 2, 'ret': 2, 'pushq': 2, 'popq': 2, 'nop': 1, 'halt': 1
+}
+
+
+def _immediate(rng):
+    choice = rng.random()
+    if choice < 0.4:
+        return str(rng.randint(0, 16))
+    if choice < 0.6:
+        return rng.choice(('-1', '0x7fffffffffffffff', '0x8000000000000000', '8'))
+    if choice < 0.8:
+        return str(DATA_ADDRESS + 8 * rng.randrange(DATA_QUADS))
+    return str(rng.getrandbits(64))
+
+
+def _register(rng, target=False):
+    if target and rng.random() < 0.95:
+        return rng.choice(DATA_REGISTERS)
+    return rng.choice(REGISTERS)
+
+
+def _memory_operand(rng):
+    """大多以%rbp（指向数据区）为基址，偶尔使用任意寄存器以覆盖出错与改写代码"""
+    if rng.random() < 0.7:
+        return f"{8 * rng.randrange(DATA_QUADS)}(%rbp)"
+    return f"{rng.choice((0, 8, -8, 0x10))}({_register(rng)})"
+
+
+def generate_instruction(rng, index, length):
+    """生成第index条指令的汇编文本，跳转目标为标号L0..L{length}"""
+    kind = rng.choices(list(WEIGHTS), list(WEIGHTS.values()))[0]
+    if kind == 'irmovq':
+        return f"irmovq ${_immediate(rng)}, {_register(rng, True)}"
+    if kind == 'move':
+        return f"{rng.choice(MOVES)} {_register(rng)}, {_register(rng, True)}"
+    if kind == 'operation':
+        return f"{rng.choice(OPERATIONS)} {_register(rng)}, {_register(rng, True)}"
+    if kind == 'rmmovq':
+        return f"rmmovq {_register(rng)}, {_memory_operand(rng)}"
+    if kind == 'mrmovq':
+        return f"mrmovq {_memory_operand(rng)}, {_register(rng, True)}"
+    if kind == 'jump':
+        return f"{rng.choice(JUMPS)} L{rng.randint(0, length)}"
+    if kind == 'call':
+        return f"call L{rng.randint(index + 1, length)}"
+    if kind in ('pushq', 'popq'):
+        return f"{kind} {_register(rng, True)}"
+    return kind
+
+
+def generate_program(rng, length=DEFAULT_LENGTH):
+    """
+    生成随机程序，返回指令文本列表: 先用随机值初始化各数据寄存器
+    （%rbp除外，它指向数据区），再接length条随机指令。
+    """
+    instructions = [f"irmovq ${_immediate(rng)}, {reg}"
+                    for reg in DATA_REGISTERS if reg != '%rbp']
+    total = len(instructions) + length
+    for index in range(len(instructions), total):
+        instructions.append(generate_instruction(rng, index, total))
+    return instructions
+
+
+def program_source(instructions, data=None):
+    """
+    把指令列表组装为.ys源码。第k条指令的地址为标号Lk，只输出被引用的标号；
+    删除指令（替换为空串）后标号仍然有效，便于缩减。
+    """
+    referenced = {int(label) for text in instructions for label in _LABEL.findall(text)}
+    lines = ["    irmovq stack, %rsp", "    irmovq data, %rbp"]
+    for index, text in enumerate(instructions):
+        if index in referenced:
+            lines.append(f"L{index}: {text}")
+        elif text:
+            lines.append(f"    {text}")
+    lines.append(f"L{len(instructions)}: halt")
+    lines.append(f"    .pos {DATA_ADDRESS:#x}")
+    lines.append("data:")
+    for value in data or ():
+        lines.append(f"    .quad {value}")
+    lines.append(f"    .pos {STACK_ADDRESS:#x}")
+    lines.append("stack:")
+    return '\n'.join(lines) + '\n'
+
+
+def _observe(cpu, steps):
+    state = cpu.get_state()
+    return {
+        'status': state['status'],
+        'pc': state['pc'],
+        'steps': steps,
+        'registers': state['registers'],
+        'flags': state['flags'],
+        'current_instruction': state['current_instruction'],
+        'memory': format_memory_dump(state['memory'])
+    }
+
+
+def run_reference(image, max_steps=DEFAULT_MAX_STEPS):
+    """逐条调用Y86CPU.step执行，作为参照语义"""
+    cpu = Y86CPU()
+    cpu.load_program(image)
+    steps = 0
+    while steps < max_steps and cpu.step():
+        steps += 1
+    return _observe(cpu, steps)
+
+
+def run_engine(image, engine, max_steps=DEFAULT_MAX_STEPS):
+    cpu = Y86CPU()
+    cpu.load_program(image)
+    _, steps = cpu.run(max_steps, engine)
+    return _observe(cpu, steps)
+
+
+def check_source(source, engines=ENGINES, max_steps=DEFAULT_MAX_STEPS):
+    """
+    在每个引擎上执行源码并与参照结果比较，
+    返回不一致的列表[{engine, field, expected, actual}]，一致时为空。
+    """
+    image = assemble(source)
+    expected = run_reference(image, max_steps)
+    mismatches = []
+    for engine in engines:
+        actual = run_engine(image, engine, max_steps)
+        for field in FIELDS:
+            if actual[field] != expected[field]:
+                mismatches.append({'engine': engine, 'field': field,
+                                   'expected': expected[field], 'actual': actual[field]})
+    return mismatches
+
+
+def shrink(items, failing):
+    """
+    缩减失败用例: 反复尝试把连续的一段指令替换为空，
+    failing(items)仍为True时接受，直到删除任何单条指令都不再失败。
+    返回缩减后的列表（长度不变，被删除的位置为空串）。
+    """
+    items = list(items)
+    chunk = max(1, len(items) // 2)
+    while True:
+        changed = False
+        for start in range(0, len(items), chunk):
+            if not any(items[start:start + chunk]):
+                continue
+            candidate = items[:start] + [''] * len(items[start:start + chunk]) \
+                + items[start + chunk:]
+            if failing(candidate):
+                items = candidate
+                changed = True
+        if not changed:
+            if chunk == 1:
+                return items
+            chunk = max(1, chunk // 2)
+
+
+class FuzzFailure:
+    """一个不一致的随机程序及其缩减结果"""
+
+    def __init__(self, seed, source, mismatches, shrunk_source):
+        self.seed = seed
+        self.source = source
+        self.mismatches = mismatches
+        self.shrunk_source = shrunk_source
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        return {
+            'seed': self.seed,
+            'source': self.source,
+            'shrunk_source': self.shrunk_source,
+            'mismatches': self.mismatches
+        }
+
+
+def fuzz_one(seed, length=DEFAULT_LENGTH, engines=ENGINES, max_steps=DEFAULT_MAX_STEPS):
+    """用给定种子生成并检查一个程序，一致时返回None，否则返回缩减后的FuzzFailure"""
+    rng = random.Random(seed)
+    instructions = generate_program(rng, length)
+    data = [_immediate(rng) for _ in range(DATA_QUADS)]
+    source = program_source(instructions, data)
+    mismatches = check_source(source, engines, max_steps)
+    if not mismatches:
+        return None
+
+    def failing(candidate):
+        try:
+            return bool(check_source(program_source(candidate, data), engines, max_steps))
+        except Y86Error:
+            return False
+
+    shrunk = shrink(instructions, failing)
+    shrunk_source = program_source(shrunk, data)
+    return FuzzFailure(seed, source, check_source(shrunk_source, engines, max_steps),
+                       shrunk_source)
+
+
+def fuzz(iterations, seed=0, length=DEFAULT_LENGTH, engines=ENGINES,
+         max_steps=DEFAULT_MAX_STEPS, stop_on_failure=False):
+    """
+    依次用种子seed, seed+1, ...检查iterations个随机程序，返回FuzzFailure列表。
+    每个程序只依赖自身的种子，因此任何失败都可以单独重现。
+    """
+    failures = []
+    for case in range(seed, seed + iterations):
+        failure = fuzz_one(case, length, engines, max_steps)
+        if failure is not None:
+            failures.append(failure)
+            if stop_on_failure:
+                break
+    return failures
@@ -0,0 +1,283 @@
+# src/jit.py
+
+from .decoder import CodeCache, decode_instruction
+
+# 基本块的最大指令数
+MAX_BLOCK_LENGTH = 64
+
+# 结束基本块的指令: halt, jXX, call, ret
+TERMINATORS = frozenset((0x0, 0x7, 0x8, 0x9))
+
+MASK64 = (1 << 64) - 1
+
+# OPq的ifun -> 由操作数a(valA)、b(valB)计算结果的表达式
+OPERATIONS = {
+    0: f"(b + a) & {MASK64}",
+    1: f"(b - a) & {MASK64}",
+    2: "b & a",
+    3: "b ^ a",
+}
+
+
+class Block:
+    """编译后的基本块"""
+
+    def __init__(self, pc, records):
+        self.pc = pc
+        self.records = records
+        self.end = records[-1][5] if records else pc + 1
+        self.run = None
+        # 执行期间被自身的写入改写时置位，生成的代码据此提前退出
+        self.stale = [False]
+        self.executions = 0
+
+
+def _supported(record):
+    """判断指令能否被编译，否则交给解释器执行"""
+    icode, ifun, rA, rB, valC, valP = record
+    if icode in (0x0, 0x1, 0x7, 0x8, 0x9):
+        return True
+    if icode in (0x2, 0x4, 0x5):
+        return rA < 15 and rB < 15
+    if icode == 0x3:
+        return rB < 15
+    if icode == 0x6:
+        return rA < 15 and rB < 15 and ifun in (0, 1, 2, 3)
+    if icode in (0xA, 0xB):
+        return rA < 15
+    return False
+
+
+def _emit_block(records):
+    """为一组解码记录生成Python源代码"""
+    used = set()
+    body = []
+    tail = []
+    count = len(records)
+
+    def reg(r):
+        used.add(r)
+        return f"r{r}"
+
+    for index, (icode, ifun, rA, rB, valC, valP) in enumerate(records):
+        if icode == 0x0:  # halt
+            body.append("cpu.status = 'HLT'")
+            tail.append(f"return {valP}, {index}")
+        elif icode == 0x1:  # nop
+            pass
+        elif icode == 0x2:  # rrmovq/cmovXX
+            if ifun == 0:
+                body.append(f"{reg(rB)} = {reg(rA)}")
+            else:
+                body.append(f"if check({ifun}): {reg(rB)} = {reg(rA)}")
+        elif icode == 0x3:  # irmovq: valC已做符号扩展
+            body.append(f"{reg(rB)} = {valC}")
+        elif icode == 0x4:  # rmmovq
+            body.append(f"at = {index}")
+            body.append(f"wq({reg(rB)} + {valC}, {reg(rA)})")
+            body.append(f"if stale[0]: nxt = {valP}; n = {index + 1}; raise Exit")
+        elif icode == 0x5:  # mrmovq
+            body.append(f"at = {index}")
+            body.append(f"{reg(rA)} = rq({reg(rB)} + {valC})")
+        elif icode == 0x6:  # OPq: 结果与条件码的计算与Y86CPU.execute_operation一致
+            body.append(f"a = {reg(rA)} & {MASK64}")
+            body.append(f"b = {reg(rB)} & {MASK64}")
+            body.append(f"v = {OPERATIONS[ifun]}")
+            if ifun == 0:
+                of = "((a ^ v) & (b ^ v)) >> 63 << 2"
+            elif ifun == 1:
+                of = "((b ^ a) & (b ^ v)) >> 63 << 2"
+            else:
+                of = "0"
+            body.append(f"cpu.cc = (v == 0) | (v >> 63 << 1) | {of}")
+            body.append(f"{reg(rB)} = v")
+        elif icode == 0x7:  # jXX
+            if ifun == 0:
+                tail.append(f"return {valC}, {count}")
+            else:
+                tail.append(f"return ({valC} if check({ifun}) else {valP}), {count}")
+        elif icode == 0x8:  # call
+            body.append(f"at = {index}")
+            body.append(f"{reg(4)} -= 8")
+            body.append(f"wq({reg(4)}, {valP})")
+            tail.append(f"return {valC}, {count}")
+        elif icode == 0x9:  # ret
+            body.append(f"at = {index}")
+            body.append(f"nxt = rq({reg(4)})")
+            body.append(f"{reg(4)} += 8")
+            tail.append(f"return nxt, {count}")
+        elif icode == 0xA:  # pushq
+            body.append(f"at = {index}")
+            body.append(f"{reg(4)} -= 8")
+            body.append(f"wq({reg(4)}, {reg(rA)})")
+            body.append(f"if stale[0]: nxt = {valP}; n = {index + 1}; raise Exit")
+        elif icode == 0xB:  # popq
+            body.append(f"at = {index}")
+            body.append(f"value = rq({reg(4)})")
+            body.append(f"{reg(rA)} = value")
+            body.append(f"{reg(4)} += 8")
+
+    if not tail:
+        # 基本块因长度限制或遇到不可编译的指令而结束
+        tail.append(f"return {records[-1][5]}, {count}")
+
+    regs = sorted(used)
+    load = [f"r{r} = regs[{r}]" for r in regs]
+    store = [f"regs[{r}] = r{r}" for r in regs] or ["pass"]
+
+    lines = ["def make(regs, rq, wq, check, cpu, stale, PCS, Exit):",
+             "    def block():"]
+    lines += [f"        {line}" for line in load]
+    lines.append("        at = 0")
+    lines.append("        try:")
+    lines += [f"            {line}" for line in body or ["pass"]]
+    # 终结指令的结果在写回寄存器之前计算，异常时按出错指令处理
+    result = tail[0].replace("return ", "result = ", 1)
+    lines.append(f"            {result}")
+    lines.append("        except Exit:")
+    lines += [f"            {line}" for line in store]
+    lines.append("            return nxt, n")
+    lines.append("        except Exception:")
+    lines += [f"            {line}" for line in store]
+    lines.append("            cpu.status = 'INS'")
+    lines.append("            return PCS[at], at")
+    lines += [f"        {line}" for line in store]
+    lines.append("        return result")
+    lines.append("    return block")
+    return "\n".join(lines)
+
+
+class _Exit(Exception):
+    """块内写入改写了自身代码时用于提前退出"""
+    pass
+
+
+class BlockCache(CodeCache):
+    """按入口地址缓存编译后的基本块，代码被改写时失效"""
+
+    def discard(self, pc, block):
+        block.stale[0] = True
+
+
+class BlockEngine:
+    """
+    基本块编译执行引擎。
+
+    从入口地址开始解码到jXX/call/ret/halt为止作为一个基本块，
+    把整块编译成一个Python闭包，一次调用完成块内全部指令的效果。
+    编译结果按入口地址缓存，写入代码所在内存时失效。
+    无法编译的指令交给Y86CPU.step解释执行，因此结果与step完全一致。
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.cache = BlockCache()
+        self.compiled = 0
+        self.interpreted = 0
+        cpu.memory.observers.append(self.cache.invalidate)
+
+    def close(self):
+        """解除对内存写入的监听"""
+        observers = self.cpu.memory.observers
+        if self.cache.invalidate in observers:
+            observers.remove(self.cache.invalidate)
+
+    def compile(self, pc):
+        """编译pc处的基本块，首条指令就无法编译时run为None"""
+        memory = self.cpu.memory
+        records = []
+        addr = pc
+        while len(records) < MAX_BLOCK_LENGTH:
+            try:
+                record = decode_instruction(memory, addr)
+            except Exception:
+                break
+            if not _supported(record):
+                if not records:
+                    records.append(record)
+                    block = Block(pc, records)
+                    self.cache.add(pc, block.end, block)
+                    return block
+                break
+            records.append(record)
+            if record[0] in TERMINATORS:
+                break
+            addr = record[5]
+
+        block = Block(pc, records)
+        if records:
+            cpu = self.cpu
+            pcs = [pc] + [record[5] for record in records[:-1]]
+            namespace = {}
+            exec(_emit_block(records), namespace)
+            block.run = namespace['make'](
+                cpu.regs, memory.read_quad, memory.write_quad,
+                cpu.check_condition, cpu, block.stale, pcs, _Exit
+            )
+            self.compiled += 1
+            self.cache.add(pc, block.end, block)
+        return block
+
+    def run(self, max_steps=None):
+        """连续执行，返回(最终状态, 成功执行的指令数)，与Y86CPU.run一致"""
+        cpu = self.cpu
+        if cpu.status != 'AOK':
+            return cpu.get_state(), 0
+
+        blocks = self.cache.records
+        pc = cpu.pc
+        steps = 0
+        last = None  # (最后一条指令的记录, 其后继地址)
+
+        while cpu.status == 'AOK':
+            if max_steps is not None and steps >= max_steps:
+                break
+
+            block = blocks.get(pc)
+            if block is None:
+                block = self.compile(pc)
+
+            if block.run is None or (max_steps is not None
+                                     and steps + len(block.records) > max_steps):
+                # 交给解释器执行一条指令
+                cpu.pc = pc
+                self._sync(last)
+                last = None
+                if cpu.step():
+                    steps += 1
+                pc = cpu.pc
+                self.interpreted += 1
+                continue
+
+            block.executions += 1
+            next_pc, count = block.run()
+            steps += count
+            if cpu.status != 'AOK':
+                record = block.records[count]
+                last = (record, record[5])
+            else:
+                last = (block.records[count - 1], next_pc)
+            pc = next_pc
+
+        cpu.pc = pc
+        self._sync(last)
+        return cpu.get_state(), steps
+
+    def _sync(self, last):
+        """把最后执行的指令写回curr_inst，与逐条执行时保持一致"""
+        if last is None:
+            return
+        record, next_pc = last
+        inst = self.cpu.curr_inst
+        inst.load(record)
+        inst.valP = next_pc
+
+    def get_stats(self):
+        """返回编译与执行统计"""
+        return {
+            'blocks': len(self.cache.records),
+            'compiled': self.compiled,
+            'invalidations': self.cache.invalidations,
+            'interpreted_steps': self.interpreted,
+            'block_executions': sum(block.executions for block in self.cache.records.values())
+        }
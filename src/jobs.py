@@ -0,0 +1,349 @@
+# src/jobs.py
+
+import hashlib
+import multiprocessing
+import os
+import secrets
+import signal
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # 非Unix平台不支持资源限制
+    resource = None
+
+from .checkpoint import Checkpoint, CHECKPOINT_MAGIC
+from .cpu import Y86CPU
+from .loader import ProgramImage
+from .utils import Y86Error, JobError
+
+# 默认每个作业的CPU时间（秒）与地址空间（字节）上限
+DEFAULT_CPU_TIME = 10
+DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+# 默认每个作业的指令数上限
+DEFAULT_MAX_STEPS = 10000000
+# 工作进程每执行这么多条指令报告一次进度
+PROGRESS_INTERVAL = 50000
+# 默认缓存的结果数与保留的作业数
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_MAX_JOBS = 1024
+
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+
+# 工作进程内的进度队列，由进程池的initializer设置
+_progress_queue = None
+# 收到SIGXCPU时置位，执行循环在每段指令之间检查
+_cpu_exceeded = False
+
+
+def _on_cpu_limit(signum, frame):
+    # 不在信号处理中抛出异常，否则会被指令执行的异常处理当作INS
+    global _cpu_exceeded
+    _cpu_exceeded = True
+
+
+def _init_worker(queue, memory_limit):
+    """工作进程初始化: 保存进度队列，设置地址空间上限和CPU超时信号处理"""
+    global _progress_queue
+    _progress_queue = queue
+    if resource is not None:
+        if memory_limit:
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_cpu_limit(seconds):
+    """把软CPU时间上限设为已用时间加seconds，None表示取消限制"""
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        soft = hard
+    else:
+        soft = int(_cpu_seconds() + seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def execute_job(job_id, image_bytes, max_steps, engine, cpu_time):
+    """
+    在工作进程中执行一个作业，返回结果字典。
+    image_bytes为程序镜像或检查点的序列化结果，检查点从保存的状态继续执行；
+    未执行完（达到指令数或CPU时间上限）时结果中的'checkpoint'为当前状态的检查点。
+    工作进程被复用，因此CPU时间上限按本作业开始时已用的时间设置，结束后解除。
+    """
+    global _cpu_exceeded
+    start_time = time.perf_counter()
+    result = {'status': None, 'reason': None, 'steps': 0, 'state': None, 'error': None}
+    cpu = Y86CPU()
+    try:
+        _cpu_exceeded = False
+        _set_cpu_limit(cpu_time)
+        if image_bytes.startswith(CHECKPOINT_MAGIC):
+            cpu.restore_checkpoint(Checkpoint.from_bytes(image_bytes))
+        else:
+            cpu.load_program(ProgramImage.from_bytes(image_bytes))
+        steps = 0
+        while cpu.status == 'AOK' and (max_steps is None or steps < max_steps):
+            if _cpu_exceeded:
+                break
+            chunk = PROGRESS_INTERVAL
+            if max_steps is not None:
+                chunk = min(chunk, max_steps - steps)
+            _, count = cpu.run(chunk, engine)
+            steps += count
+            if _progress_queue is not None:
+                _progress_queue.put((job_id, steps))
+        result['steps'] = steps
+        if _cpu_exceeded:
+            result['reason'] = 'cpu_time'
+            result['error'] = "CPU time limit exceeded"
+        elif cpu.status == 'AOK':
+            result['reason'] = 'limit'
+        else:
+            result['reason'] = 'halt' if cpu.status == 'HLT' else 'error'
+    except MemoryError:
+        # 内置MemoryError: 超出地址空间上限
+        result['reason'] = 'memory'
+        result['error'] = "Memory limit exceeded"
+    finally:
+        _set_cpu_limit(None)
+
+    if result['reason'] == 'memory':
+        # 释放模拟器后再返回，避免构造状态时再次触发内存不足
+        cpu = None
+    else:
+        state = cpu.get_state()
+        result['status'] = state['status']
+        result['state'] = state
+        if result['reason'] in ('limit', 'cpu_time'):
+            result['checkpoint'] = cpu.checkpoint().to_bytes()
+    result['wall_time'] = time.perf_counter() - start_time
+    return result
+
+
+class Job:
+    """一个提交的作业"""
+
+    def __init__(self, job_id, key):
+        self.job_id = job_id
+        self.key = key
+        self.status = 'queued'
+        self.steps = 0
+        self.result = None
+        # 未执行完时可用于继续执行的检查点（bytes）
+        self.checkpoint = None
+        self.error = None
+        self.cached = False
+        self.future = None
+        self.submitted = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self, include_result=True):
+        """转换为可JSON序列化的字典"""
+        data = {
+            'job_id': self.job_id,
+            'status': self.status,
+            'steps': self.steps,
+            'cached': self.cached,
+            'resumable': self.checkpoint is not None,
+            'submitted': self.submitted,
+            'finished': self.finished
+        }
+        if self.error is not None:
+            data['error'] = self.error
+        if include_result and self.result is not None:
+            data['result'] = self.result
+        return data
+
+
+class JobManager:
+    """
+    异步作业管理器。
+
+    作业在ProcessPoolExecutor中执行，每个作业有CPU时间与内存上限，
+    工作进程通过初始化时传入的队列报告进度，由后台线程更新作业状态。
+    完成的结果按(程序镜像, 执行选项)的哈希缓存，相同的提交立即返回。
+    """
+
+    def __init__(self, max_workers=None, cpu_time=DEFAULT_CPU_TIME,
+                 memory_limit=DEFAULT_MEMORY_LIMIT, cache_size=DEFAULT_CACHE_SIZE,
+                 max_jobs=DEFAULT_MAX_JOBS):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cpu_time = cpu_time
+        self.memory_limit = memory_limit
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = None
+        self.queue = None
+        self.listener = None
+
+    def _ensure_executor(self, broken=None):
+        """
+        第一次提交时才创建进程池和进度监听线程（需持有self.lock）。
+        broken为已损坏的进程池（工作进程被杀死）时用新进程池替换它。
+        """
+        if self.queue is None:
+            self.queue = multiprocessing.get_context().Queue()
+            self.listener = threading.Thread(target=self._listen, daemon=True)
+            self.listener.start()
+        if broken is not None and self.executor is broken:
+            broken.shutdown(wait=False)
+            self.executor = None
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker, initargs=(self.queue, self.memory_limit)
+            )
+        return self.executor
+
+    def _listen(self):
+        """接收工作进程的进度报告"""
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            job_id, steps = message
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is not None and job.status in ('queued', 'running'):
+                    job.status = 'running'
+                    job.steps = steps
+
+    @staticmethod
+    def job_key(image, max_steps, engine):
+        """结果缓存的键: 程序镜像（或检查点）与执行选项的SHA-256"""
+        digest = hashlib.sha256(image.to_bytes())
+        digest.update(f"|{max_steps}|{engine}".encode())
+        return digest.hexdigest()
+
+    def submit(self, image, max_steps=DEFAULT_MAX_STEPS, engine='interp'):
+        """
+        提交程序镜像或检查点（继续执行之前的作业），返回Job；
+        结果已缓存时Job立即完成
+        """
+        if not image:
+            raise Y86Error("Empty program")
+        key = self.job_key(image, max_steps, engine)
+        with self.lock:
+            job = Job(secrets.token_urlsafe(12), key)
+            self.jobs[job.job_id] = job
+            self._trim_jobs()
+            cached = self.results.get(key)
+            if cached is not None:
+                self.results.move_to_end(key)
+                job.cached = True
+                self._finish(job, cached)
+                return job
+            executor = self._ensure_executor()
+
+        from concurrent.futures.process import BrokenProcessPool
+
+        args = (job.job_id, image.to_bytes(), max_steps, engine, self.cpu_time)
+        try:
+            job.future = executor.submit(execute_job, *args)
+        except BrokenProcessPool:
+            with self.lock:
+                executor = self._ensure_executor(broken=executor)
+            job.future = executor.submit(execute_job, *args)
+        job.future.add_done_callback(lambda future: self._on_done(job, future))
+        return job
+
+    def _on_done(self, job, future):
+        with self.lock:
+            if future.cancelled():
+                job.status = 'cancelled'
+                job.finished = time.time()
+                job.done.set()
+                return
+            error = future.exception()
+            if error is not None:
+                # 工作进程异常退出（例如被硬限制杀死）
+                job.status = 'failed'
+                job.error = str(error) or type(error).__name__
+                job.finished = time.time()
+                job.done.set()
+                return
+            result = future.result()
+            if result['reason'] in ('halt', 'error', 'limit'):
+                # 只缓存确定性的结果，资源超限与机器负载有关
+                self.results[job.key] = result
+                while len(self.results) > self.cache_size:
+                    self.results.popitem(last=False)
+            self._finish(job, result)
+
+    def _finish(self, job, result):
+        # 检查点是二进制数据，单独保存，result保持可JSON序列化
+        job.checkpoint = result.get('checkpoint')
+        job.result = {key: value for key, value in result.items() if key != 'checkpoint'}
+        job.steps = result['steps']
+        if result['reason'] in ('cpu_time', 'memory'):
+            job.status = 'failed'
+            job.error = result['error']
+        else:
+            job.status = 'done'
+        job.finished = time.time()
+        job.done.set()
+
+    def _trim_jobs(self):
+        """只保留最近max_jobs个作业，未完成的作业不删除"""
+        for job_id, job in list(self.jobs.items()):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if job.done.is_set():
+                del self.jobs[job_id]
+
+    def get(self, job_id):
+        """按ID查找作业，不存在时抛出JobError"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise JobError(f"Unknown job: {job_id}")
+        return job
+
+    def cancel(self, job_id):
+        """取消尚未开始执行的作业，返回是否成功"""
+        job = self.get(job_id)
+        return job.future is not None and job.future.cancel()
+
+    def wait(self, job_id, timeout=None):
+        """等待作业结束，返回Job"""
+        job = self.get(job_id)
+        job.done.wait(timeout)
+        return job
+
+    def shutdown(self):
+        """关闭进程池和进度监听线程"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.queue is not None:
+            self.queue.put(None)
+            self.listener.join()
+            self.queue.close()
+            self.queue = None
+
+    def get_stats(self):
+        """返回作业与缓存统计"""
+        with self.lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self.jobs.values():
+                counts[job.status] += 1
+            return {'jobs': counts, 'cached_results': len(self.results),
+                    'workers': self.max_workers}
@@ -0,0 +1,230 @@
+# src/loader.py
+
+import hashlib
+import os
+import struct
+
+from .utils import ParseError
+
+# 二进制镜像格式: 文件头(魔数, 版本, 段数)，之后每段为(地址, 长度)加原始字节
+IMAGE_MAGIC = b'Y86I'
+IMAGE_VERSION = 1
+_HEADER = struct.Struct('<4sHI')
+_SEGMENT = struct.Struct('<QI')
+
+
+class ProgramImage:
+    """
+    程序镜像: 按出现顺序排列的连续段列表[(起始地址, 字节), ...]。
+    段之间有重叠时后面的段覆盖前面的，与逐字节加载的结果一致。
+    """
+
+    __slots__ = ('segments',)
+
+    def __init__(self, segments=()):
+        self.segments = [(addr, bytes(data)) for addr, data in segments if data]
+
+    @property
+    def entry(self):
+        """程序入口: 最小的已加载地址"""
+        return min(addr for addr, _ in self.segments)
+
+    def __len__(self):
+        return sum(len(data) for _, data in self.segments)
+
+    def __eq__(self, other):
+        if not isinstance(other, ProgramImage):
+            return NotImplemented
+        return self.segments == other.segments
+
+    def to_dict(self):
+        """转换为{地址: 字节}字典（parse_yo_file的旧格式）"""
+        program = {}
+        for addr, data in self.segments:
+            for i, byte in enumerate(data):
+                program[addr + i] = byte
+        return program
+
+    def to_bytes(self):
+        """序列化为紧凑的二进制格式"""
+        parts = [_HEADER.pack(IMAGE_MAGIC, IMAGE_VERSION, len(self.segments))]
+        for addr, data in self.segments:
+            parts.append(_SEGMENT.pack(addr, len(data)))
+            parts.append(data)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """从to_bytes的结果恢复镜像"""
+        view = memoryview(blob)
+        if len(view) < _HEADER.size:
+            raise ParseError("Truncated program image")
+        magic, version, count = _HEADER.unpack_from(view, 0)
+        if magic != IMAGE_MAGIC or version != IMAGE_VERSION:
+            raise ParseError("Unsupported program image format")
+
+        segments = []
+        pos = _HEADER.size
+        for _ in range(count):
+            if pos + _SEGMENT.size > len(view):
+                raise ParseError("Truncated program image")
+            addr, length = _SEGMENT.unpack_from(view, pos)
+            pos += _SEGMENT.size
+            if pos + length > len(view):
+                raise ParseError("Truncated program image")
+            segments.append((addr, bytes(view[pos:pos + length])))
+            pos += length
+        if pos != len(view):
+            raise ParseError("Trailing data in program image")
+
+        image = cls()
+        image.segments = segments
+        return image
+
+
+def iter_yo_segments(lines):
+    """
+    逐行解析.yo内容，产生(起始地址, 字节)段。
+    地址紧接上一行末尾的行合并到同一段中，只在内存中保留当前段。
+    """
+    start = None
+    buffer = bytearray()
+    for lineno, line in enumerate(lines, 1):
+        # '|'之后是汇编源码注释
+        code = line.split('|', 1)[0]
+        if ':' not in code:
+            continue
+        addr_str, instr = code.split(':', 1)
+        addr_str = addr_str.strip()
+        # 与原先的逐字节解析一致，忽略末尾多出的半个字节
+        instr = ''.join(instr.split())
+        instr = instr[:len(instr) & ~1]
+        if not addr_str or not instr:
+            continue
+
+        try:
+            addr = int(addr_str, 16)
+            data = bytes.fromhex(instr)
+        except ValueError:
+            raise ParseError(f"Invalid .yo line {lineno}: {line.strip()}") from None
+        if addr < 0:
+            raise ParseError(f"Invalid .yo line {lineno}: {line.strip()}")
+
+        if start is not None and addr == start + len(buffer):
+            buffer += data
+        else:
+            if buffer:
+                yield start, bytes(buffer)
+            start = addr
+            buffer = bytearray(data)
+
+    if buffer:
+        yield start, bytes(buffer)
+
+
+def parse_yo(source):
+    """解析.yo内容，source可以是字符串或按行迭代的文本文件对象"""
+    if isinstance(source, str):
+        source = source.splitlines()
+    return ProgramImage(iter_yo_segments(source))
+
+
+def read_yo_file(path):
+    """流式解析磁盘上的.yo文件"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        return parse_yo(file)
+
+
+def is_assembly(path):
+    """.ys为汇编源码，其余按.yo目标文件处理"""
+    return path.lower().endswith('.ys')
+
+
+def read_program_file(path):
+    """读取.yo或.ys程序文件，返回ProgramImage"""
+    if is_assembly(path):
+        from .assembler import assemble_file
+        return assemble_file(path)
+    return read_yo_file(path)
+
+
+def _source_key(kind):
+    """缓存键的前缀: .ys的键包含汇编器版本，与.yo的键互不冲突"""
+    if kind == 'ys':
+        from .assembler import ASSEMBLER_VERSION
+        return f"ys{ASSEMBLER_VERSION}\0".encode()
+    return b''
+
+
+class ImageCache:
+    """
+    按文件内容的SHA-256缓存解析（或汇编）后的二进制镜像。
+    内容相同的程序再次加载时直接读取镜像，不再解析文本。
+    """
+
+    SUFFIX = '.y86img'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest + self.SUFFIX)
+
+    def _lookup(self, digest):
+        try:
+            with open(self.path_for(digest), 'rb') as file:
+                image = ProgramImage.from_bytes(file.read())
+        except (OSError, ParseError):
+            # 缺失或损坏的缓存文件按未命中处理
+            return None
+        self.hits += 1
+        return image
+
+    def _store(self, digest, image):
+        # 先写临时文件再改名，并发写入同一镜像时不会读到半个文件
+        import tempfile
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(image.to_bytes())
+            os.replace(tmp_path, self.path_for(digest))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def load_file(self, path):
+        """加载.yo/.ys文件对应的镜像，未命中时解析或汇编并写入缓存"""
+        digest = hashlib.sha256(_source_key('ys' if is_assembly(path) else 'yo'))
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        image = self._lookup(digest)
+        if image is None:
+            self.misses += 1
+            image = read_program_file(path)
+            self._store(digest, image)
+        return image
+
+    def load_text(self, content, kind='yo'):
+        """加载字符串形式的程序对应的镜像，kind为'yo'或'ys'"""
+        digest = hashlib.sha256(_source_key(kind) + content.encode('utf-8')).hexdigest()
+        image = self._lookup(digest)
+        if image is None:
+            self.misses += 1
+            if kind == 'ys':
+                from .assembler import assemble
+                image = assemble(content)
+            else:
+                image = parse_yo(content)
+            self._store(digest, image)
+        return image
+
+    def get_stats(self):
+        """返回命中/未命中统计"""
+        return {'hits': self.hits, 'misses': self.misses}
@@ -1,14 +1,268 @@
+import re
+
+from .utils import MemoryError
+
+# 分页参数: 每页4KiB，按需分配
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+MAX_ADDRESS = (1 << 64) - 1
+QUAD_MASK = (1 << 64) - 1
+
+# 匹配连续的非零字节
+_NONZERO_RUN = re.compile(rb'[^\x00]+')
+
+# 导出连续段时，间隔小于该字节数的非零区域合并为一段
+SEGMENT_GAP = 16
+
+
+def _merge_runs(runs):
+    """把按地址排序的(地址, 字节)非零区域合并为连续段，短的零间隔一并写入"""
+    segments = []
+    for addr, data in runs:
+        if segments:
+            start, buffer = segments[-1]
+            gap = addr - (start + len(buffer))
+            if gap < SEGMENT_GAP:
+                buffer += bytes(gap)
+                buffer += data
+                continue
+        segments.append((addr, bytearray(data)))
+    return [(addr, bytes(buffer)) for addr, buffer in segments]
+
+
+class MemorySnapshot:
+    """
+    内存快照。
+
+    快照持有的页在任何内存实例中都不会被原地修改，因此可以被多次恢复，
+    也可以同时被多个内存实例共享。
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+
 class Memory:
+    """
+    基于分页bytearray的内存。
+
+    只为写入过非零数据的页分配4KiB的bytearray，未分配的页读出为0，
+    八字节访问通过int.from_bytes直接在页内完成。
+    快照与恢复以写时复制的方式共享未修改的页。
+    """
+
+    def __init__(self):
+        self.pages = {}
+        # 本实例可以原地修改的页，其余页与快照共享
+        self.owned = set()
+        self.max_address = MAX_ADDRESS
+        # 写入观察者列表，回调签名为 callback(addr, size)
+        self.observers = []
+
+    def _check(self, addr, size=1):
+        if not (0 <= addr and addr + size - 1 <= self.max_address):
+            raise MemoryError(f"Invalid memory address: {addr}")
+
+    def _page_for_write(self, page_no):
+        page = self.pages.get(page_no)
+        if page is None:
+            page = self.pages[page_no] = bytearray(PAGE_SIZE)
+            self.owned.add(page_no)
+        elif page_no not in self.owned:
+            # 写时复制
+            page = self.pages[page_no] = bytearray(page)
+            self.owned.add(page_no)
+        return page
+
+    def write_byte(self, addr, value):
+        """写入一个字节"""
+        if not (0 <= addr <= self.max_address):
+            raise MemoryError(f"Invalid memory address: {addr}")
+        value &= 0xFF
+        page_no = addr >> PAGE_BITS
+        if page_no not in self.owned:
+            if value == 0 and page_no not in self.pages:  # 未分配的页本来就是0
+                # 内容不变也要通知观察者（写入监视点等关心的是写操作本身）
+                if self.observers:
+                    self._notify(addr, 1)
+                return
+            page = self._page_for_write(page_no)
+        else:
+            page = self.pages[page_no]
+        page[addr & PAGE_MASK] = value
+        if self.observers:
+            self._notify(addr, 1)
+
+    def read_byte(self, addr):
+        """读取一个字节"""
+        if not (0 <= addr <= self.max_address):
+            raise MemoryError(f"Invalid memory address: {addr}")
+        page = self.pages.get(addr >> PAGE_BITS)
+        if page is None:
+            return 0
+        return page[addr & PAGE_MASK]
+
+    def write_quad(self, addr, value):
+        """写入八字节（小端序）"""
+        if not (0 <= addr and addr + 7 <= self.max_address):
+            raise MemoryError(f"Invalid memory address: {addr}")
+        offset = addr & PAGE_MASK
+        if offset <= PAGE_SIZE - 8:
+            page_no = addr >> PAGE_BITS
+            if page_no not in self.owned:
+                if value & QUAD_MASK == 0 and page_no not in self.pages:
+                    if self.observers:
+                        self._notify(addr, 8)
+                    return
+                page = self._page_for_write(page_no)
+            else:
+                page = self.pages[page_no]
+            page[offset:offset + 8] = (value & QUAD_MASK).to_bytes(8, 'little')
+            if self.observers:
+                self._notify(addr, 8)
+        else:
+            # 跨页写入
+            self.write_bytes(addr, (value & QUAD_MASK).to_bytes(8, 'little'))
+
+    def read_quad(self, addr):
+        """读取八字节（小端序，无符号）"""
+        if not (0 <= addr and addr + 7 <= self.max_address):
+            raise MemoryError(f"Invalid memory address: {addr}")
+        offset = addr & PAGE_MASK
+        if offset <= PAGE_SIZE - 8:
+            page = self.pages.get(addr >> PAGE_BITS)
+            if page is None:
+                return 0
+            return int.from_bytes(page[offset:offset + 8], 'little')
+        # 跨页读取
+        return int.from_bytes(self.read_bytes(addr, 8), 'little')
+
+    def write_bytes(self, addr, data):
+        """批量写入一段连续字节"""
+        self._check(addr, max(len(data), 1))
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            curr = addr + pos
+            offset = curr & PAGE_MASK
+            chunk = view[pos:pos + PAGE_SIZE - offset]
+            page_no = curr >> PAGE_BITS
+            if page_no in self.pages or any(chunk):
+                page = self._page_for_write(page_no)
+                page[offset:offset + len(chunk)] = chunk
+            pos += len(chunk)
+        if self.observers and len(data):
+            self._notify(addr, len(data))
+
+    def read_bytes(self, addr, size):
+        """批量读取一段连续字节"""
+        self._check(addr, max(size, 1))
+        result = bytearray(size)
+        pos = 0
+        while pos < size:
+            curr = addr + pos
+            offset = curr & PAGE_MASK
+            length = min(size - pos, PAGE_SIZE - offset)
+            page = self.pages.get(curr >> PAGE_BITS)
+            if page is not None:
+                result[pos:pos + length] = memoryview(page)[offset:offset + length]
+            pos += length
+        return bytes(result)
+
+    def _notify(self, addr, size):
+        """通知观察者[addr, addr + size)已被写入"""
+        for callback in self.observers:
+            callback(addr, size)
+
+    def get_nonzero_memory(self):
+        """获取所有非零内存值，并按地址排序"""
+        result = {}
+        for page_no in sorted(self.pages):
+            base = page_no << PAGE_BITS
+            for match in _NONZERO_RUN.finditer(self.pages[page_no]):
+                start = base + match.start()
+                for i, value in enumerate(match.group()):
+                    result[start + i] = value
+        return result
+
+    def segments(self):
+        """按地址顺序返回覆盖全部非零内容的连续段[(起始地址, 字节), ...]"""
+        def runs():
+            # 以页为单位，只去掉页首尾的零字节，页内的零由压缩等后续处理
+            for page_no in sorted(self.pages):
+                page = self.pages[page_no]
+                data = page.strip(b'\x00')
+                if data:
+                    start = len(page) - len(page.lstrip(b'\x00'))
+                    yield (page_no << PAGE_BITS) + start, data
+        return _merge_runs(runs())
+
+    def clear(self):
+        """清空内存"""
+        self.pages.clear()
+        self.owned.clear()
+        if self.observers:
+            self._notify(0, self.max_address + 1)
+
+    def snapshot(self):
+        """创建内存快照，只复制页表，页本身与快照共享"""
+        self.owned.clear()
+        return MemorySnapshot(dict(self.pages))
+
+    def restore(self, snapshot):
+        """恢复到快照时的内容"""
+        self.pages = dict(snapshot.data)
+        self.owned = set()
+        if self.observers:
+            self._notify(0, self.max_address + 1)
+
+    def footprint(self):
+        """估算已分配页占用的字节数"""
+        return len(self.pages) * PAGE_SIZE
+
+    def fork(self):
+        """创建一个与当前内容共享页的新内存实例"""
+        memory = Memory()
+        memory.restore(self.snapshot())
+        return memory
+
+    def dump_memory(self):
+        """返回内存内容的格式化字符串"""
+        memory_dump = []
+        for addr, value in self.get_nonzero_memory().items():
+            memory_dump.append(f"0x{addr:04x}: 0x{value:02x}")
+        return "\n".join(memory_dump)
+
+
+class SparseMemory:
+    """
+    以字典逐字节存储非零值的内存实现。
+
+    这是最初的存储方式，保留用于对照测试和性能比较。
+    """
+
     def __init__(self):
         self.memory = {}
-        self.max_address = (1 << 64) - 1
+        self.max_address = MAX_ADDRESS
+        # 写入观察者列表，回调签名为 callback(addr, size)
+        self.observers = []
 
     def write_byte(self, addr, value):
         """写入一个字节"""
         if not (0 <= addr <= self.max_address):
             raise MemoryError(f"Invalid memory address: {addr}")
+        value &= 0xFF
         if value != 0:  # 只存储非零值
-            self.memory[addr] = value & 0xFF
+            self.memory[addr] = value
+        else:
+            self.memory.pop(addr, None)
+        if self.observers:
+            self._notify(addr, 1)
 
     def read_byte(self, addr):
         """读取一个字节"""
@@ -18,32 +272,74 @@ class Memory:
 
     def write_quad(self, addr, value):
         """写入八字节"""
-        for i in range(8):
-            byte_val = (value >> (i * 8)) & 0xFF
-            if byte_val != 0:  # 只存储非零值
-                self.write_byte(addr + i, byte_val)
+        self.write_bytes(addr, (value & QUAD_MASK).to_bytes(8, 'little'))
 
     def read_quad(self, addr):
         """读取八字节"""
-        value = 0
-        for i in range(8):
-            value |= self.read_byte(addr + i) << (i * 8)
-        return value
+        return int.from_bytes(self.read_bytes(addr, 8), 'little')
+
+    def write_bytes(self, addr, data):
+        """批量写入一段连续字节"""
+        if not (0 <= addr and addr + max(len(data), 1) - 1 <= self.max_address):
+            raise MemoryError(f"Invalid memory address: {addr}")
+        memory = self.memory
+        for i, value in enumerate(data):
+            if value != 0:  # 只存储非零值
+                memory[addr + i] = value
+            else:
+                memory.pop(addr + i, None)
+        if self.observers and len(data):
+            self._notify(addr, len(data))
+
+    def read_bytes(self, addr, size):
+        """批量读取一段连续字节"""
+        if not (0 <= addr and addr + max(size, 1) - 1 <= self.max_address):
+            raise MemoryError(f"Invalid memory address: {addr}")
+        get = self.memory.get
+        return bytes(get(addr + i, 0) for i in range(size))
+
+    def _notify(self, addr, size):
+        """通知观察者[addr, addr + size)已被写入"""
+        for callback in self.observers:
+            callback(addr, size)
 
     def get_nonzero_memory(self):
         """获取所有非零内存值，并按地址排序"""
-        return dict(sorted(
-            ((addr, value) for addr, value in self.memory.items() if value != 0),
-            key=lambda x: x[0]
-        ))
+        return dict(sorted(self.memory.items()))
+
+    def segments(self):
+        """按地址顺序返回覆盖全部非零内容的连续段[(起始地址, 字节), ...]"""
+        return _merge_runs((addr, bytes((value,))) for addr, value in sorted(self.memory.items()))
 
     def clear(self):
         """清空内存"""
         self.memory.clear()
+        if self.observers:
+            self._notify(0, self.max_address + 1)
+
+    def snapshot(self):
+        """创建内存快照（完整复制字典）"""
+        return MemorySnapshot(dict(self.memory))
+
+    def restore(self, snapshot):
+        """恢复到快照时的内容"""
+        self.memory = dict(snapshot.data)
+        if self.observers:
+            self._notify(0, self.max_address + 1)
+
+    def footprint(self):
+        """估算字典存储占用的字节数（每个条目约100字节）"""
+        return len(self.memory) * 100
+
+    def fork(self):
+        """创建一个内容相同的新内存实例"""
+        memory = SparseMemory()
+        memory.restore(self.snapshot())
+        return memory
 
     def dump_memory(self):
         """返回内存内容的格式化字符串"""
         memory_dump = []
         for addr, value in sorted(self.memory.items()):
             memory_dump.append(f"0x{addr:04x}: 0x{value:02x}")
-        return "\n".join(memory_dump)
\ No newline at end of file
+        return "\n".join(memory_dump)
@@ -0,0 +1,131 @@
+# src/output.py
+
+import os
+
+import yaml
+
+from .utils import Y86Error
+
+REG_ORDER = (
+    'rax', 'rcx', 'rdx', 'rbx', 'rsp', 'rbp', 'rsi', 'rdi',
+    'r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14'
+)
+
+# 有libyaml时使用C实现的dumper
+_BaseDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# libyaml不接受float('inf')作为行宽，用足够大的整数代替
+_NO_WRAP = 1 << 30
+
+
+class NoAliasDumper(_BaseDumper):
+    """不生成锚点/别名，整数统一按十进制输出"""
+
+    def ignore_aliases(self, data):
+        return True
+
+
+def _represent_int(dumper, data):
+    return dumper.represent_scalar('tag:yaml.org,2002:int', str(data))
+
+
+NoAliasDumper.add_representer(int, _represent_int)
+
+
+def format_memory_dump(memory):
+    """
+    格式化内存转储:
+    - 按8字节对齐
+    - 使用小端法解释为十进制有符号整数
+    - 只保留非零值
+    """
+    non_zero_memory = {}
+    if not memory:
+        return non_zero_memory
+
+    # 获取所有地址并按8字节对齐
+    all_addresses = set(memory.keys())
+    aligned_addresses = set(addr - (addr % 8) for addr in all_addresses)
+
+    for base_addr in sorted(aligned_addresses):
+        # 使用小端法读取8字节
+        value = 0
+        bytes_present = False
+        for i in range(8):
+            curr_addr = base_addr + i
+            if curr_addr in memory:
+                bytes_present = True
+                value |= (memory[curr_addr] & 0xFF) << (i * 8)
+
+        # 只在实际有字节的地址处保存值
+        if bytes_present:
+            # 转换为有符号整数（64位）
+            if value & (1 << 63):  # 如果最高位为1（负数）
+                value = -(((~value) + 1) & ((1 << 64) - 1))
+            non_zero_memory[base_addr] = value
+
+    return non_zero_memory
+
+
+def build_output_data(state):
+    """把CPU状态转换为输出文件的数据结构，所有数值使用十进制格式"""
+    registers = state.get('registers', {})
+    flags = state.get('flags', {})
+    return [{
+        'PC': int(state.get('pc', 0)),
+        'REG': {reg: int(registers.get(reg, 0)) for reg in REG_ORDER},
+        'CC': {
+            'ZF': int(flags.get('ZF', 0)),
+            'SF': int(flags.get('SF', 0)),
+            'OF': int(flags.get('OF', 0))
+        },
+        'MEM': format_memory_dump(state.get('memory', {})),
+        'STAT': 1 if state.get('status') == 'HLT' else 2
+    }]
+
+
+def dump_yaml_output(state, stream=None):
+    """把CPU状态序列化为YAML，stream为None时返回字符串"""
+    return yaml.dump(build_output_data(state), stream,
+                     Dumper=NoAliasDumper,
+                     default_flow_style=False,
+                     sort_keys=False,
+                     width=_NO_WRAP)  # 防止长行被折断
+
+
+def write_yaml_output(state, output_path):
+    """把CPU状态写入YAML文件"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        dump_yaml_output(state, f)
+    return output_path
+
+
+def output_path_for(filename, output_folder='output'):
+    """返回filename对应的输出文件路径，只保留文件名中的字母数字和-_"""
+    if not filename or not isinstance(filename, str):
+        filename = "output"
+    safe_filename = "".join(c for c in filename if c.isalnum() or c in ('-', '_')) or "output"
+    return os.path.join(output_folder, f"{safe_filename}.yml")
+
+
+def write_text_if_changed(text, output_path):
+    """内容与已有文件相同时不重写，返回是否写入"""
+    try:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+
+def generate_yaml_output(filename, state, output_folder='output'):
+    """生成YAML格式的输出文件，文件名取自filename并放在output_folder下"""
+    try:
+        return write_yaml_output(state, output_path_for(filename, output_folder))
+
+    except Exception as e:
+        # print(f"Error generating output file: {str(e)}")
+        raise Y86Error(f"Failed to generate output file: {str(e)}")
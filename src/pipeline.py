@@ -0,0 +1,162 @@
+# src/pipeline.py
+
+from .decoder import RNONE
+from .utils import Y86Error
+
+# 流水线级数: F, D, E, M, W
+STAGES = 5
+
+# 各类冒险插入的气泡数
+LOAD_USE_BUBBLES = 1
+MISPREDICT_BUBBLES = 2
+RET_BUBBLES = 3
+
+RSP = 4
+
+# icode -> 指令类别名
+CLASS_NAMES = {
+    0x0: 'halt', 0x1: 'nop', 0x2: 'rrmovq', 0x3: 'irmovq', 0x4: 'rmmovq',
+    0x5: 'mrmovq', 0x6: 'OPq', 0x7: 'jXX', 0x8: 'call', 0x9: 'ret',
+    0xA: 'pushq', 0xB: 'popq'
+}
+
+
+def source_registers(icode, rA, rB):
+    """译码阶段读取的寄存器(srcA, srcB)，不读取时为RNONE"""
+    if icode in (0x2,):  # rrmovq/cmovXX
+        return rA, RNONE
+    if icode in (0x4, 0x6):  # rmmovq, OPq
+        return rA, rB
+    if icode == 0x5:  # mrmovq
+        return RNONE, rB
+    if icode == 0xA:  # pushq
+        return rA, RSP
+    if icode in (0x8,):  # call
+        return RNONE, RSP
+    if icode in (0x9, 0xB):  # ret, popq
+        return RSP, RSP
+    return RNONE, RNONE
+
+
+class PipelineModel:
+    """
+    PIPE流水线的时序模型（CS:APP第4.5节）。
+
+    按程序实际执行的指令序列逐条输入，根据PIPE的冒险处理规则统计周期:
+    - 数据冒险通过转发解决，只有加载/使用冒险（mrmovq/popq的结果
+      紧接着被下一条指令在译码阶段读取）插入1个气泡；
+    - 条件跳转总是预测为跳转，预测错误时取消2条指令；
+    - ret在写回前无法取下一条指令，插入3个气泡。
+    体系结构状态由顺序执行得到，因此与其他执行引擎完全一致。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.instructions = 0
+        self.bubbles = {'load_use': 0, 'mispredict': 0, 'ret': 0}
+        self.classes = {}
+        self._load_dst = RNONE
+        self._load_class = None
+
+    def _class_stats(self, name):
+        stats = self.classes.get(name)
+        if stats is None:
+            stats = self.classes[name] = {'count': 0, 'load_use': 0, 'mispredict': 0,
+                                          'ret': 0}
+        return stats
+
+    def feed(self, icode, ifun, rA, rB, taken=True):
+        """输入一条进入流水线的指令，taken为条件跳转的实际结果"""
+        name = CLASS_NAMES.get(icode, 'invalid')
+        stats = self._class_stats(name)
+        stats['count'] += 1
+        self.instructions += 1
+
+        # 加载/使用冒险: 气泡计入产生数据的加载指令
+        if self._load_dst != RNONE and self._load_dst in source_registers(icode, rA, rB):
+            self.bubbles['load_use'] += LOAD_USE_BUBBLES
+            self.classes[self._load_class]['load_use'] += LOAD_USE_BUBBLES
+
+        if icode in (0x5, 0xB):  # mrmovq, popq: dstM为rA
+            self._load_dst = rA
+            self._load_class = name
+        else:
+            self._load_dst = RNONE
+
+        if icode == 0x7 and ifun != 0 and not taken:
+            self.bubbles['mispredict'] += MISPREDICT_BUBBLES
+            stats['mispredict'] += MISPREDICT_BUBBLES
+        elif icode == 0x9:
+            self.bubbles['ret'] += RET_BUBBLES
+            stats['ret'] += RET_BUBBLES
+
+    def get_stats(self):
+        """
+        返回周期统计。cycles包含最后一条指令流出流水线的STAGES-1个周期，
+        cpi按CS:APP的定义不计这部分启动开销。
+        """
+        instructions = self.instructions
+        bubbles = sum(self.bubbles.values())
+        cycles = instructions + bubbles + (STAGES - 1 if instructions else 0)
+        return {
+            'instructions': instructions,
+            'cycles': cycles,
+            'bubbles': dict(self.bubbles),
+            'cpi': (instructions + bubbles) / instructions if instructions else 0.0,
+            'classes': {name: dict(stats) for name, stats in sorted(self.classes.items())}
+        }
+
+
+class PipelineEngine:
+    """
+    在Y86CPU上以PIPE时序模型执行。
+
+    每条指令仍按Y86CPU.step的语义执行（复用解码缓存与执行函数），
+    同一条解码记录同时输入PipelineModel统计周期，每条指令只查找一次解码缓存。
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.model = PipelineModel()
+
+    def reset(self):
+        self.model.reset()
+
+    def run(self, max_steps=None):
+        """连续执行，返回(最终状态, 成功执行的指令数)，与Y86CPU.run一致"""
+        cpu = self.cpu
+        model = self.model
+        fetch = cpu.decode_cache.fetch
+        memory = cpu.memory
+        inst = cpu.curr_inst
+        steps = 0
+        while cpu.status == 'AOK':
+            if max_steps is not None and steps >= max_steps:
+                break
+            try:
+                record = fetch(memory, cpu.pc)
+            except Exception:
+                # 取指失败: 与Y86CPU.fetch相同地停机，没有指令进入流水线
+                cpu.status = 'HLT'
+                break
+            inst.load(record)
+            try:
+                cpu.execute()
+            except Y86Error:
+                # 执行出错: 状态已置为INS，PC停在出错的指令
+                ok = False
+            else:
+                cpu.pc = inst.valP
+                ok = cpu.status == 'AOK'
+            icode, ifun, rA, rB, _, _ = record
+            # jXX不改变条件码，执行后再求值即得实际跳转方向
+            taken = icode != 0x7 or cpu.check_condition(ifun)
+            model.feed(icode, ifun, rA, rB, taken)
+            if ok:
+                steps += 1
+        return cpu.get_state(), steps
+
+    def get_stats(self):
+        return self.model.get_stats()
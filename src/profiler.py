@@ -0,0 +1,170 @@
+# src/profiler.py
+
+from time import perf_counter_ns
+
+from .assembler import INSTRUCTIONS
+
+# (icode, ifun) -> 助记符
+MNEMONICS = {(icode, ifun): name for name, (icode, ifun, _) in INSTRUCTIONS.items()}
+
+# 访问内存的指令: 每条读或写一个8字节的字
+MEMORY_READS = (0x5, 0x9, 0xB)   # mrmovq, ret, popq
+MEMORY_WRITES = (0x4, 0x8, 0xA)  # rmmovq, call, pushq
+
+# 热点表默认显示的行数
+DEFAULT_HOT_SPOTS = 20
+
+
+def mnemonic(icode, ifun):
+    return MNEMONICS.get((icode, ifun), f'invalid({icode:x}:{ifun:x})')
+
+
+class Profiler:
+    """
+    Y86CPU的执行剖析器，通过Y86CPU.enable_profiling()开启。
+
+    开启后step()与run()都经由剖析器逐条执行，统计:
+    - 每个PC的执行次数与耗时；
+    - 每种指令(icode, ifun)的执行次数与耗时；
+    - 内存读写次数；
+    - call/ret构成的调用图，以及每个函数（按入口地址）自身执行的指令数。
+    未开启时Y86CPU只多一次属性判断，快速执行循环不受影响。
+    停机指令与出错的指令也计入执行次数。
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.reset()
+
+    def reset(self):
+        self.instructions = 0
+        self.time_ns = 0
+        self.pcs = {}
+        self.opcodes = {}
+        self.reads = 0
+        self.writes = 0
+        self.calls = {}
+        self.functions = {}
+        self._function = None
+        self._stack = []
+
+    def record(self, pc, icode, ifun, valC, completed, elapsed):
+        """记录一条已取指的指令，completed为执行是否成功"""
+        self.instructions += 1
+        self.time_ns += elapsed
+
+        stats = self.pcs.get(pc)
+        if stats is None:
+            stats = self.pcs[pc] = [0, 0, icode, ifun]
+        stats[0] += 1
+        stats[1] += elapsed
+
+        stats = self.opcodes.get((icode, ifun))
+        if stats is None:
+            stats = self.opcodes[(icode, ifun)] = [0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+
+        # 第一条指令所在的函数为程序入口
+        function = self._function
+        if function is None:
+            function = self._function = pc
+        self.functions[function] = self.functions.get(function, 0) + 1
+
+        if not completed:
+            return
+        if icode in MEMORY_READS:
+            self.reads += 1
+        elif icode in MEMORY_WRITES:
+            self.writes += 1
+
+        if icode == 0x8:  # call
+            edge = (function, valC)
+            self.calls[edge] = self.calls.get(edge, 0) + 1
+            self._stack.append(function)
+            self._function = valC
+        elif icode == 0x9 and self._stack:  # ret
+            self._function = self._stack.pop()
+
+    def step(self):
+        """与Y86CPU.step语义一致的单步执行，同时记录统计"""
+        cpu = self.cpu
+        pc = cpu.pc
+        start = perf_counter_ns()
+        if not cpu.fetch():
+            return False
+        inst = cpu._inst
+        icode, ifun, valC = inst.icode, inst.ifun, inst.valC
+        try:
+            cpu.execute()
+            cpu.pc = inst.valP
+            ok = cpu.status == 'AOK'
+        except Exception:
+            ok = False
+        self.record(pc, icode, ifun, valC, cpu.status != 'INS', perf_counter_ns() - start)
+        return ok
+
+    def run(self, max_steps=None):
+        """连续执行，返回(最终状态, 成功执行的指令数)，与Y86CPU.run一致"""
+        cpu = self.cpu
+        steps = 0
+        while cpu.status == 'AOK':
+            if max_steps is not None and steps >= max_steps:
+                break
+            if self.step():
+                steps += 1
+        return cpu.get_state(), steps
+
+    def hot_spots(self, limit=DEFAULT_HOT_SPOTS):
+        """按执行次数降序返回前limit个PC的统计"""
+        rows = sorted(self.pcs.items(), key=lambda item: (-item[1][0], item[0]))
+        if limit is not None:
+            rows = rows[:limit]
+        total = self.instructions or 1
+        return [
+            {
+                'pc': pc,
+                'instruction': mnemonic(icode, ifun),
+                'count': count,
+                'percent': 100.0 * count / total,
+                'time_ns': time_ns
+            }
+            for pc, (count, time_ns, icode, ifun) in rows
+        ]
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        return {
+            'instructions': self.instructions,
+            'time_ns': self.time_ns,
+            'memory': {'reads': self.reads, 'writes': self.writes},
+            'pcs': [
+                {'pc': pc, 'instruction': mnemonic(icode, ifun), 'count': count,
+                 'time_ns': time_ns}
+                for pc, (count, time_ns, icode, ifun) in sorted(self.pcs.items())
+            ],
+            'opcodes': [
+                {'icode': icode, 'ifun': ifun, 'instruction': mnemonic(icode, ifun),
+                 'count': count, 'time_ns': time_ns}
+                for (icode, ifun), (count, time_ns) in sorted(self.opcodes.items())
+            ],
+            'calls': [
+                {'caller': caller, 'callee': callee, 'count': count}
+                for (caller, callee), count in sorted(self.calls.items())
+            ],
+            'functions': [
+                {'entry': entry, 'instructions': count}
+                for entry, count in sorted(self.functions.items())
+            ]
+        }
+
+
+def format_hot_spots(rows):
+    """把hot_spots()的结果格式化为文本表格"""
+    lines = [f"{'PC':>8}  {'Count':>10}  {'%':>6}  {'Time(us)':>10}  Instruction"]
+    for row in rows:
+        lines.append(
+            f"{row['pc']:#8x}  {row['count']:>10}  {row['percent']:>6.2f}  "
+            f"{row['time_ns'] / 1000:>10.1f}  {row['instruction']}"
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,124 @@
+# src/results.py
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from .cpu import ENGINE_VERSION
+
+# 默认磁盘缓存大小上限（字节）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def result_key(image, max_steps=None):
+    """结果缓存的键: 程序镜像、指令数上限与指令语义版本的SHA-256"""
+    digest = hashlib.sha256(f"Y86R|{ENGINE_VERSION}|{max_steps}|".encode())
+    digest.update(image.to_bytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    按程序内容寻址的执行结果磁盘缓存。
+
+    每个条目是一个gzip压缩的JSON文件，保存最终状态、指令数、YAML输出
+    以及可选的按模式区分的执行轨迹。文件的修改时间作为最近使用时间，
+    命中时更新；总大小超过max_bytes时按最久未使用的顺序删除条目。
+    多个进程可以共享同一目录: 写入先写临时文件再改名。
+    """
+
+    SUFFIX = '.json.gz'
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """返回缓存的条目字典，未命中时返回None"""
+        path = self.path_for(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                entry = json.load(file)
+            os.utime(path)
+        except (OSError, EOFError, ValueError):
+            # 缺失、被其他进程淘汰或损坏的条目按未命中处理
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, state, steps, yaml_text, trace_mode=None, trace=None):
+        """
+        写入条目。trace_mode/trace给出时与已有条目的其他模式轨迹合并。
+        state与trace必须可JSON序列化。
+        """
+        entry = {'state': state, 'steps': steps, 'yaml': yaml_text, 'traces': {}}
+        if trace_mode is not None:
+            existing = self.get(key)
+            if existing is not None:
+                self.hits -= 1
+                entry['traces'] = existing.get('traces', {})
+            entry['traces'][trace_mode] = trace
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as file:
+                file.write(json.dumps(entry, separators=(',', ':')).encode('utf-8'))
+            os.replace(tmp_path, self.path_for(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return entry
+        self.evict()
+        return entry
+
+    def entries(self):
+        """返回[(最近使用时间, 大小, 路径)]"""
+        result = []
+        with os.scandir(self.directory) as scan:
+            for item in scan:
+                if not item.name.endswith(self.SUFFIX):
+                    continue
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                result.append((stat.st_mtime, stat.st_size, item.path))
+        return result
+
+    def evict(self):
+        """删除最久未使用的条目直到总大小不超过max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get_stats(self):
+        """返回命中、未命中、淘汰次数与当前占用"""
+        entries = self.entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,172 @@
+# src/sessions.py
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from .utils import SessionError
+
+# 默认最多保留的会话数
+DEFAULT_MAX_SESSIONS = 100
+# 默认会话空闲超时（秒）
+DEFAULT_SESSION_TTL = 30 * 60
+# 默认所有会话合计的内存预算（字节）
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+
+class _Entry:
+    """池中的一个会话"""
+
+    __slots__ = ('session_id', 'simulator', 'lock', 'active', 'last_used', 'size')
+
+    def __init__(self, session_id, simulator, now):
+        self.session_id = session_id
+        self.simulator = simulator
+        self.lock = threading.Lock()
+        self.active = 0
+        self.last_used = now
+        self.size = 0
+
+
+class Lease:
+    """
+    对一个会话的租用，创建时即登记为使用中，不会被淘汰。
+    作为上下文管理器使用时在进入时获得该模拟器的锁，退出时释放并归还。
+    close()可以重复调用，用于流式响应在连接关闭时兜底归还。
+    """
+
+    def __init__(self, pool, entry):
+        self.pool = pool
+        self.entry = entry
+        self.locked = False
+        self.closed = False
+
+    @property
+    def session_id(self):
+        return self.entry.session_id
+
+    def __enter__(self):
+        self.entry.lock.acquire()
+        self.locked = True
+        return self.entry.simulator
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        size = None
+        if self.locked:
+            # 在释放锁之前估算大小，此时没有其他请求在修改该模拟器
+            try:
+                size = self.pool.sizeof(self.entry.simulator)
+            finally:
+                self.locked = False
+                self.entry.lock.release()
+        if not self.closed:
+            self.closed = True
+            self.pool._checkin(self.entry, size)
+
+
+class SimulatorPool:
+    """
+    按会话ID保存模拟器的池。
+
+    每个会话有自己的锁，同一会话的请求串行执行，不同会话可以并发。
+    空闲超过ttl秒的会话被淘汰；会话数或估算内存超过上限时
+    按最近最少使用的顺序淘汰，正在使用中的会话不会被淘汰。
+    sizeof(simulator)返回模拟器占用内存的估算值，在每次归还时（释放会话锁之前）更新；
+    没有获得过锁的租用不改变估算值。
+    """
+
+    def __init__(self, factory, max_sessions=DEFAULT_MAX_SESSIONS, ttl=DEFAULT_SESSION_TTL,
+                 memory_budget=DEFAULT_MEMORY_BUDGET, sizeof=None, clock=time.monotonic):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.sizeof = sizeof or (lambda simulator: 0)
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def create(self):
+        """创建新会话并返回其租用"""
+        simulator = self.factory()
+        with self.lock:
+            session_id = secrets.token_urlsafe(16)
+            entry = _Entry(session_id, simulator, self.clock())
+            entry.active = 1
+            self.entries[session_id] = entry
+            self._evict()
+        return Lease(self, entry)
+
+    def session(self, session_id):
+        """租用已有会话，不存在或已过期时抛出SessionError"""
+        with self.lock:
+            self._evict()
+            entry = self.entries.get(session_id) if session_id else None
+            if entry is None:
+                raise SessionError(f"Session not found or expired: {session_id}")
+            self.entries.move_to_end(session_id)
+            entry.active += 1
+        return Lease(self, entry)
+
+    def peek(self, session_id):
+        """不加锁地取得会话的模拟器，仅用于取消等线程安全的操作"""
+        with self.lock:
+            entry = self.entries.get(session_id) if session_id else None
+        if entry is None:
+            raise SessionError(f"Session not found or expired: {session_id}")
+        return entry.simulator
+
+    def remove(self, session_id):
+        """删除会话，返回是否存在"""
+        with self.lock:
+            return self.entries.pop(session_id, None) is not None
+
+    def _checkin(self, entry, size=None):
+        with self.lock:
+            entry.active -= 1
+            entry.last_used = self.clock()
+            if size is not None:
+                entry.size = size
+            self._evict()
+
+    def _evict(self):
+        """淘汰过期会话，再按LRU顺序淘汰直到满足数量与内存上限（需持有self.lock）"""
+        entries = self.entries
+        if self.ttl is not None:
+            deadline = self.clock() - self.ttl
+            for session_id, entry in list(entries.items()):
+                if entry.active == 0 and entry.last_used < deadline:
+                    del entries[session_id]
+                    self.evictions += 1
+
+        total = sum(entry.size for entry in entries.values())
+        for session_id, entry in list(entries.items()):
+            if len(entries) <= self.max_sessions and total <= self.memory_budget:
+                break
+            if entry.active == 0:
+                del entries[session_id]
+                total -= entry.size
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, session_id):
+        return session_id in self.entries
+
+    def get_stats(self):
+        """返回会话数、估算内存和淘汰次数"""
+        with self.lock:
+            return {
+                'sessions': len(self.entries),
+                'active': sum(1 for entry in self.entries.values() if entry.active),
+                'memory': sum(entry.size for entry in self.entries.values()),
+                'memory_budget': self.memory_budget,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,72 @@
+# src/stream.py
+
+import json
+import time
+
+from .trace import DeltaTrace
+
+# 每批最多包含的指令数
+DEFAULT_BATCH_STEPS = 1000
+# 距上一批超过该时间（秒）时立即推送
+DEFAULT_BATCH_INTERVAL = 0.1
+# 单次流式执行的默认指令上限
+DEFAULT_MAX_STEPS = 100000
+
+
+def iter_run_batches(cpu, max_steps=DEFAULT_MAX_STEPS, batch_steps=DEFAULT_BATCH_STEPS,
+                     batch_interval=DEFAULT_BATCH_INTERVAL, cancelled=None, step=None):
+    """
+    从当前状态开始逐条执行，分批产生可JSON序列化的消息:
+    - {'type': 'start', 'state': 初始状态}
+    - {'type': 'batch', 'first': 首条指令序号, 'deltas': [每步增量], 'state': 批末状态}
+    - {'type': 'end', 'reason': 'halt'/'error'/'limit'/'cancelled', 'steps': 指令数, 'state': 最终状态}
+    cancelled为可选的threading.Event，置位后在当前指令执行完时停止。
+    step为执行一步的函数，默认cpu.step（例如传入History.step以便之后后退）。
+    增量不在内存中累积，执行任意长的程序占用的内存都是常数。
+    """
+    if step is None:
+        step = cpu.step
+    trace = DeltaTrace(cpu, keep=False)
+    try:
+        yield {'type': 'start', 'state': trace.initial}
+
+        steps = 0
+        first = 0
+        pending = []
+        last_flush = time.monotonic()
+        reason = None
+        while reason is None:
+            if cpu.status != 'AOK':
+                reason = 'halt' if cpu.status == 'HLT' else 'error'
+            elif max_steps is not None and steps >= max_steps:
+                reason = 'limit'
+            elif cancelled is not None and cancelled.is_set():
+                reason = 'cancelled'
+            else:
+                if step():
+                    steps += 1
+                pending.append(trace.record())
+
+            if pending and (reason is not None or len(pending) >= batch_steps
+                            or time.monotonic() - last_flush >= batch_interval):
+                yield {'type': 'batch', 'first': first, 'deltas': pending,
+                       'state': cpu.get_state()}
+                first += len(pending)
+                pending = []
+                last_flush = time.monotonic()
+
+        yield {'type': 'end', 'reason': reason, 'steps': steps, 'state': cpu.get_state()}
+    finally:
+        trace.close()
+
+
+def to_ndjson(messages):
+    """把消息序列编码为换行分隔的JSON（NDJSON）"""
+    for message in messages:
+        yield json.dumps(message, separators=(',', ':')) + '\n'
+
+
+def to_sse(messages):
+    """把消息序列编码为Server-Sent Events，事件名取自消息的type"""
+    for message in messages:
+        yield f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
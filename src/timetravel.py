@@ -0,0 +1,148 @@
+# src/timetravel.py
+
+from .decoder import decode_instruction
+from .utils import Y86Error
+
+# 每隔多少步保存一个关键帧，跳转到任意一步最多重新执行这么多步
+DEFAULT_KEYFRAME_INTERVAL = 1000
+# 估算内存占用时每条撤销记录与每个关键帧的开销（字节）
+UNDO_RECORD_SIZE = 256
+KEYFRAME_SIZE = 2048
+
+# 会写内存的指令: rmmovq写regs[rB]+valC，call与pushq写regs[%rsp]-8
+_STORE = 0x4
+_PUSHES = (0x8, 0xA)
+_RSP = 4
+
+
+class History:
+    """
+    可逆执行历史（时间旅行调试）。
+
+    每执行一步保存一条撤销记录: 执行前的寄存器、条件码、PC、状态、当前指令，
+    以及本步将覆盖的8字节内存的旧内容（按解码记录预测写入地址），后退一步只需把这些值写回。
+    寄存器以元组整体保存，比逐个记录变化的寄存器更快，占用也不更多。
+    每隔interval步另存一个写时复制的CPU快照作为关键帧，
+    跳转到已执行过的任意一步时从最近的关键帧重新执行，代价为O(interval)而不是O(N)。
+    执行是确定的，后退之后再前进会重新得到同样的状态，因此后退不丢弃之后的记录。
+    步数从origin开始计，包括导致停机或出错的那一步。
+    """
+
+    def __init__(self, cpu, interval=DEFAULT_KEYFRAME_INTERVAL, origin=0):
+        if interval < 1:
+            raise Y86Error(f"Invalid keyframe interval: {interval}")
+        self.cpu = cpu
+        self.interval = interval
+        self.origin = origin
+        self.position = origin
+        # undo[i]为从第origin+i+1步回到第origin+i步的记录
+        self.undo = []
+        # keyframes[i]为第origin+i*interval步的快照
+        self.keyframes = [cpu.snapshot()]
+
+    def __len__(self):
+        """已记录的步数"""
+        return len(self.undo)
+
+    @property
+    def end(self):
+        """已记录的最后一步"""
+        return self.origin + len(self.undo)
+
+    def instruction_count(self):
+        """当前位置之前成功执行的指令数，停机或出错的那一步不计"""
+        steps = self.position
+        if steps > self.origin and self.cpu.status != 'AOK':
+            steps -= 1
+        return steps
+
+    def step(self):
+        """执行一步并保存撤销记录，CPU已停止时不执行并返回False"""
+        cpu = self.cpu
+        if cpu.status != 'AOK':
+            return False
+
+        regs = cpu.regs
+        inst = cpu.curr_inst
+        memory = None
+        try:
+            # 只查看解码缓存而不计数，命中与未命中由cpu.step()统计
+            decoded = cpu.decode_cache.records.get(cpu.pc)
+            if decoded is None:
+                decoded = decode_instruction(cpu.memory, cpu.pc)
+            icode, _, _, rB, valC, _ = decoded
+            if icode == _STORE:
+                addr = regs[rB] + valC
+            elif icode in _PUSHES:
+                addr = regs[_RSP] - 8
+            else:
+                addr = None
+            if addr is not None:
+                memory = (addr, cpu.memory.read_bytes(addr, 8))
+        except Exception:
+            # 取指失败或地址越界时本步不会写入内存
+            pass
+        record = (tuple(regs), cpu.cc, cpu.pc, cpu.status,
+                  (inst.icode, inst.ifun, inst.rA, inst.rB, inst.valC, inst.valP), memory)
+
+        success = cpu.step()
+
+        index = self.position - self.origin
+        if index < len(self.undo):
+            self.undo[index] = record
+        else:
+            self.undo.append(record)
+        self.position += 1
+
+        index += 1
+        if index % self.interval == 0 and index // self.interval == len(self.keyframes):
+            self.keyframes.append(cpu.snapshot())
+        return success
+
+    def step_back(self):
+        """撤销最近一步，已在历史起点时返回False"""
+        if self.position == self.origin:
+            return False
+        self.position -= 1
+        regs, cc, pc, status, instruction, memory = self.undo[self.position - self.origin]
+        cpu = self.cpu
+        cpu.regs[:] = regs
+        cpu.cc = cc
+        cpu.pc = pc
+        cpu.status = status
+        cpu.curr_inst.load(instruction)
+        if memory is not None:
+            cpu.memory.write_bytes(*memory)
+        return True
+
+    def goto(self, step):
+        """
+        跳转到第step步之后的状态，返回实际到达的步数。
+        已记录的范围内选择代价最小的方式: 从当前位置前进、逐步撤销或从关键帧重新执行；
+        超出已记录的范围时从最后一步继续执行，程序提前停止时停在最后一步。
+        """
+        if step < self.origin:
+            raise Y86Error(f"Step out of range: {step}")
+
+        known = min(step, self.end) - self.origin
+        base = known // self.interval * self.interval
+        offset = self.position - self.origin
+        if offset > known:
+            if offset - known > known - base:
+                self._restore_keyframe(base)
+        elif offset < base:
+            self._restore_keyframe(base)
+
+        while self.position > step:
+            self.step_back()
+        while self.position < step and self.cpu.status == 'AOK':
+            self.step()
+        return self.position
+
+    def _restore_keyframe(self, offset):
+        self.cpu.restore(self.keyframes[offset // self.interval])
+        self.position = self.origin + offset
+
+    def footprint(self):
+        """估算历史占用的内存（字节）"""
+        return len(self.undo) * UNDO_RECORD_SIZE + len(self.keyframes) * KEYFRAME_SIZE
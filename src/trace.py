@@ -0,0 +1,190 @@
+# src/trace.py
+
+from .decoder import REG_NAMES, FLAG_BITS
+from .utils import Y86Error
+
+
+class DeltaTrace:
+    """
+    增量执行轨迹。
+
+    只保存加载时的完整初始状态，之后每一步只记录发生变化的寄存器、
+    标志位、被写入的内存以及PC和状态，需要时再重建任意一步的完整状态。
+    keep为False时record()只返回增量而不保留，用于流式输出。
+    """
+
+    def __init__(self, cpu, keep=True):
+        self.cpu = cpu
+        self.initial = cpu.get_state()
+        self.deltas = []
+        self.keep = keep
+        self._regs = list(cpu.regs)
+        self._cc = cpu.cc
+        self._writes = []
+        cpu.memory.observers.append(self._on_write)
+
+    def _on_write(self, addr, size):
+        self._writes.append((addr, size))
+
+    def close(self):
+        """停止记录，解除对内存写入的监听"""
+        if self.cpu is not None:
+            observers = self.cpu.memory.observers
+            if self._on_write in observers:
+                observers.remove(self._on_write)
+            self.cpu = None
+
+    def record(self):
+        """记录刚执行完的一步相对上一步的变化"""
+        cpu = self.cpu
+        delta = {
+            'pc': cpu.pc,
+            'status': cpu.status,
+            'current_instruction': cpu.curr_inst.copy()
+        }
+
+        regs = cpu.regs
+        last = self._regs
+        if regs != last:
+            delta['registers'] = {
+                REG_NAMES[i]: value
+                for i, value in enumerate(regs) if last[i] != value
+            }
+            self._regs = list(regs)
+
+        cc = cpu.cc
+        if cc != self._cc:
+            changed = cc ^ self._cc
+            delta['flags'] = {
+                flag: (cc >> bit) & 1
+                for flag, bit in FLAG_BITS.items() if (changed >> bit) & 1
+            }
+            self._cc = cc
+
+        if self._writes:
+            # 记录写入后的内容: [地址, 长度, 小端序无符号值]
+            read_bytes = cpu.memory.read_bytes
+            delta['memory'] = [
+                [addr, size, int.from_bytes(read_bytes(addr, size), 'little')]
+                for addr, size in self._writes
+            ]
+            self._writes = []
+
+        if self.keep:
+            self.deltas.append(delta)
+        return delta
+
+    def __len__(self):
+        """轨迹中的状态个数（包括初始状态）"""
+        return len(self.deltas) + 1
+
+    def state_at(self, index):
+        """重建第index步之后的完整状态，0表示初始状态"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise Y86Error(f"Trace step out of range: {index}")
+        for state in self._replay(index):
+            pass
+        return state
+
+    def states(self):
+        """依次重建每一步之后的完整状态，从初始状态开始"""
+        return self._replay(len(self.deltas))
+
+    def _replay(self, count):
+        # 依次应用前count个增量，产生包括初始状态在内的count+1个状态
+        initial = self.initial
+        registers = dict(initial['registers'])
+        flags = dict(initial['flags'])
+        memory = dict(initial['memory'])
+        pc = initial['pc']
+        status = initial['status']
+        instruction = initial['current_instruction']
+        yield _full_state(registers, flags, memory, pc, status, instruction)
+
+        for delta in self.deltas[:count]:
+            if 'registers' in delta:
+                registers.update(delta['registers'])
+            if 'flags' in delta:
+                flags.update(delta['flags'])
+            for addr, size, value in delta.get('memory', ()):
+                for i in range(size):
+                    byte = (value >> (i * 8)) & 0xFF
+                    if byte:
+                        memory[addr + i] = byte
+                    else:
+                        memory.pop(addr + i, None)
+            pc = delta['pc']
+            status = delta['status']
+            instruction = delta['current_instruction']
+            yield _full_state(registers, flags, memory, pc, status, instruction)
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        return {
+            'initial': self.initial,
+            'deltas': self.deltas
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """由to_dict()的结果（可以经过JSON往返）重建轨迹，重建的轨迹不再记录"""
+        initial = dict(data['initial'])
+        # JSON对象的键总是字符串
+        initial['memory'] = {int(addr): value for addr, value in initial['memory'].items()}
+        return cls._detached(initial, list(data['deltas']))
+
+    @classmethod
+    def from_states(cls, states):
+        """由逐步的完整状态列表（'full'模式的轨迹）生成增量轨迹"""
+        deltas = [_state_delta(before, after) for before, after in zip(states, states[1:])]
+        return cls._detached(states[0], deltas)
+
+    @classmethod
+    def _detached(cls, initial, deltas):
+        trace = cls.__new__(cls)
+        trace.cpu = None
+        trace.initial = initial
+        trace.deltas = deltas
+        trace.keep = False
+        return trace
+
+
+def _full_state(registers, flags, memory, pc, status, instruction):
+    return {
+        'registers': dict(registers),
+        'flags': dict(flags),
+        'pc': pc,
+        'status': status,
+        'memory': dict(sorted(memory.items())),
+        'current_instruction': dict(instruction)
+    }
+
+
+def _state_delta(before, after):
+    """两个完整状态之间的增量，格式与DeltaTrace.record()相同"""
+    delta = {
+        'pc': after['pc'],
+        'status': after['status'],
+        'current_instruction': dict(after['current_instruction'])
+    }
+    for key in ('registers', 'flags'):
+        changed = {name: value for name, value in after[key].items()
+                   if before[key].get(name) != value}
+        if changed:
+            delta[key] = changed
+
+    # 改变的字节按连续地址合并为[地址, 长度, 小端序无符号值]
+    old, new = before['memory'], after['memory']
+    writes = []
+    for addr in sorted(addr for addr in old.keys() | new.keys()
+                       if old.get(addr, 0) != new.get(addr, 0)):
+        if writes and writes[-1][0] + writes[-1][1] == addr:
+            writes[-1][2] |= new.get(addr, 0) << (writes[-1][1] * 8)
+            writes[-1][1] += 1
+        else:
+            writes.append([addr, 1, new.get(addr, 0)])
+    if writes:
+        delta['memory'] = writes
+    return delta
@@ -0,0 +1,431 @@
+# src/tracefile.py
+
+import mmap
+import os
+import struct
+import time
+import zlib
+
+try:
+    import lzma
+except ImportError:  # 部分Python构建不带lzma模块
+    lzma = None
+
+from .checkpoint import Checkpoint, STATUS_CODES
+from .cpu import Y86CPU
+from .decoder import REG_NAMES, RNONE, FLAG_BITS
+from .utils import ParseError, Y86Error
+
+# 二进制轨迹文件:
+#   文件头(魔数, 版本, 压缩方式, 每块步数) + 初始状态检查点
+#   若干数据块，每块是最多block_steps条定长记录，按块压缩
+#   块索引: 每块的(偏移, 长度, 记录数)以及块开始时的寄存器、PC、条件码与状态
+#   文件尾(索引偏移, 总步数, 结束魔数)
+TRACE_MAGIC = b'Y86T'
+TRACE_END_MAGIC = b'Y86E'
+TRACE_VERSION = 1
+TRACE_SUFFIX = '.y86t'
+DEFAULT_BLOCK_STEPS = 4096
+DEFAULT_COMPRESSION = 'zlib'
+# 写文件的缓冲区大小（字节）
+WRITE_BUFFER_SIZE = 1 << 20
+# 有时间限制时每隔多少条指令检查一次耗时
+TIME_CHECK_INTERVAL = 10000
+
+COMPRESSIONS = ('none', 'zlib', 'lzma')
+
+_HEADER = struct.Struct('<4sHBxII')
+# 执行后的PC, valC, valP, 指令(icode<<4|ifun), 寄存器(rA<<4|rB), 状态, 条件码,
+# 标志位, 改变的寄存器, 寄存器新值, 写内存地址, 写入的8字节
+_RECORD = struct.Struct('<QQQBBBBBBQQQ')
+# 块在文件中的偏移、长度与记录数，之后是块开始时的寄存器、PC、负值位图、条件码与状态
+_BLOCK = struct.Struct(f'<QII{len(REG_NAMES)}QQHBB')
+_FOOTER = struct.Struct('<QQ4s')
+
+RECORD_SIZE = _RECORD.size
+MASK64 = (1 << 64) - 1
+
+# 记录的标志位
+WROTE_MEMORY = 1
+NEGATIVE_VALUE = 2
+NEGATIVE_PC = 4
+NEGATIVE_VALC = 8
+NEGATIVE_VALP = 16
+
+# popq在改写rA的同时把%rsp加8，记录中只保存rA
+_POPQ = 0xB
+_RSP = 4
+
+
+def _signed(value, negative):
+    return value - (1 << 64) if negative else value
+
+
+def _compressor(compression):
+    if compression == 'none':
+        return None
+    if compression == 'zlib':
+        return lambda data: zlib.compress(data, 6)
+    if compression == 'lzma':
+        if lzma is None:
+            raise Y86Error("lzma compression is not available in this Python build")
+        return lzma.compress
+    raise Y86Error(f"Unknown trace compression: {compression}")
+
+
+def _decompressor(compression):
+    if compression == 'none':
+        return None
+    if compression == 'zlib':
+        return zlib.decompress
+    if compression == 'lzma' and lzma is not None:
+        return lzma.decompress
+    raise ParseError(f"Unsupported trace compression: {compression}")
+
+
+class TraceWriter:
+    """
+    二进制轨迹写入器: 每执行一步调用一次record()，
+    记录攒满一块后压缩写出，close()时写出块索引与文件尾。
+    """
+
+    def __init__(self, path, cpu, compression=DEFAULT_COMPRESSION,
+                 block_steps=DEFAULT_BLOCK_STEPS):
+        if block_steps < 1:
+            raise Y86Error(f"Invalid block size: {block_steps}")
+        self._compress = _compressor(compression)
+        self.path = path
+        self.cpu = cpu
+        self.block_steps = block_steps
+        self.steps = 0
+        self.index = []
+        self._block = bytearray()
+        self._regs = list(cpu.regs)
+        self._keyframe = self._capture()
+        self._writes = []
+
+        initial = Checkpoint.capture(cpu).to_bytes()
+        self._file = open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION,
+                                      COMPRESSIONS.index(compression), block_steps,
+                                      len(initial)))
+        self._file.write(initial)
+        cpu.memory.observers.append(self._on_write)
+
+    def _on_write(self, addr, size):
+        self._writes.append(addr)
+
+    def _capture(self):
+        """块开始时的寄存器、PC、负值位图、条件码与状态"""
+        cpu = self.cpu
+        values = list(cpu.regs) + [cpu.pc]
+        negative = 0
+        for index, value in enumerate(values):
+            if value < 0:
+                negative |= 1 << index
+        return tuple(value & MASK64 for value in values) + (
+            negative, cpu.cc, STATUS_CODES.index(cpu.status))
+
+    def record(self):
+        """记录刚执行完的一步"""
+        cpu = self.cpu
+        regs = cpu.regs
+        inst = cpu.curr_inst
+        flags = 0
+
+        register = RNONE
+        value = 0
+        last = self._regs
+        if regs != last:
+            changed = [index for index in range(len(regs)) if regs[index] != last[index]]
+            # 同时改变两个寄存器的只有popq，%rsp的变化可以推出
+            register = changed[0] if changed[0] != _RSP or len(changed) == 1 else changed[1]
+            value = regs[register]
+            if value < 0:
+                flags |= NEGATIVE_VALUE
+            self._regs = list(regs)
+
+        addr = data = 0
+        if self._writes:
+            addr = self._writes[-1]
+            data = int.from_bytes(cpu.memory.read_bytes(addr, 8), 'little')
+            flags |= WROTE_MEMORY
+            self._writes = []
+
+        pc = cpu.pc
+        if pc < 0:
+            flags |= NEGATIVE_PC
+        valC = inst.valC
+        if valC < 0:
+            flags |= NEGATIVE_VALC
+        valP = inst.valP
+        if valP < 0:
+            flags |= NEGATIVE_VALP
+        self._block += _RECORD.pack(
+            pc & MASK64, valC & MASK64, valP & MASK64, (inst.icode << 4) | inst.ifun,
+            ((inst.rA & 0xF) << 4) | (inst.rB & 0xF), STATUS_CODES.index(cpu.status),
+            cpu.cc, flags, register, value & MASK64, addr & MASK64, data)
+        self.steps += 1
+        if len(self._block) >= self.block_steps * RECORD_SIZE:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        data = bytes(self._block)
+        if self._compress is not None:
+            data = self._compress(data)
+        self.index.append((self._file.tell(), len(data), len(self._block) // RECORD_SIZE)
+                          + self._keyframe)
+        self._file.write(data)
+        self._block = bytearray()
+        self._keyframe = self._capture()
+
+    def close(self):
+        """写出剩余记录、块索引与文件尾，并停止监听内存写入"""
+        if self._file is None:
+            return
+        observers = self.cpu.memory.observers
+        if self._on_write in observers:
+            observers.remove(self._on_write)
+        self._flush_block()
+        index_offset = self._file.tell()
+        for entry in self.index:
+            self._file.write(_BLOCK.pack(*entry))
+        self._file.write(_FOOTER.pack(index_offset, self.steps, TRACE_END_MAGIC))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def record_trace(cpu, path, max_steps=None, compression=DEFAULT_COMPRESSION,
+                 block_steps=DEFAULT_BLOCK_STEPS, time_limit=None):
+    """
+    逐条执行并把轨迹写入path，直到停机、出错、执行满max_steps条指令或超过time_limit秒。
+    与Y86CPU.run相同，返回(最终状态, 指令数)。
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    steps = 0
+    with TraceWriter(path, cpu, compression, block_steps) as writer:
+        while cpu.status == 'AOK' and (max_steps is None or steps < max_steps):
+            if cpu.step():
+                steps += 1
+            writer.record()
+            if deadline is not None and steps % TIME_CHECK_INTERVAL == 0 \
+                    and time.monotonic() >= deadline:
+                break
+    return cpu.get_state(), steps
+
+
+def trace_files(paths):
+    """展开文件与目录（递归）参数，返回排序后的.y86t文件列表"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names
+                             if name.endswith(TRACE_SUFFIX))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+class TraceReader:
+    """
+    通过mmap读取二进制轨迹，不把整个文件载入内存。
+    记录从0编号，第i条对应执行的第i+1条指令；读取任意一条只需解压它所在的一块，
+    寄存器状态可以从块索引中的关键帧开始重建，代价与块大小成正比。
+    """
+
+    def __init__(self, path):
+        # 最近解压的一块: (块号, 数据)
+        self._cached = (None, None)
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ParseError("Empty trace file") from None
+        try:
+            self._parse()
+        except BaseException:
+            self.close()
+            raise
+
+    def _parse(self):
+        view = self._map
+        if len(view) < _HEADER.size + _FOOTER.size:
+            raise ParseError("Truncated trace file")
+        magic, version, compression, block_steps, initial_size = _HEADER.unpack_from(view, 0)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ParseError("Unsupported trace format")
+        if compression >= len(COMPRESSIONS):
+            raise ParseError("Unsupported trace compression")
+        self.compression = COMPRESSIONS[compression]
+        self._decompress = _decompressor(self.compression)
+        self.block_steps = block_steps
+
+        index_offset, steps, end = _FOOTER.unpack_from(view, len(view) - _FOOTER.size)
+        if end != TRACE_END_MAGIC:
+            raise ParseError("Incomplete trace file")
+        index_size = len(view) - _FOOTER.size - index_offset
+        if index_offset > len(view) or index_size % _BLOCK.size:
+            raise ParseError("Corrupted trace index")
+        self.steps = steps
+        self.index = [_BLOCK.unpack_from(view, offset)
+                      for offset in range(index_offset, index_offset + index_size, _BLOCK.size)]
+        self._initial = bytes(view[_HEADER.size:_HEADER.size + initial_size])
+
+    def close(self):
+        data = self._cached[1]
+        if isinstance(data, memoryview):
+            # 未压缩的块直接引用mmap，关闭前必须释放
+            data.release()
+        self._cached = (None, None)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.steps
+
+    def initial_checkpoint(self):
+        """开始记录时的完整状态"""
+        return Checkpoint.from_bytes(self._initial)
+
+    def _block(self, number):
+        """返回第number块解压后的记录数据，最近使用的一块会被缓存"""
+        if self._cached[0] == number:
+            return self._cached[1]
+        offset, size = self.index[number][:2]
+        if self._decompress is None:
+            data = memoryview(self._map)[offset:offset + size]
+        else:
+            data = self._decompress(self._map[offset:offset + size])
+        self._cached = (number, data)
+        return data
+
+    def blocks(self):
+        """依次产生各块解压后的原始记录数据（每条RECORD_SIZE字节），供批量分析使用"""
+        for number in range(len(self.index)):
+            yield self._block(number)
+
+    def raw_records(self):
+        """
+        依次产生全部记录的原始字段元组(pc, valC, valP, code, regs, status, cc, flags,
+        register, value, address, data)，数值均按64位无符号数，不构造字典
+        """
+        for block in self.blocks():
+            yield from _RECORD.iter_unpack(block)
+
+    def _raw(self, step):
+        if not 0 <= step < self.steps:
+            raise Y86Error(f"Trace step out of range: {step}")
+        number, position = divmod(step, self.block_steps)
+        return _RECORD.unpack_from(self._block(number), position * RECORD_SIZE)
+
+    def record(self, step):
+        """第step条记录（从0计）"""
+        (pc, valC, valP, code, regs, status, cc, flags, register, value,
+         addr, data) = self._raw(step)
+        return {
+            'step': step,
+            'pc': _signed(pc, flags & NEGATIVE_PC),
+            'icode': code >> 4,
+            'ifun': code & 0xF,
+            'rA': regs >> 4,
+            'rB': regs & 0xF,
+            'valC': _signed(valC, flags & NEGATIVE_VALC),
+            'valP': _signed(valP, flags & NEGATIVE_VALP),
+            'status': STATUS_CODES[status],
+            'cc': cc,
+            'register': REG_NAMES[register] if register < len(REG_NAMES) else None,
+            'value': _signed(value, flags & NEGATIVE_VALUE),
+            'memory': [addr, data] if flags & WROTE_MEMORY else None
+        }
+
+    def records(self, start=0, stop=None):
+        """依次产生[start, stop)范围内的记录"""
+        stop = self.steps if stop is None else min(stop, self.steps)
+        for step in range(max(0, start), stop):
+            yield self.record(step)
+
+    def _replay(self, step, memory=None):
+        """从关键帧重建执行step步之后的寄存器等状态；memory不为None时同时应用内存写入"""
+        if not 0 <= step <= self.steps:
+            raise Y86Error(f"Trace step out of range: {step}")
+        number = min(step // self.block_steps, len(self.index) - 1)
+        if number < 0 or memory is not None:
+            checkpoint = self.initial_checkpoint()
+            regs = list(checkpoint.registers)
+            pc, cc, status = checkpoint.pc, checkpoint.cc, checkpoint.status
+            instruction = checkpoint.instruction
+            first = 0
+        else:
+            keyframe = self.index[number][3:]
+            count = len(REG_NAMES)
+            negative = keyframe[count + 1]
+            values = [_signed(value, (negative >> index) & 1)
+                      for index, value in enumerate(keyframe[:count + 1])]
+            regs, pc = values[:count], values[count]
+            cc, status = keyframe[count + 2], STATUS_CODES[keyframe[count + 3]]
+            instruction = None
+            first = number * self.block_steps
+
+        for index in range(first, step):
+            (record_pc, valC, valP, code, fields, status_code, cc, flags, register, value,
+             addr, data) = self._raw(index)
+            if register < len(regs):
+                regs[register] = _signed(value, flags & NEGATIVE_VALUE)
+                if code >> 4 == _POPQ and register != _RSP:
+                    regs[_RSP] += 8
+            if memory is not None and flags & WROTE_MEMORY:
+                memory.write_bytes(addr, data.to_bytes(8, 'little'))
+            pc = _signed(record_pc, flags & NEGATIVE_PC)
+            status = STATUS_CODES[status_code]
+            instruction = (code >> 4, code & 0xF, fields >> 4, fields & 0xF,
+                           _signed(valC, flags & NEGATIVE_VALC),
+                           _signed(valP, flags & NEGATIVE_VALP))
+        return regs, cc, pc, status, instruction
+
+    def registers_at(self, step):
+        """
+        执行step步之后的寄存器、条件码、PC与状态（0为初始状态），
+        从所在块的关键帧开始重建，不读取之前的块。
+        """
+        regs, cc, pc, status, _ = self._replay(step)
+        return {
+            'registers': dict(zip(REG_NAMES, regs)),
+            'flags': {flag: (cc >> bit) & 1 for flag, bit in FLAG_BITS.items()},
+            'pc': pc,
+            'status': status
+        }
+
+    def state_at(self, step):
+        """
+        执行step步之后的完整状态，格式与Y86CPU.get_state()相同。
+        内存需要应用之前的全部写入，代价与step成正比；只需要寄存器时使用registers_at。
+        """
+        cpu = Y86CPU()
+        self.initial_checkpoint().apply(cpu)
+        regs, cc, pc, status, instruction = self._replay(step, cpu.memory)
+        cpu.regs[:] = regs
+        cpu.cc = cc
+        cpu.pc = pc
+        cpu.status = status
+        cpu.curr_inst.load(instruction)
+        return cpu.get_state()
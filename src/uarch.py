@@ -0,0 +1,504 @@
+# src/uarch.py
+
+from abc import ABC, abstractmethod
+
+from .checkpoint import STATUS_CODES
+from .cpu import CONDITIONS
+from .decoder import NEEDS_REGIDS, NEEDS_VALC, RNONE
+from .pipeline import MISPREDICT_BUBBLES
+from .tracefile import TraceReader, trace_files
+from .utils import Y86Error
+
+# 分支预测表的默认项数
+DEFAULT_PREDICTOR_ENTRIES = 1024
+# L1缓存的默认配置: 4KiB，2路组相联，64字节缓存行
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_WAYS = 2
+DEFAULT_LINE_SIZE = 64
+# 缓存未命中的默认代价（周期）
+DEFAULT_MISS_PENALTY = 10
+
+MASK64 = (1 << 64) - 1
+_RSP = 4
+_HALT = 0x0
+_JUMP = 0x7
+_STORES = (0x4,)        # rmmovq
+_LOADS = (0x5,)         # mrmovq
+_PUSHES = (0x8, 0xA)    # call, pushq
+_POPS = (0x9, 0xB)      # ret, popq
+_POPQ = 0xB
+
+_INS = STATUS_CODES.index('INS')
+_HLT = STATUS_CODES.index('HLT')
+
+
+def instruction_size(icode):
+    """icode对应的指令长度（字节）"""
+    return 1 + (icode in NEEDS_REGIDS) + 8 * (icode in NEEDS_VALC)
+
+
+def data_access(icode, rB, valC, regs):
+    """
+    由执行前的寄存器推出一条指令的数据访问，返回(地址, 是否为写)，不访问内存时为None。
+    每次访问一个8字节的字。
+    """
+    if icode in _STORES or icode in _LOADS:
+        if rB >= RNONE:
+            return None
+        return (regs[rB] + valC) & MASK64, icode in _STORES
+    if icode in _PUSHES:
+        return (regs[_RSP] - 8) & MASK64, True
+    if icode in _POPS:
+        return regs[_RSP] & MASK64, False
+    return None
+
+
+def _is_power_of_two(value):
+    return value > 0 and value & (value - 1) == 0
+
+
+class Model:
+    """
+    微体系结构模型的基类。子类覆盖关心的事件，未覆盖的事件不会被调用:
+    - fetch(pc, size): 取一条size字节的指令；
+    - branch(pc, ifun, target, taken): 执行一条条件跳转，target为跳转目标；
+    - access(addr, size, write): 一次数据访问。
+    flush()清空模型的微体系结构状态（预测表、缓存行）但保留统计，reset()同时清空统计。
+    """
+    kind = None
+
+    def reset(self):
+        self.flush()
+
+    def flush(self):
+        pass
+
+    def penalty_cycles(self):
+        """模型估计的额外周期数"""
+        return 0
+
+    def describe(self):
+        return type(self).__name__
+
+    def get_stats(self):
+        return {'model': self.describe(), 'kind': self.kind,
+                'penalty_cycles': self.penalty_cycles()}
+
+
+class BranchPredictor(Model, ABC):
+    """条件跳转预测器的抽象基类，子类实现predict()，有预测状态时覆盖update()"""
+    kind = 'predictor'
+
+    def __init__(self, penalty=MISPREDICT_BUBBLES):
+        self.penalty = penalty
+        self.reset()
+
+    def reset(self):
+        self.branches = 0
+        self.mispredictions = 0
+        self.flush()
+
+    @abstractmethod
+    def predict(self, pc, target):
+        """预测pc处跳转到target的条件跳转是否跳转"""
+
+    def update(self, pc, taken):
+        """用实际结果更新预测状态"""
+
+    def branch(self, pc, ifun, target, taken):
+        self.branches += 1
+        if self.predict(pc, target) != taken:
+            self.mispredictions += 1
+        self.update(pc, taken)
+
+    def penalty_cycles(self):
+        return self.mispredictions * self.penalty
+
+    def get_stats(self):
+        stats = super().get_stats()
+        branches = self.branches
+        stats.update({
+            'branches': branches,
+            'mispredictions': self.mispredictions,
+            'accuracy': (branches - self.mispredictions) / branches if branches else 0.0
+        })
+        return stats
+
+
+class StaticPredictor(BranchPredictor):
+    """
+    静态预测: 'taken'总是预测跳转（即PIPE的策略），'not-taken'总是预测不跳转，
+    'btfn'预测向后的跳转（循环）跳转、向前的不跳转。
+    """
+    POLICIES = ('taken', 'not-taken', 'btfn')
+
+    def __init__(self, policy='taken', penalty=MISPREDICT_BUBBLES):
+        if policy not in self.POLICIES:
+            raise Y86Error(f"Unknown static prediction policy: {policy}")
+        self.policy = policy
+        super().__init__(penalty)
+
+    def predict(self, pc, target):
+        if self.policy == 'btfn':
+            return target <= pc
+        return self.policy == 'taken'
+
+    def describe(self):
+        return f'predictor={self.policy}'
+
+
+class OneBitPredictor(BranchPredictor):
+    """按PC索引的1位预测表，预测与上一次的实际结果相同"""
+
+    def __init__(self, entries=DEFAULT_PREDICTOR_ENTRIES, penalty=MISPREDICT_BUBBLES):
+        if not _is_power_of_two(entries):
+            raise Y86Error(f"Predictor entries must be a power of two: {entries}")
+        self.entries = entries
+        self._mask = entries - 1
+        super().__init__(penalty)
+
+    def flush(self):
+        # 初始预测为跳转
+        self.table = bytearray(b'\x01') * self.entries
+
+    def predict(self, pc, target):
+        return self.table[pc & self._mask] == 1
+
+    def update(self, pc, taken):
+        self.table[pc & self._mask] = taken
+
+    def describe(self):
+        return f'predictor=1bit:{self.entries}'
+
+
+class TwoBitPredictor(BranchPredictor):
+    """按PC索引的2位饱和计数器，计数>=2时预测跳转"""
+
+    def __init__(self, entries=DEFAULT_PREDICTOR_ENTRIES, penalty=MISPREDICT_BUBBLES):
+        if not _is_power_of_two(entries):
+            raise Y86Error(f"Predictor entries must be a power of two: {entries}")
+        self.entries = entries
+        self._mask = entries - 1
+        super().__init__(penalty)
+
+    def flush(self):
+        # 初始为弱跳转
+        self.table = bytearray(b'\x02') * self.entries
+
+    def predict(self, pc, target):
+        return self.table[pc & self._mask] >= 2
+
+    def update(self, pc, taken):
+        index = pc & self._mask
+        counter = self.table[index]
+        if taken:
+            if counter < 3:
+                self.table[index] = counter + 1
+        elif counter > 0:
+            self.table[index] = counter - 1
+
+    def describe(self):
+        return f'predictor=2bit:{self.entries}'
+
+
+class Cache(Model):
+    """
+    组相联缓存，LRU替换，写分配。
+    跨缓存行的访问按涉及的每一行各计一次访问。
+    """
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE, ways=DEFAULT_WAYS, line_size=DEFAULT_LINE_SIZE,
+                 miss_penalty=DEFAULT_MISS_PENALTY):
+        if not _is_power_of_two(line_size):
+            raise Y86Error(f"Cache line size must be a power of two: {line_size}")
+        if ways <= 0 or size <= 0 or size % (ways * line_size):
+            raise Y86Error(f"Cache size {size} is not a multiple of {ways} x {line_size}")
+        sets = size // (ways * line_size)
+        if not _is_power_of_two(sets):
+            raise Y86Error(f"Number of cache sets must be a power of two: {sets}")
+        self.size = size
+        self.ways = ways
+        self.line_size = line_size
+        self.sets = sets
+        self.miss_penalty = miss_penalty
+        self._line_bits = line_size.bit_length() - 1
+        self._set_mask = sets - 1
+        self.reset()
+
+    def reset(self):
+        self.accesses = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flush()
+
+    def flush(self):
+        # 每组按最近使用的顺序保存缓存行号，最近使用的在最后
+        self._lines = [[] for _ in range(self.sets)]
+
+    def lookup(self, addr, size):
+        """访问[addr, addr+size)，返回未命中的缓存行数"""
+        first = addr >> self._line_bits
+        last = (addr + size - 1) >> self._line_bits
+        misses = 0
+        for line in range(first, last + 1):
+            lines = self._lines[line & self._set_mask]
+            if line in lines:
+                if lines[-1] != line:
+                    lines.remove(line)
+                    lines.append(line)
+            else:
+                misses += 1
+                if len(lines) >= self.ways:
+                    del lines[0]
+                    self.evictions += 1
+                lines.append(line)
+        self.accesses += last - first + 1
+        self.misses += misses
+        return misses
+
+    def penalty_cycles(self):
+        return self.misses * self.miss_penalty
+
+    def describe(self):
+        return f'{self.kind}={self.size}:{self.ways}:{self.line_size}:{self.miss_penalty}'
+
+    def get_stats(self):
+        stats = super().get_stats()
+        accesses = self.accesses
+        stats.update({
+            'size': self.size,
+            'ways': self.ways,
+            'line_size': self.line_size,
+            'sets': self.sets,
+            'accesses': accesses,
+            'hits': accesses - self.misses,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (accesses - self.misses) / accesses if accesses else 0.0
+        })
+        return stats
+
+
+class InstructionCache(Cache):
+    """L1指令缓存，观察取指"""
+    kind = 'icache'
+
+    def fetch(self, pc, size):
+        self.lookup(pc, size)
+
+
+class DataCache(Cache):
+    """L1数据缓存，观察数据读写"""
+    kind = 'dcache'
+
+    def reset(self):
+        self.writes = 0
+        self.write_misses = 0
+        super().reset()
+
+    def access(self, addr, size, write):
+        misses = self.lookup(addr, size)
+        if write:
+            self.writes += 1
+            self.write_misses += misses
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats.update({'writes': self.writes, 'write_misses': self.write_misses})
+        return stats
+
+
+def _overrides(model, name):
+    return getattr(type(model), name, None) is not getattr(Model, name, None)
+
+
+class Microarchitecture:
+    """
+    一组微体系结构模型，通过Y86CPU.attach_uarch()挂到CPU上，
+    或者用replay_trace()输入记录好的轨迹。
+
+    每条取到的指令调用一次observe()，再分发给覆盖了对应事件的模型。
+    估计周期数按理想流水线每条指令1个周期，加上各模型的代价（分支预测错误、缓存未命中）。
+    没有挂载时Y86CPU的执行路径不变，只多一次属性判断。
+    """
+
+    def __init__(self, models=(), spec=None):
+        self.models = list(models)
+        self.spec = spec
+        self._fetch = [model.fetch for model in self.models if _overrides(model, 'fetch')]
+        self._branch = [model.branch for model in self.models if _overrides(model, 'branch')]
+        self._access = [model.access for model in self.models if _overrides(model, 'access')]
+        self.reset()
+
+    def reset(self):
+        """清空全部模型的状态与统计"""
+        self.instructions = 0
+        for model in self.models:
+            model.reset()
+
+    def flush(self):
+        """清空全部模型的状态（开始执行另一个程序），保留统计"""
+        for model in self.models:
+            model.flush()
+
+    @property
+    def needs_access(self):
+        """是否有模型观察数据访问，没有时不必计算访问地址"""
+        return bool(self._access)
+
+    def observe(self, pc, icode, ifun, valC, cc, access, completed):
+        """
+        输入一条取到的指令。cc为执行前的条件码（jXX不改变条件码），
+        access为data_access()的结果，completed为指令是否执行成功。
+        """
+        self.instructions += 1
+        if self._fetch:
+            size = instruction_size(icode)
+            for hook in self._fetch:
+                hook(pc, size)
+        if not completed:
+            return
+        if icode == _JUMP and ifun and self._branch:
+            taken = CONDITIONS[ifun][cc]
+            target = valC & MASK64
+            for hook in self._branch:
+                hook(pc, ifun, target, taken)
+        if access is not None:
+            addr, write = access
+            for hook in self._access:
+                hook(addr, 8, write)
+
+    def step(self, cpu):
+        """与Y86CPU.step语义一致的单步执行，同时把指令输入各模型"""
+        pc = cpu.pc
+        if not cpu.fetch():
+            return False
+        inst = cpu._inst
+        icode = inst.icode
+        access = data_access(icode, inst.rB, inst.valC, cpu.regs) if self._access else None
+        try:
+            cpu.execute()
+            cpu.pc = inst.valP
+            ok = cpu.status == 'AOK'
+        except Exception:
+            ok = False
+        self.observe(pc, icode, inst.ifun, inst.valC, cpu.cc, access, cpu.status != 'INS')
+        return ok
+
+    def run(self, cpu, max_steps=None):
+        """连续执行，返回(最终状态, 成功执行的指令数)，与Y86CPU.run一致"""
+        steps = 0
+        while cpu.status == 'AOK':
+            if max_steps is not None and steps >= max_steps:
+                break
+            if self.step(cpu):
+                steps += 1
+        return cpu.get_state(), steps
+
+    def cycles(self):
+        return self.instructions + sum(model.penalty_cycles() for model in self.models)
+
+    def get_stats(self):
+        instructions = self.instructions
+        cycles = self.cycles()
+        return {
+            'spec': self.spec,
+            'instructions': instructions,
+            'cycles': cycles,
+            'cpi': cycles / instructions if instructions else 0.0,
+            'models': [model.get_stats() for model in self.models]
+        }
+
+
+def _fields(text, name, count):
+    """解析'a:b:c'形式的整数参数，最多count个"""
+    parts = text.split(':') if text else []
+    if len(parts) > count:
+        raise Y86Error(f"Too many parameters for {name}: {text}")
+    try:
+        return [int(part, 0) for part in parts]
+    except ValueError:
+        raise Y86Error(f"Invalid parameters for {name}: {text}")
+
+
+def parse_machine(spec):
+    """
+    按配置字符串创建Microarchitecture，各部件以逗号分隔，例如
+    'predictor=2bit:1024,icache=4096:2:64,dcache=32768:8:64:20'。
+    - predictor=taken|not-taken|btfn|1bit[:项数]|2bit[:项数]
+    - icache/dcache=大小[:路数[:行大小[:未命中代价]]]
+    空字符串表示不带任何模型。
+    """
+    models = []
+    seen = set()
+    for part in filter(None, (part.strip() for part in spec.split(','))):
+        key, _, value = part.partition('=')
+        if key in seen:
+            raise Y86Error(f"Duplicate component in uarch spec: {key}")
+        seen.add(key)
+        if key == 'predictor':
+            name, _, params = value.partition(':')
+            if name in StaticPredictor.POLICIES:
+                _fields(params, name, 0)
+                models.append(StaticPredictor(name))
+            elif name in ('1bit', '2bit'):
+                cls = OneBitPredictor if name == '1bit' else TwoBitPredictor
+                models.append(cls(*_fields(params, name, 1)))
+            else:
+                raise Y86Error(f"Unknown branch predictor: {value}")
+        elif key in ('icache', 'dcache'):
+            cls = InstructionCache if key == 'icache' else DataCache
+            models.append(cls(*_fields(value, key, 4)))
+        else:
+            raise Y86Error(f"Unknown uarch component: {part}")
+    return Microarchitecture(models, spec)
+
+
+def replay_trace(path, machines):
+    """
+    把.y86t轨迹中的指令流依次输入machines中的每个Microarchitecture，
+    轨迹只读取一遍，返回记录数。
+    """
+    with TraceReader(path) as reader:
+        checkpoint = reader.initial_checkpoint()
+        regs = list(checkpoint.registers)
+        pc = checkpoint.pc
+        needs_access = any(machine.needs_access for machine in machines)
+        count = len(regs)
+        for (next_pc, valC, _, code, fields, status, cc, _, register, value, _,
+             _) in reader.raw_records():
+            icode = code >> 4
+            # 取指失败: 没有指令被取出，记录中的还是上一条指令
+            if status == _HLT and icode != _HALT:
+                pc = next_pc
+                continue
+            access = data_access(icode, fields & 0xF, valC, regs) if needs_access else None
+            for machine in machines:
+                machine.observe(pc, icode, code & 0xF, valC, cc, access, status != _INS)
+            if register < count:
+                regs[register] = value
+                if icode == _POPQ and register != _RSP:
+                    regs[_RSP] += 8
+            pc = next_pc
+        return reader.steps
+
+
+def sweep(paths, specs, progress=None):
+    """
+    在轨迹文件（或目录，递归查找.y86t）上一遍评估多个配置，
+    每条轨迹开始前清空模型状态，统计在各轨迹间累加。
+    返回(按specs顺序的Microarchitecture列表, 出错的文件列表[(路径, 错误)])。
+    """
+    machines = [parse_machine(spec) for spec in specs]
+    errors = []
+    for path in trace_files(paths):
+        for machine in machines:
+            machine.flush()
+        try:
+            steps = replay_trace(path, machines)
+        except (OSError, Y86Error) as e:
+            errors.append((path, str(e)))
+            continue
+        if progress is not None:
+            progress(path, steps)
+    return machines, errors
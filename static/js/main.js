@@ -1,6 +1,15 @@
 // 全局状态管理
 let currentState = null;
 let instructionHistory = [];
+// 服务端执行历史中的当前步
+let currentStep = 0;
+// 上传后服务端返回的会话ID，之后的请求都带上它
+let sessionId = null;
+
+// 带会话ID的请求头
+function sessionHeaders(headers = {}) {
+    return sessionId ? { ...headers, 'X-Session-ID': sessionId } : headers;
+}
 
 // DOM 元素缓存
 const elements = {
@@ -13,8 +22,15 @@ const elements = {
     instructionLog: document.getElementById('instructionLog'),
     statistics: document.getElementById('statistics'),
     stepBtn: document.getElementById('stepBtn'),
+    stepBackBtn: document.getElementById('stepBackBtn'),
+    gotoStep: document.getElementById('gotoStep'),
+    gotoBtn: document.getElementById('gotoBtn'),
     runBtn: document.getElementById('runBtn'),
+    breakpointInput: document.getElementById('breakpointInput'),
+    runUntilBtn: document.getElementById('runUntilBtn'),
     resetBtn: document.getElementById('resetBtn'),
+    profileToggle: document.getElementById('profileToggle'),
+    profile: document.getElementById('profile'),
     messageArea: document.getElementById('messageArea')
 };
 
@@ -90,13 +106,16 @@ elements.uploadForm.addEventListener('submit', async (e) => {
     e.preventDefault();
 
     const file = elements.fileInput.files[0];
-    if (!file || !file.name.endsWith('.yo')) {
-        showMessage('error', 'Please select a valid .yo file');
+    if (!file || !(file.name.endsWith('.yo') || file.name.endsWith('.ys'))) {
+        showMessage('error', 'Please select a valid .yo or .ys file');
         return;
     }
 
     const formData = new FormData();
     formData.append('file', file);
+    // 只需要初始状态，使用增量轨迹以减小响应体积
+    formData.append('trace', 'delta');
+    if (sessionId) formData.append('session_id', sessionId);
 
     try {
         elements.uploadStatus.textContent = 'Uploading...';
@@ -110,8 +129,12 @@ elements.uploadForm.addEventListener('submit', async (e) => {
 
         if (!response.ok) throw new Error(data.error || 'Upload failed');
 
+        sessionId = data.session_id;
         elements.currentFile.textContent = file.name;
+        elements.profileToggle.disabled = false;
+        refreshProfile();
         updateUI(data.states[0]);
+        updateStatistics(data.statistics);
         enableControls(true);
         showMessage('success', 'File uploaded successfully');
 
@@ -135,6 +158,9 @@ function updateStatistics(stats) {
     if (elements.cpuStatus) {
         elements.cpuStatus.textContent = stats.status;
     }
+    if (stats.step !== undefined && stats.step !== null) {
+        currentStep = stats.step;
+    }
 }
 
 // 更新UI的主函数
@@ -196,11 +222,68 @@ function addToLog(state) {
     elements.instructionLog.scrollTop = elements.instructionLog.scrollHeight;
 }
 
+// 热点剖析: 显示执行次数最多的PC、内存读写次数与调用边
+function updateProfile(data) {
+    if (!data || !data.enabled) {
+        elements.profile.innerHTML = '';
+        return;
+    }
+    const profile = data.profile;
+    const rows = data.hot_spots.map(row => `
+        <tr>
+            <td>${formatHex(row.pc, 4)}</td>
+            <td>${row.instruction}</td>
+            <td class="text-end">${row.count}</td>
+            <td class="text-end">${row.percent.toFixed(1)}%</td>
+        </tr>
+    `).join('');
+    const calls = profile.calls.map(call =>
+        `<div>${formatHex(call.caller, 4)} → ${formatHex(call.callee, 4)} ×${call.count}</div>`
+    ).join('');
+    elements.profile.innerHTML = `
+        <div class="small mb-1">
+            ${profile.instructions} instructions,
+            ${profile.memory.reads} reads, ${profile.memory.writes} writes
+        </div>
+        <table class="table table-sm mb-1">
+            <thead><tr><th>PC</th><th>Instr</th><th class="text-end">Count</th><th class="text-end">%</th></tr></thead>
+            <tbody>${rows}</tbody>
+        </table>
+        <div class="small">${calls}</div>
+    `;
+}
+
+async function refreshProfile() {
+    if (!elements.profileToggle.checked) return;
+    try {
+        const response = await fetch('/api/profile', { headers: sessionHeaders() });
+        if (response.ok) updateProfile(await response.json());
+    } catch (error) {
+        showMessage('error', error.message);
+    }
+}
+
+elements.profileToggle.addEventListener('change', async () => {
+    try {
+        const response = await fetch('/api/profile', {
+            method: 'POST',
+            headers: sessionHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify({ enabled: elements.profileToggle.checked })
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error);
+        updateProfile(data);
+    } catch (error) {
+        showMessage('error', error.message);
+    }
+});
+
 // 单步执行处理
 elements.stepBtn.addEventListener('click', async () => {
     try {
         const response = await fetch('/api/step', {
-            method: 'POST'
+            method: 'POST',
+            headers: sessionHeaders()
         });
 
         const data = await response.json();
@@ -209,10 +292,11 @@ elements.stepBtn.addEventListener('click', async () => {
             updateUI(data.state);
             updateStatistics(data.statistics);
             addToLog(data.state);
+            refreshProfile();
 
             if (data.state.status !== 'AOK') {
                 showMessage('info', `Program ${data.state.status}`);
-                enableControls(false);
+                haltControls();
             }
         } else {
             throw new Error(data.error);
@@ -222,39 +306,209 @@ elements.stepBtn.addEventListener('click', async () => {
     }
 });
 
-// 连续执行处理
-elements.runBtn.addEventListener('click', async () => {
+// 时间旅行: 服务端保存撤销记录与关键帧，客户端只需显示返回的状态
+async function travel(url, body) {
     try {
-        const response = await fetch('/api/run', {
-            method: 'POST'
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: sessionHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify(body || {})
         });
-
         const data = await response.json();
+        if (!response.ok) throw new Error(data.error);
 
-        if (response.ok) {
-            data.states.forEach(state => {
-                updateUI(state);
-                addToLog(state);
-            });
-            updateStatistics(data.statistics);
+        // 后退时删除被撤销的步骤的日志
+        const log = elements.instructionLog;
+        for (let undone = currentStep - data.statistics.step;
+             undone > 0 && log.lastElementChild; undone--) {
+            log.removeChild(log.lastElementChild);
+        }
+        updateUI(data.state);
+        updateStatistics(data.statistics);
+        elements.gotoStep.value = currentStep;
+        enableControls(true);
+        if (data.state.status !== 'AOK') haltControls();
+        return data;
+    } catch (error) {
+        showMessage('error', error.message);
+        return null;
+    }
+}
 
-            if (data.states[data.states.length - 1].status !== 'AOK') {
-                showMessage('info', `Program ${data.states[data.states.length - 1].status}`);
-                enableControls(false);
-            }
+elements.stepBackBtn.addEventListener('click', async () => {
+    const data = await travel('/api/step_back');
+    if (data && !data.success) showMessage('info', 'Already at the first step');
+});
+
+elements.gotoBtn.addEventListener('click', async () => {
+    const step = parseInt(elements.gotoStep.value, 10);
+    if (Number.isNaN(step) || step < 0) {
+        showMessage('error', 'Enter a step number');
+        return;
+    }
+    const data = await travel('/api/goto', { step });
+    if (data && data.step !== step) showMessage('info', `Program stopped at step ${data.step}`);
+});
+
+// 运行到断点: 断点在服务端检查，只返回停下时的状态
+elements.runUntilBtn.addEventListener('click', async () => {
+    try {
+        const pcs = elements.breakpointInput.value.split(/[\s,]+/)
+            .filter(text => text)
+            .map(text => Number(text));
+        if (pcs.some(Number.isNaN)) throw new Error('Invalid breakpoint address');
+
+        let response = await fetch('/api/breakpoints', {
+            method: 'POST',
+            headers: sessionHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify({ pcs })
+        });
+        let data = await response.json();
+        if (!response.ok) throw new Error(data.error);
+
+        response = await fetch('/api/run_until', {
+            method: 'POST',
+            headers: sessionHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify({})
+        });
+        data = await response.json();
+        if (!response.ok) throw new Error(data.error);
+
+        updateUI(data.state);
+        updateStatistics(data.statistics);
+        addToLog(data.state);
+        refreshProfile();
+        if (data.reason === 'breakpoint') {
+            showMessage('info', `Breakpoint at ${formatHex(data.hit.pc, 4)} after ${data.steps} steps`);
+        } else if (data.state.status !== 'AOK') {
+            showMessage('info', `Program ${data.state.status}`);
+            haltControls();
         } else {
-            throw new Error(data.error);
+            showMessage('info', `Stopped (${data.reason}) after ${data.steps} steps`);
         }
     } catch (error) {
         showMessage('error', error.message);
     }
 });
 
+// 连续执行处理: 流式读取执行结果，每收到一批就刷新界面
+// 日志最多保留的条目数，避免长时间运行时页面卡顿
+const MAX_LOG_ENTRIES = 500;
+let runController = null;
+
+// 把一步的增量合并到状态上
+function applyDelta(state, delta) {
+    return {
+        ...state,
+        pc: delta.pc,
+        status: delta.status,
+        current_instruction: delta.current_instruction,
+        registers: { ...state.registers, ...(delta.registers || {}) },
+        flags: { ...state.flags, ...(delta.flags || {}) }
+    };
+}
+
+function trimLog() {
+    const log = elements.instructionLog;
+    while (log.childElementCount > MAX_LOG_ENTRIES) {
+        log.removeChild(log.firstElementChild);
+    }
+}
+
+function handleRunMessage(message, context) {
+    if (message.type === 'start') {
+        context.state = message.state;
+        updateUI(message.state);
+    } else if (message.type === 'batch') {
+        // 只为批内最后MAX_LOG_ENTRIES步生成日志
+        const skip = Math.max(0, message.deltas.length - MAX_LOG_ENTRIES);
+        message.deltas.forEach((delta, index) => {
+            context.state = applyDelta(context.state, delta);
+            if (index >= skip) addToLog({ ...context.state, memory: null });
+        });
+        trimLog();
+        context.state = message.state;
+        updateUI(message.state);
+    } else if (message.type === 'end') {
+        context.state = message.state;
+        updateUI(message.state);
+        updateStatistics(message.statistics);
+        refreshProfile();
+        if (message.reason === 'limit') {
+            showMessage('info', `Stopped after ${message.steps} steps (step limit)`);
+        } else if (message.reason === 'cancelled') {
+            showMessage('info', `Cancelled after ${message.steps} steps`);
+        } else {
+            showMessage('info', `Program ${message.state.status}`);
+            haltControls();
+        }
+    }
+}
+
+function setRunning(running) {
+    elements.runBtn.textContent = running ? 'Stop' : 'Run';
+    elements.stepBtn.disabled = running;
+    elements.stepBackBtn.disabled = running;
+    elements.gotoBtn.disabled = running;
+    elements.runUntilBtn.disabled = running;
+    elements.resetBtn.disabled = running;
+}
+
+elements.runBtn.addEventListener('click', async () => {
+    if (runController) {
+        // 第二次点击取消执行
+        fetch('/api/run/cancel', { method: 'POST', headers: sessionHeaders() });
+        return;
+    }
+
+    runController = new AbortController();
+    setRunning(true);
+    const context = { state: currentState };
+    try {
+        const response = await fetch('/api/run/stream', {
+            method: 'POST',
+            headers: sessionHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify({}),
+            signal: runController.signal
+        });
+
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim())
+                .forEach(line => handleRunMessage(JSON.parse(line), context));
+        }
+    } catch (error) {
+        if (error.name !== 'AbortError') showMessage('error', error.message);
+    } finally {
+        runController = null;
+        setRunning(false);
+        if (context.state && context.state.status !== 'AOK') haltControls();
+    }
+});
+
+// 离开页面时断开连接，服务端随之停止执行
+window.addEventListener('beforeunload', () => {
+    if (runController) runController.abort();
+});
+
 // 重置处理
 elements.resetBtn.addEventListener('click', async () => {
     try {
         const response = await fetch('/api/reset', {
-            method: 'POST'
+            method: 'POST',
+            headers: sessionHeaders()
         });
 
         if (response.ok) {
@@ -276,7 +530,8 @@ elements.resetBtn.addEventListener('click', async () => {
             updateStatistics({
                 instruction_count: 0,
                 execution_time: 0,
-                status: 'AOK'
+                status: 'AOK',
+                step: 0
             });
 
             // 禁用控制按钮
@@ -313,4 +568,16 @@ function enableControls(enabled) {
     elements.stepBtn.disabled = !enabled;
     elements.runBtn.disabled = !enabled;
     elements.resetBtn.disabled = !enabled;
+    elements.stepBackBtn.disabled = !enabled;
+    elements.gotoStep.disabled = !enabled;
+    elements.gotoBtn.disabled = !enabled;
+    elements.breakpointInput.disabled = !enabled;
+    elements.runUntilBtn.disabled = !enabled;
+}
+
+// 程序停止后不能继续执行，但仍可后退或跳转到之前的步
+function haltControls() {
+    elements.stepBtn.disabled = true;
+    elements.runBtn.disabled = true;
+    elements.runUntilBtn.disabled = true;
 }
\ No newline at end of file
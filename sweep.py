@@ -0,0 +1,76 @@
+import json
+import sys
+
+from src.uarch import sweep
+from src.utils import Y86Error
+
+# 未指定--config时比较的配置: 各种分支预测器，以及不同大小与相联度的L1缓存
+DEFAULT_CONFIGS = (
+    'predictor=taken',
+    'predictor=not-taken',
+    'predictor=btfn',
+    'predictor=1bit',
+    'predictor=2bit',
+    'icache=1024:1:32,dcache=1024:1:32',
+    'icache=4096:2:64,dcache=4096:2:64',
+    'icache=32768:8:64,dcache=32768:8:64',
+)
+
+
+def format_table(machines):
+    """每个配置一行: 估计CPI、分支预测准确率与各缓存命中率"""
+    lines = [f"{'config':<48} {'instructions':>12} {'cycles':>12} {'cpi':>7}  models"]
+    for machine in machines:
+        stats = machine.get_stats()
+        models = []
+        for model in stats['models']:
+            if model['kind'] == 'predictor':
+                models.append(f"accuracy={model['accuracy']:.3f}")
+            else:
+                models.append(f"{model['kind']}_hit={model['hit_rate']:.3f}")
+        lines.append(f"{stats['spec'] or '(none)':<48} {stats['instructions']:>12} "
+                     f"{stats['cycles']:>12} {stats['cpi']:>7.3f}  {' '.join(models)}")
+    return '\n'.join(lines) + '\n'
+
+
+def parse_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='What-if sweep of branch predictor and cache models over .y86t traces')
+    parser.add_argument('paths', nargs='+',
+                        help='trace files or directories (searched recursively)')
+    parser.add_argument('--config', metavar='SPEC', action='append', default=None,
+                        help='model configuration to evaluate (repeatable), e.g. '
+                             '"predictor=2bit:512,dcache=8192:4:64:20"')
+    parser.add_argument('--out', metavar='FILE', default=None,
+                        help='write the statistics of every configuration as JSON to FILE')
+    parser.add_argument('--verbose', action='store_true',
+                        help='print each trace as it is replayed')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+
+    def progress(path, steps):
+        print(f"{path}: {steps} steps", file=sys.stderr)
+
+    try:
+        machines, errors = sweep(args.paths, args.config or DEFAULT_CONFIGS,
+                                 progress if args.verbose else None)
+    except Y86Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.write(format_table(machines))
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump([machine.get_stats() for machine in machines], file, indent=2)
+    for path, error in errors:
+        print(f"{path}: {error}", file=sys.stderr)
+    print(f"{len(errors)} error(s)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
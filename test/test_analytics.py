@@ -0,0 +1,162 @@
+# test/test_analytics.py
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from src.analytics import analyze_cohort, analyze_trace, load_records, np
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.tracefile import TraceReader, record_trace
+import analyze
+
+# 调用深度为3的递归，每层压栈一次并写一次内存
+PROGRAM = """
+    irmovq stack, %rsp
+    irmovq $3, %rcx
+    irmovq $1, %rsi
+    call f
+    halt
+f:
+    pushq %rcx
+    rmmovq %rcx, data(%rsi)
+    subq %rsi, %rcx
+    je out
+    call f
+out:
+    popq %rdx
+    mrmovq data(%rsi), %rax
+    ret
+    .pos 0x200
+data:
+    .quad 0
+    .quad 0
+    .pos 0x300
+stack:
+"""
+
+LOOP = """
+    irmovq $4, %rcx
+    irmovq $1, %rsi
+loop:
+    subq %rsi, %rcx
+    jne loop
+    halt
+"""
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def record(self, source, name, block_steps=4):
+        path = os.path.join(self.tmpdir.name, name)
+        cpu = Y86CPU()
+        cpu.load_program(assemble(source))
+        record_trace(cpu, path, None, 'zlib', block_steps)
+        return path
+
+    def profile(self, source):
+        cpu = Y86CPU()
+        cpu.load_program(assemble(source))
+        cpu.enable_profiling()
+        cpu.run()
+        return cpu.profiler.to_dict()
+
+    def test_load_records(self):
+        path = self.record(PROGRAM, 'rec.y86t')
+        with TraceReader(path) as reader:
+            records = load_records(reader)
+            self.assertEqual(len(records), len(reader))
+            for n in (0, 5, len(reader) - 1):
+                record = reader.record(n)
+                self.assertEqual(int(records['pc'][n]), record['pc'])
+                self.assertEqual(int(records['code'][n]) >> 4, record['icode'])
+
+    def test_matches_profiler(self):
+        """指令统计与内存读写次数与剖析器一致"""
+        for source in (PROGRAM, LOOP):
+            path = self.record(source, 'run.y86t')
+            result = analyze_trace(path)
+            profile = self.profile(source)
+            self.assertEqual(result['steps'], profile['instructions'])
+            self.assertEqual(result['status'], 'HLT')
+            mix = {(code >> 4, code & 0xF): int(count)
+                   for code, count in enumerate(result['mix']) if count}
+            self.assertEqual(mix, {(row['icode'], row['ifun']): row['count']
+                                   for row in profile['opcodes']})
+            self.assertEqual(sum(result['reads'].values()), profile['memory']['reads'])
+            self.assertEqual(sum(result['writes'].values()), profile['memory']['writes'])
+
+    def test_branches_and_memory(self):
+        result = analyze_trace(self.record(LOOP, 'loop.y86t'))
+        # jne执行4次，跳转3次
+        self.assertEqual(result['branches'][4].tolist(), [4, 3])
+        self.assertEqual(result['reads'], {})
+
+        result = analyze_trace(self.record(PROGRAM, 'rec.y86t'), granularity=16)
+        # 3次rmmovq与3次mrmovq访问data+8；3次call与3次pushq写栈
+        self.assertEqual(result['writes'][0x200], 3)
+        self.assertEqual(result['reads'][0x200], 3)
+        self.assertEqual(sum(result['writes'].values()), 9)
+        # je在最后一层跳转
+        self.assertEqual(result['branches'][3].tolist(), [3, 1])
+
+    def test_jump_to_next_instruction(self):
+        """跳转目标就是下一条指令时按条件码判断方向"""
+        source = """
+    irmovq $1, %rax
+    andq %rax, %rax
+    je next
+next:
+    jne last
+last:
+    halt
+"""
+        result = analyze_trace(self.record(source, 'next.y86t'))
+        self.assertEqual(result['branches'][3].tolist(), [1, 0])
+        self.assertEqual(result['branches'][4].tolist(), [1, 1])
+
+    def test_stack_depth(self):
+        result = analyze_trace(self.record(PROGRAM, 'rec.y86t'), points=10)
+        # 3层调用，每层返回地址与压栈各8字节
+        self.assertEqual(result['max_depth'], 48)
+        self.assertEqual(len(result['depth_curve']), 10)
+        self.assertEqual(int(result['depth_curve'].max()), 48)
+        self.assertEqual(int(result['depth_curve'][0]), 0)
+
+    def test_cohort(self):
+        os.makedirs(os.path.join(self.tmpdir.name, 'a', 'b'))
+        self.record(PROGRAM, os.path.join('a', 'rec.y86t'))
+        self.record(LOOP, os.path.join('a', 'b', 'loop.y86t'))
+        with open(os.path.join(self.tmpdir.name, 'a', 'bad.y86t'), 'wb') as file:
+            file.write(b'not a trace')
+
+        stats, errors = analyze_cohort([self.tmpdir.name], points=5)
+        self.assertEqual(len(errors), 1)
+        report = stats.to_dict()
+        self.assertEqual(report['traces'], 2)
+        self.assertEqual(report['status'], {'HLT': 2})
+        self.assertEqual(report['branches']['jne'],
+                         {'executed': 4, 'taken': 3, 'taken_rate': 0.75})
+        self.assertEqual(report['instruction_mix']['halt'], 2)
+        self.assertEqual(report['stack_depth']['max'], 48)
+        self.assertEqual(report['stack_depth']['mean_max'], 24)
+        self.assertEqual(len(report['stack_depth']['curve']), 5)
+
+    def test_cli(self):
+        self.record(LOOP, 'loop.y86t')
+        out = os.path.join(self.tmpdir.name, 'report.json')
+        with redirect_stderr(io.StringIO()), redirect_stdout(io.StringIO()):
+            self.assertEqual(analyze.main([self.tmpdir.name, '--out', out]), 0)
+            self.assertEqual(analyze.main([os.path.join(self.tmpdir.name, 'missing.y86t')]), 1)
+        self.assertTrue(os.path.getsize(out) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+# test/test_app.py
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from src.loader import ImageCache
+from src.results import ResultCache
+
+try:
+    import app
+except ImportError:
+    # Web界面需要Flask，未安装时跳过
+    app = None
+
+# 0x0: irmovq $5, %rax; 0xa: irmovq $3, %rbx; 0x14: addq %rax, %rbx; 0x16: halt
+PROGRAM = """
+    irmovq $5, %rax
+    irmovq $3, %rbx
+    addq %rax, %rbx
+    halt
+"""
+
+
+@unittest.skipIf(app is None, "Flask is not installed")
+class TestApp(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        # 上传、输出与缓存都放在临时目录中
+        self.saved = (app.app.config['UPLOAD_FOLDER'], app.OUTPUT_FOLDER,
+                      app.image_cache, app.result_cache)
+        app.app.config['UPLOAD_FOLDER'] = root
+        app.OUTPUT_FOLDER = root
+        app.image_cache = ImageCache(os.path.join(root, 'images'))
+        app.result_cache = ResultCache(os.path.join(root, 'results'))
+        self.client = app.app.test_client()
+
+    def tearDown(self):
+        (app.app.config['UPLOAD_FOLDER'], app.OUTPUT_FOLDER,
+         app.image_cache, app.result_cache) = self.saved
+        self.tmp.cleanup()
+
+    def upload(self, source=PROGRAM, trace='full', name='prog.ys'):
+        response = self.client.post('/api/upload', data={
+            'file': (io.BytesIO(source.encode()), name),
+            'trace': trace
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+
+    def post(self, url, session_id, **options):
+        return self.client.post(url, json=options, headers={'X-Session-ID': session_id})
+
+    def test_upload(self):
+        data = self.upload()
+        self.assertFalse(data.get('cached', False))
+        self.assertEqual(len(data['states']), 5)
+        self.assertEqual(data['states'][0]['pc'], 0)
+        self.assertEqual(data['states'][-1]['status'], 'HLT')
+        self.assertEqual(data['states'][-1]['registers']['rbx'], 8)
+        self.assertEqual(data['statistics']['instruction_count'], 3)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, data['output_file'])))
+
+    def test_upload_cache_hit(self):
+        # 写入内存后再把其中一个四字清零
+        source = PROGRAM.replace('halt', """rmmovq %rax, 0x100(%rcx)
+    rmmovq %rbx, 0x108(%rcx)
+    rmmovq %rcx, 0x100(%rcx)
+    halt""")
+        for trace in ('full', 'delta'):
+            first = self.upload(source, trace=trace)
+            second = self.upload(source, trace=trace)
+            self.assertTrue(second['cached'])
+            self.assertEqual(second['states'], first['states'])
+            self.assertEqual(second.get('trace'), first.get('trace'))
+            # 命中缓存时模拟器停在初始状态，仍然可以单步执行
+            self.assertEqual(second['statistics']['instruction_count'], 0)
+            response = self.post('/api/step', second['session_id'])
+            self.assertEqual(response.get_json()['state']['registers']['rax'], 5)
+        self.assertEqual(len(first['states']), 1)
+        self.assertEqual(first['states'][0]['pc'], 0)
+        self.assertEqual(len(first['trace']['deltas']), 7)
+
+        # 缓存条目只有最终状态与增量轨迹
+        entries = app.result_cache.entries()
+        self.assertEqual(len(entries), 1)
+        entry = app.result_cache.get(os.path.basename(entries[0][2])[:-len(ResultCache.SUFFIX)])
+        self.assertEqual(entry['state']['memory']['264'], 8)
+        self.assertNotIn('256', entry['state']['memory'])
+        self.assertEqual(set(entry['traces']), {'full', 'delta'})
+        for cached in entry['traces'].values():
+            self.assertEqual(set(cached), {'initial', 'deltas'})
+
+    def test_invalid_upload(self):
+        response = self.client.post('/api/upload', data={
+            'file': (io.BytesIO(b'halt\n'), 'prog.txt')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.get_json())
+
+    def test_step(self):
+        session_id = self.upload()['session_id']
+        self.assertEqual(self.post('/api/rewind', session_id).status_code, 200)
+
+        response = self.post('/api/step', session_id)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        data = response.get_json()
+        self.assertEqual(data['state']['pc'], 0xa)
+        self.assertEqual(data['state']['registers']['rax'], 5)
+        self.assertEqual(data['debug_info']['instruction']['icode'], 0x3)
+        self.assertEqual(data['statistics']['instruction_count'], 1)
+
+    def test_run_without_trace(self):
+        session_id = self.upload()['session_id']
+        for engine in ('interp', 'block', 'pipe'):
+            self.post('/api/rewind', session_id)
+            response = self.post('/api/run', session_id, trace=False, engine=engine)
+            self.assertEqual(response.status_code, 200, response.get_json())
+            data = response.get_json()
+            self.assertEqual(len(data['states']), 1)
+            self.assertEqual(data['states'][0]['status'], 'HLT')
+            self.assertEqual(data['states'][0]['registers']['rbx'], 8)
+            self.assertEqual(data['statistics']['instruction_count'], 3)
+            self.assertEqual('pipeline' in data, engine == 'pipe')
+
+        self.post('/api/rewind', session_id)
+        data = self.post('/api/run', session_id, trace=False, max_steps=2).get_json()
+        self.assertEqual(data['states'][0]['status'], 'AOK')
+        self.assertEqual(data['statistics']['instruction_count'], 2)
+
+    def test_run_stream(self):
+        session_id = self.upload()['session_id']
+        self.post('/api/rewind', session_id)
+        response = self.client.post('/api/run/stream?batch_steps=2',
+                                    headers={'X-Session-ID': session_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        messages = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([m['type'] for m in messages], ['start', 'batch', 'batch', 'end'])
+        end = messages[-1]
+        self.assertEqual((end['reason'], end['steps']), ('halt', 3))
+        self.assertEqual(end['state']['registers']['rbx'], 8)
+        self.assertEqual(end['statistics']['instruction_count'], 3)
+
+    def test_time_travel(self):
+        for trace in ('full', 'delta'):
+            data = self.upload(trace=trace)
+            session_id = data['session_id']
+            response = self.client.get('/api/state_at?step=2',
+                                       headers={'X-Session-ID': session_id})
+            self.assertEqual(response.get_json()['state']['registers']['rbx'], 3)
+            response = self.client.get('/api/state_at?step=99',
+                                       headers={'X-Session-ID': session_id})
+            self.assertEqual(response.status_code, 400)
+
+            # 停机指令本身也是一步，后退一步回到停机之前
+            data = self.post('/api/step_back', session_id).get_json()
+            self.assertTrue(data['success'])
+            self.assertEqual((data['state']['pc'], data['state']['status']), (0x16, 'AOK'))
+            self.assertEqual(data['statistics']['step'], 3)
+
+            data = self.post('/api/goto', session_id, step=1).get_json()
+            self.assertEqual(data['step'], 1)
+            registers = data['state']['registers']
+            self.assertEqual((registers['rax'], registers['rbx']), (5, 0))
+            self.assertEqual(data['statistics']['instruction_count'], 1)
+            response = self.client.get('/api/goto?step=3', headers={'X-Session-ID': session_id})
+            self.assertEqual(response.get_json()['state']['registers']['rbx'], 8)
+            self.assertEqual(self.post('/api/goto', session_id, step='x').status_code, 400)
+
+            data = self.post('/api/rewind', session_id).get_json()
+            self.assertEqual(data['state']['pc'], 0)
+            self.assertEqual(data['statistics']['instruction_count'], 0)
+            self.assertFalse(self.post('/api/step_back', session_id).get_json()['success'])
+
+    def test_run_until(self):
+        session_id = self.upload()['session_id']
+        self.post('/api/rewind', session_id)
+        response = self.post('/api/breakpoints', session_id, pcs=['0x14'])
+        self.assertEqual(response.get_json()['breakpoints']['pcs'], [0x14])
+
+        # 只有PC断点: 快速执行
+        data = self.post('/api/run_until', session_id).get_json()
+        self.assertEqual((data['reason'], data['hit'], data['steps']),
+                         ('breakpoint', {'pc': 0x14}, 2))
+        self.assertEqual(data['state']['pc'], 0x14)
+        self.assertEqual(data['statistics']['instruction_count'], 2)
+        data = self.post('/api/run_until', session_id).get_json()
+        self.assertEqual((data['reason'], data['steps']), ('halt', 1))
+        self.assertEqual(data['statistics']['instruction_count'], 3)
+
+        # 寄存器条件: 逐步执行，可以回退
+        self.post('/api/rewind', session_id)
+        data = self.post('/api/run_until', session_id, breakpoints={
+            'conditions': [{'register': 'rbx', 'op': '==', 'value': 3}]
+        }).get_json()
+        self.assertEqual((data['reason'], data['steps']), ('condition', 2))
+        data = self.post('/api/step_back', session_id).get_json()
+        self.assertEqual(data['state']['pc'], 0xa)
+
+        self.assertEqual(self.post('/api/run_until', session_id,
+                                   breakpoints={'pcs': ['here']}).status_code, 400)
+        response = self.client.delete('/api/breakpoints', headers={'X-Session-ID': session_id})
+        self.assertEqual(response.get_json()['breakpoints']['pcs'], [])
+
+    def test_unknown_session(self):
+        self.assertEqual(self.post('/api/step', 'missing').status_code, 404)
+        self.assertEqual(self.post('/api/run/stream', 'missing').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# test/test_assembler.py
+
+import unittest
+from src.assembler import assemble, assemble_listing
+from src.cpu import Y86CPU
+from src.loader import parse_yo
+from src.utils import AssemblyError
+
+SOURCE = """\
+# 数组求和
+    .pos 0
+    irmovq stack, %rsp
+    call main
+    halt
+
+    .align 8
+array:
+    .quad 0x000d
+    .quad 0x00c0
+    .quad -1
+
+main:
+    irmovq array, %rdi
+    irmovq $8, %r8
+    mrmovq (%rdi), %rax
+    mrmovq 8(%rdi), %rbx
+    addq %rbx, %rax
+    rmmovq %rax, 16(%rdi)
+    pushq %rax
+    popq %rcx
+    ret
+
+    .pos 0x100
+stack:
+"""
+
+
+class TestAssembler(unittest.TestCase):
+    def test_encoding(self):
+        image = assemble("irmovq $-1, %rax\nrrmovq %rax, %rbx\n"
+                         "rmmovq %rsp, 0x10(%rbp)\nmrmovq -8(%rsp), %r14\n"
+                         "cmovge %rcx, %rdx\nl: jne l\ncall l\npushq %rbp\npopq %rbp\n"
+                         "ret\nnop\nhalt\n")
+        self.assertEqual(image.segments, [(0, bytes.fromhex(
+            '30f0ffffffffffffffff' '2003'
+            '40451000000000000000' '50e4f8ffffffffffffff'
+            '2512' '742200000000000000' '802200000000000000'
+            'a05f' 'b05f' '90' '10' '00'))])
+
+    def test_directives(self):
+        image = assemble(SOURCE)
+        program = image.to_dict()
+        # .align 8之后array位于0x18，.quad按小端序存放
+        self.assertEqual(program[0x18], 0x0d)
+        self.assertEqual(bytes(program[0x28 + i] for i in range(8)), b'\xff' * 8)
+        # irmovq stack, %rsp引用后面定义的标号
+        self.assertEqual(program[2], 0x00)
+        self.assertEqual(program[3], 0x01)
+
+    def test_listing(self):
+        # 生成的.yo清单重新解析后与汇编结果一致
+        image, listing = assemble_listing(SOURCE)
+        self.assertEqual(parse_yo(listing), image)
+        self.assertIn('0x018:                      | array:', listing)
+
+    def test_run(self):
+        cpu = Y86CPU()
+        cpu.load_program(assemble(SOURCE))
+        state, _ = cpu.run()
+        self.assertEqual(state['status'], 'HLT')
+        self.assertEqual(state['registers']['rax'], 0xcd)
+        self.assertEqual(state['registers']['rcx'], 0xcd)
+        self.assertEqual(state['registers']['rsp'], 0x100)
+
+    def test_errors(self):
+        for source, message in [
+            ("jmp nowhere\n", "undefined label"),
+            ("movq %rax, %rbx\n", "unknown instruction"),
+            ("addq %rax\n", "expects 2"),
+            ("a:\na:\n", "duplicate label"),
+            ("nop\npushq %rxx\n", "Line 2"),
+        ]:
+            with self.assertRaisesRegex(AssemblyError, message):
+                assemble(source)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# test/test_bench.py
+
+import copy
+import os
+import tempfile
+import unittest
+from src.bench import run_benchmarks, compare, corpus_files, MEMORY_BACKENDS
+
+PROGRAM = """
+    irmovq $10, %rcx
+    irmovq $1, %rsi
+loop:
+    subq %rsi, %rcx
+    jne loop
+    halt
+"""
+
+
+class TestBench(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        with open(os.path.join(cls.tmpdir.name, 'loop.ys'), 'w') as file:
+            file.write(PROGRAM)
+        with open(os.path.join(cls.tmpdir.name, 'notes.txt'), 'w') as file:
+            file.write('not a program')
+        cls.results = run_benchmarks(corpus_files(cls.tmpdir.name),
+                                     engines=('interp', 'block'), repeat=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_rows(self):
+        rows = self.results['results']
+        self.assertEqual(len(rows), 2 * len(MEMORY_BACKENDS))
+        for row in rows:
+            self.assertEqual(row['program'], 'loop')
+            self.assertEqual(row['status'], 'HLT')
+            self.assertEqual(row['instructions'], 2 + 2 * 10)
+            self.assertGreater(row['ips'], 0)
+            self.assertGreater(row['peak_memory'], 0)
+            # 轨迹包括停机指令
+            self.assertEqual(row['trace_steps'], 2 + 2 * 10 + 1)
+            self.assertGreater(row['trace_bytes'], 0)
+
+    def test_compare(self):
+        self.assertEqual(compare(self.results, self.results), [])
+
+        slower = copy.deepcopy(self.results)
+        row = slower['results'][0]
+        row['ips'] /= 2
+        regressions = compare(self.results, slower, threshold=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(regressions[0]['metric'], 'ips')
+        self.assertAlmostEqual(regressions[0]['change'], -0.5)
+
+        # 变好不算退化，基线中没有的组合不比较
+        faster = copy.deepcopy(self.results)
+        faster['results'][0]['ips'] *= 2
+        faster['results'].append(dict(row, program='new'))
+        self.assertEqual(compare(self.results, faster), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
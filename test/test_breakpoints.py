@@ -0,0 +1,161 @@
+# test/test_breakpoints.py
+
+import random
+import unittest
+from src.assembler import assemble
+from src.breakpoints import Breakpoints, run_until
+from src.cpu import Y86CPU
+from src.fuzz import generate_program, program_source
+from src.timetravel import History
+from src.utils import Y86Error
+
+PROGRAM = """
+    irmovq data, %rbx
+    irmovq $3, %rcx
+    irmovq $1, %rsi
+loop:
+    addq %rsi, %rax
+    rmmovq %rax, 8(%rbx)
+    subq %rsi, %rcx
+    jne loop
+    irmovq $-2, %rdx
+    halt
+    .pos 0x100
+data:
+    .quad 0
+    .quad 0
+"""
+
+LOOP = 0x1e
+
+
+class TestBreakpoints(unittest.TestCase):
+    def setUp(self):
+        self.cpu = Y86CPU()
+        self.cpu.load_program(assemble(PROGRAM))
+        self.breakpoints = Breakpoints()
+
+    def test_breakpoint(self):
+        """在执行断点处的指令之前停下，从断点继续时运行到下一次命中"""
+        self.breakpoints.add_breakpoint(LOOP)
+        result = self.cpu.run_until(self.breakpoints)
+        self.assertEqual(result, {'reason': 'breakpoint', 'hit': {'pc': LOOP}, 'steps': 3})
+        self.assertEqual(self.cpu.pc, LOOP)
+        self.assertEqual(self.cpu.registers['rax'], 0)
+
+        result = self.cpu.run_until(self.breakpoints)
+        self.assertEqual((result['reason'], result['steps']), ('breakpoint', 4))
+        self.assertEqual(self.cpu.registers['rax'], 1)
+
+    def test_watchpoint(self):
+        self.breakpoints.add_watchpoint(0x108)
+        result = self.cpu.run_until(self.breakpoints)
+        self.assertEqual(result['reason'], 'watchpoint')
+        self.assertEqual(result['hit'], {'address': 0x108, 'size': 8})
+        self.assertEqual(result['steps'], 5)
+        self.assertEqual(self.cpu.memory.read_quad(0x108), 1)
+
+        # 区间不重叠的写入不会命中
+        other = Breakpoints()
+        other.add_watchpoint(0x100, 8)
+        self.assertEqual(self.cpu.run_until(other)['reason'], 'halt')
+        # 执行结束后解除监听
+        self.assertEqual(len(self.cpu.memory.observers), 1)
+
+    def test_watchpoint_zero_store(self):
+        """向从未写过的页写0同样命中监视点"""
+        cpu = Y86CPU()
+        cpu.load_program(assemble("""
+    irmovq $0, %rax
+    irmovq $0x2000, %rbx
+    rmmovq %rax, 0(%rbx)
+    halt
+"""))
+        self.breakpoints.add_watchpoint(0x2000)
+        result = cpu.run_until(self.breakpoints)
+        self.assertEqual(result['reason'], 'watchpoint')
+        self.assertEqual(result['hit'], {'address': 0x2000, 'size': 8})
+
+    def test_condition(self):
+        """寄存器条件按有符号数比较"""
+        self.breakpoints.add_condition('%rax', '>=', 2)
+        result = self.cpu.run_until(self.breakpoints)
+        self.assertEqual(result['reason'], 'condition')
+        self.assertEqual(result['hit'], {'register': 'rax', 'op': '>=', 'value': 2})
+        self.assertEqual(self.cpu.registers['rax'], 2)
+
+        negative = Breakpoints()
+        negative.add_condition('rdx', '<', 0)
+        self.assertEqual(self.cpu.run_until(negative)['reason'], 'condition')
+        self.assertEqual(self.cpu.curr_inst.icode, 3)
+
+    def test_limit_and_halt(self):
+        self.breakpoints.add_breakpoint(0x1000)
+        self.assertEqual(self.cpu.run_until(self.breakpoints, max_steps=4),
+                         {'reason': 'limit', 'hit': None, 'steps': 4})
+        result = self.cpu.run_until(self.breakpoints)
+        self.assertEqual((result['reason'], result['steps']), ('halt', 12))
+        self.assertEqual(self.cpu.status, 'HLT')
+
+    def test_history_step(self):
+        """使用History.step执行时，命中后可以回退"""
+        history = History(self.cpu)
+        self.breakpoints.add_breakpoint(LOOP)
+        run_until(self.cpu, self.breakpoints, step=history.step)
+        run_until(self.cpu, self.breakpoints, step=history.step)
+        self.assertEqual(history.position, 7)
+        history.goto(3)
+        self.assertEqual(self.cpu.pc, LOOP)
+        self.assertEqual(self.cpu.registers['rax'], 0)
+
+    def test_pc_fast_path(self):
+        """只有PC断点时由Y86CPU.run检查，结果与逐条执行相同"""
+        for seed in range(30):
+            rng = random.Random(seed)
+            image = assemble(program_source(generate_program(rng, 24)))
+            reference = Y86CPU()
+            reference.load_program(image)
+            pcs = [reference.pc]
+            while reference.step() and len(pcs) < 200:
+                pcs.append(reference.pc)
+            breakpoints = Breakpoints()
+            for pc in rng.sample(pcs, min(3, len(pcs))):
+                breakpoints.add_breakpoint(pc)
+
+            fast, slow = Y86CPU(), Y86CPU()
+            fast.load_program(image)
+            slow.load_program(image)
+            for _ in range(4):
+                expected = run_until(slow, breakpoints, 100, step=slow.step)
+                self.assertEqual(run_until(fast, breakpoints, 100), expected, seed)
+                self.assertEqual(fast.get_state(), slow.get_state(), seed)
+
+        with self.assertRaises(Y86Error):
+            self.cpu.run(engine='block', stop_pcs={LOOP})
+
+    def test_from_dict(self):
+        spec = {
+            'pcs': [LOOP, '0x2a'],
+            'watchpoints': [{'address': '0x100', 'size': 16}],
+            'conditions': [{'register': 'rax', 'op': '==', 'value': -1}]
+        }
+        breakpoints = Breakpoints.from_dict(spec)
+        self.assertEqual(breakpoints.to_dict(), {
+            'pcs': [LOOP, 0x2a],
+            'watchpoints': [{'address': 0x100, 'size': 16}],
+            'conditions': [{'register': 'rax', 'op': '==', 'value': -1}]
+        })
+        self.assertEqual(Breakpoints.from_dict(breakpoints.to_dict()).to_dict(),
+                         breakpoints.to_dict())
+        self.assertFalse(Breakpoints.from_dict({}))
+
+        for bad in ({'pcs': ['loop']}, {'watchpoints': [{'size': 8}]},
+                    {'watchpoints': [{'address': 0, 'size': 0}]},
+                    {'conditions': [{'register': 'rip', 'value': 0}]},
+                    {'conditions': [{'register': 'rax', 'op': '=~', 'value': 0}]}, []):
+            with self.assertRaises(Y86Error):
+                Breakpoints.from_dict(bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# test/test_checkpoint.py
+
+import os
+import tempfile
+import unittest
+from src.assembler import assemble
+from src.checkpoint import Checkpoint, write_checkpoint, read_checkpoint, is_checkpoint
+from src.cpu import Y86CPU
+from src.memory import Memory, SparseMemory
+from src.utils import ParseError
+
+# 先填充数组再求和，数组跨越多个内存页
+PROGRAM = assemble("""
+    irmovq $8, %r8
+    irmovq $1, %r9
+    irmovq $-5, %r10
+    irmovq array, %rsi
+    irmovq $1024, %rcx
+init:
+    rmmovq %rcx, (%rsi)
+    addq %r8, %rsi
+    subq %r9, %rcx
+    jne init
+    irmovq array, %rsi
+    irmovq $1024, %rcx
+sum:
+    mrmovq (%rsi), %rdx
+    addq %rdx, %rax
+    addq %r8, %rsi
+    subq %r9, %rcx
+    jne sum
+    halt
+    .pos 0x1ff8
+array:
+""")
+
+
+def run(memory_factory=Memory, max_steps=None):
+    cpu = Y86CPU(memory_factory)
+    cpu.load_program(PROGRAM)
+    state, steps = cpu.run(max_steps)
+    return cpu, state, steps
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_round_trip(self):
+        cpu, _, _ = run(max_steps=3000)
+        checkpoint = cpu.checkpoint()
+        restored = Checkpoint.from_bytes(checkpoint.to_bytes())
+        self.assertEqual(restored, checkpoint)
+
+        other = Y86CPU()
+        other.restore_checkpoint(restored)
+        self.assertEqual(other.get_state(), cpu.get_state())
+        # 负数寄存器按原值恢复
+        self.assertEqual(other.registers['r10'], -5)
+
+    def test_resume_matches_uninterrupted_run(self):
+        _, expected, total = run()
+        cpu, _, first = run(max_steps=2500)
+        resumed = Y86CPU()
+        resumed.restore_checkpoint(Checkpoint.from_bytes(cpu.checkpoint().to_bytes()))
+        for engine in ('interp', 'block'):
+            with self.subTest(engine=engine):
+                resumed.rewind()
+                state, rest = resumed.run(engine=engine)
+                self.assertEqual(state, expected)
+                self.assertEqual(first + rest, total)
+
+    def test_memory_segments(self):
+        """内存按连续段保存，两种内存实现可以互相恢复"""
+        cpu, _, _ = run(max_steps=3000)
+        segments = cpu.memory.segments()
+        self.assertLessEqual(len(segments), 3)
+        sparse = Y86CPU(SparseMemory)
+        sparse.restore_checkpoint(cpu.checkpoint())
+        self.assertEqual(sparse.get_state(), cpu.get_state())
+        self.assertEqual(sparse.checkpoint().to_bytes(),
+                         Checkpoint.capture(sparse).to_bytes())
+        for addr, data in sparse.memory.segments():
+            self.assertEqual(cpu.memory.read_bytes(addr, len(data)), data)
+
+    def test_compact(self):
+        cpu, _, _ = run()
+        blob = cpu.checkpoint().to_bytes()
+        # 8KiB的数组加代码，压缩后远小于逐字节保存
+        self.assertLess(len(blob), 8192)
+
+    def test_malformed(self):
+        blob = run(max_steps=10)[0].checkpoint().to_bytes()
+        for bad in (b'', b'Y86I' + blob[4:], blob[:-3], blob[:6] + b'garbage'):
+            with self.assertRaises(ParseError):
+                Checkpoint.from_bytes(bad)
+
+    def test_file(self):
+        cpu, _, _ = run(max_steps=100)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'state.ckpt')
+            self.assertTrue(is_checkpoint(path))
+            size = write_checkpoint(cpu, path)
+            self.assertEqual(os.path.getsize(path), size)
+            self.assertEqual(read_checkpoint(path), cpu.checkpoint())
+            self.assertEqual(os.listdir(tmpdir), ['state.ckpt'])
+
+    def test_cli_with_result_cache(self):
+        """开启结果缓存时，第二次运行同样写出检查点"""
+        import cpu as cli
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, 'a.ys')
+            with open(source, 'w') as file:
+                file.write("irmovq $3, %rax\nrmmovq %rax, 0x100(%rax)\nhalt\n")
+            cache = os.path.join(tmpdir, 'cache')
+            output = os.path.join(tmpdir, 'a.yml')
+            for _ in range(2):
+                path = os.path.join(tmpdir, 'a.ckpt')
+                if os.path.exists(path):
+                    os.remove(path)
+                summary = cli.run_file(source, output, result_cache=cache, checkpoint_file=path)
+                self.assertEqual(summary['status'], 'HLT')
+                self.assertNotIn('cached', summary)
+                self.assertEqual(summary['checkpoint'], path)
+                self.assertTrue(os.path.exists(path))
+                self.assertEqual(read_checkpoint(path).registers[0], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 # test/test_cpu.py
 
+import os
+import subprocess
+import sys
 import unittest
 from src.cpu import Y86CPU
 from src.utils import Y86Error
@@ -33,6 +36,42 @@ class TestY86CPU(unittest.TestCase):
         self.assertEqual(self.cpu.registers['rbx'], 0)
         self.assertEqual(self.cpu.flags['ZF'], 1)
 
+    def test_logic_and_overflow_flags(self):
+        """andq/xorq与溢出时的条件码"""
+        self.cpu.registers['rax'] = 0x0F
+        self.cpu.registers['rbx'] = 0xF0
+        self.cpu.curr_inst = {'icode': 0x6, 'ifun': 2, 'rA': 0, 'rB': 3, 'valP': 0}
+        self.cpu.execute()  # andq
+        self.assertEqual(self.cpu.registers['rbx'], 0)
+        self.assertEqual(self.cpu.flags, {'ZF': 1, 'SF': 0, 'OF': 0})
+
+        self.cpu.registers['rbx'] = -1
+        self.cpu.curr_inst['ifun'] = 3  # xorq
+        self.cpu.execute()
+        self.assertEqual(self.cpu.registers['rbx'], 0xFFFFFFFFFFFFFFF0)
+        self.assertEqual(self.cpu.flags, {'ZF': 0, 'SF': 1, 'OF': 0})
+
+        self.cpu.registers['rax'] = 1
+        self.cpu.registers['rbx'] = (1 << 63) - 1
+        self.cpu.curr_inst['ifun'] = 0  # addq: 正数相加溢出为负数
+        self.cpu.execute()
+        self.assertEqual(self.cpu.flags, {'ZF': 0, 'SF': 1, 'OF': 1})
+
+        self.cpu.registers['rbx'] = 1 << 63
+        self.cpu.curr_inst['ifun'] = 1  # subq: 最小负数减1溢出为正数
+        self.cpu.execute()
+        self.assertEqual(self.cpu.registers['rbx'], (1 << 63) - 1)
+        self.assertEqual(self.cpu.flags, {'ZF': 0, 'SF': 0, 'OF': 1})
+
+    def test_negative_immediate(self):
+        """irmovq的负立即数只做一次符号扩展"""
+        program = dict(enumerate(bytes.fromhex('30f0fbffffffffffffff' '00')))
+        for engine in ('interp', 'block'):
+            with self.subTest(engine=engine):
+                self.cpu.load_program(program)
+                state, _ = self.cpu.run(engine=engine)
+                self.assertEqual(state['registers']['rax'], -5)
+
     def test_memory_operations(self):
         """测试内存操作"""
         # 测试rmmovq
@@ -95,6 +134,110 @@ class TestY86CPU(unittest.TestCase):
         self.assertEqual(self.cpu.curr_inst['valP'], 0x100)
         self.assertEqual(self.cpu.registers['rsp'], 0x1000)
 
+    def test_decode_cache(self):
+        """测试已解码指令缓存的命中与失效"""
+        # 0x0: irmovq $16, %rax; 0xa: nop; 0xb: halt
+        program = {0x0: 0x30, 0x1: 0xF0, 0x2: 0x10, 0xA: 0x10, 0xB: 0x00}
+        self.cpu.load_program(program)
+        self.assertTrue(self.cpu.step())
+        self.assertTrue(self.cpu.step())
+        self.assertEqual(self.cpu.get_decode_stats()['misses'], 2)
+
+        # 再次执行同一条指令应命中缓存
+        self.cpu.pc = 0xA
+        self.assertTrue(self.cpu.step())
+        self.assertEqual(self.cpu.get_decode_stats()['hits'], 1)
+
+        # 改写已缓存的代码后应重新解码
+        self.cpu.memory.write_byte(0xA, 0xF0)
+        self.cpu.pc = 0xA
+        self.assertFalse(self.cpu.step())
+        self.assertEqual(self.cpu.status, 'INS')
+        self.assertEqual(self.cpu.get_decode_stats()['invalidations'], 1)
+
+    def test_rewind_and_fork(self):
+        """测试回到加载时刻及分叉执行"""
+        # 0x0: irmovq $16, %rax; 0xa: rmmovq %rax, 0x100(%rax); 0x14: halt
+        program = {0x0: 0x30, 0x1: 0xF0, 0x2: 0x10,
+                   0xA: 0x40, 0xB: 0x00, 0xC: 0x00, 0xD: 0x01}
+        self.cpu.load_program(program)
+        child = self.cpu.fork()
+        while self.cpu.step():
+            pass
+        self.assertEqual(self.cpu.memory.read_quad(0x110), 16)
+        self.assertEqual(child.memory.read_quad(0x110), 0)
+        self.assertEqual(child.pc, 0)
+
+        self.cpu.rewind()
+        self.assertEqual(self.cpu.pc, 0)
+        self.assertEqual(self.cpu.status, 'AOK')
+        self.assertEqual(self.cpu.registers['rax'], 0)
+        self.assertEqual(self.cpu.memory.read_quad(0x110), 0)
+        while self.cpu.step():
+            pass
+        self.assertEqual(self.cpu.memory.read_quad(0x110), 16)
+
+    def test_run_matches_step(self):
+        """run()与逐条step()的结果一致"""
+        # 0x0: irmovq $0x100, %rsp; 0xa: irmovq $5, %rax; 0x14: pushq %rax
+        # 0x16: call 0x20; 0x1f: halt
+        # 0x20: popq %rbx; 0x22: pushq %rbx; 0x24: ret
+        program = dict(enumerate(bytes.fromhex(
+            '30f40001000000000000'
+            '30f00500000000000000'
+            'a00f'
+            '802000000000000000'
+            '00'
+            'b03f'
+            'a03f'
+            '90'
+        )))
+        reference = Y86CPU()
+        reference.load_program(program)
+        count = 0
+        while reference.step():
+            count += 1
+
+        self.cpu.load_program(program)
+        state, steps = self.cpu.run()
+        self.assertEqual(state, reference.get_state())
+        self.assertEqual(steps, count)
+        self.assertEqual(state['status'], 'HLT')
+
+        # 限制步数时停在中途
+        self.cpu.rewind()
+        state, steps = self.cpu.run(max_steps=2)
+        self.assertEqual(steps, 2)
+        self.assertEqual(state['status'], 'AOK')
+        self.assertEqual(state['pc'], 0x14)
+
+    def test_register_file(self):
+        """寄存器数组与条件码的字典式视图"""
+        self.cpu.registers['rsp'] = 0x100
+        self.assertEqual(self.cpu.regs[4], 0x100)
+        self.cpu.flags['SF'] = 1
+        self.assertEqual(self.cpu.cc, 0b010)
+        self.assertEqual(self.cpu.flags.copy(), {'ZF': 0, 'SF': 1, 'OF': 0})
+
+        state = self.cpu.get_state()
+        self.assertEqual(state['registers']['rsp'], 0x100)
+        self.assertEqual(list(state['registers']), [
+            'rax', 'rcx', 'rdx', 'rbx', 'rsp', 'rbp', 'rsi', 'rdi',
+            'r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14'])
+        self.assertIsInstance(state['current_instruction'], dict)
+        with self.assertRaises(AttributeError):
+            self.cpu.extra = 1
+
+    def test_lazy_imports(self):
+        """导入src.cpu不加载汇编器、执行引擎、剖析器、检查点与断点"""
+        optional = ['src.assembler', 'src.profiler', 'src.jit', 'src.pipeline',
+                    'src.checkpoint', 'src.breakpoints']
+        code = f"import sys, src.cpu; print([m for m in {optional!r} if m in sys.modules])"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True,
+                                text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
 
 def run_tests():
     unittest.main()
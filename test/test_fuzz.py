@@ -0,0 +1,64 @@
+# test/test_fuzz.py
+
+import random
+import unittest
+from src.assembler import assemble
+from src.fuzz import (fuzz, fuzz_one, generate_program, program_source, check_source,
+                      shrink)
+
+
+class TestFuzz(unittest.TestCase):
+    def test_engines_agree(self):
+        """随机程序在所有引擎上与逐条执行的结果一致"""
+        failures = fuzz(100, seed=0)
+        self.assertEqual([failure.to_dict() for failure in failures], [])
+
+    def test_generated_programs_assemble(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            instructions = generate_program(rng, 16)
+            self.assertTrue(assemble(program_source(instructions)))
+
+    def test_deterministic(self):
+        self.assertEqual(generate_program(random.Random(7)), generate_program(random.Random(7)))
+
+    def test_check_source(self):
+        source = "irmovq $1, %rax\nhalt\n"
+        self.assertEqual(check_source(source), [])
+
+    def test_shrink(self):
+        """缩减后只保留导致失败所必需的指令，标号仍然有效"""
+        items = ['nop', 'irmovq $1, %rax', 'jmp L5', 'xorq %rax, %rbx', 'nop', 'addq %rax, %rax']
+
+        def failing(candidate):
+            return 'xorq %rax, %rbx' in candidate and 'jmp L5' in candidate
+
+        shrunk = shrink(items, failing)
+        self.assertEqual(shrunk, ['', '', 'jmp L5', 'xorq %rax, %rbx', '', ''])
+        source = program_source(shrunk)
+        self.assertIn('L5: \n', source)
+        self.assertTrue(assemble(source))
+
+    def test_detects_and_shrinks_mismatch(self):
+        """用一个故意出错的引擎验证能发现不一致并缩减"""
+        import src.jit as jit
+
+        original = jit.OPERATIONS[3]
+        jit.OPERATIONS[3] = "b | a"
+        try:
+            for seed in range(100):
+                failure = fuzz_one(seed, engines=('block',))
+                if failure is not None:
+                    break
+        finally:
+            jit.OPERATIONS[3] = original
+        self.assertIsNotNone(failure)
+        self.assertEqual(failure.mismatches[0]['engine'], 'block')
+        body = [line for line in failure.shrunk_source.splitlines()
+                if line.strip() and not line.strip().startswith(('.', 'data:', 'stack:'))]
+        self.assertLess(len(body), 8)
+        self.assertTrue(any('xorq' in line for line in body))
+
+
+if __name__ == '__main__':
+    unittest.main()
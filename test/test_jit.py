@@ -0,0 +1,103 @@
+# test/test_jit.py
+
+import unittest
+from src.cpu import Y86CPU
+
+
+def run_reference(program, max_steps=None):
+    """逐条step()执行，作为参照结果"""
+    cpu = Y86CPU()
+    cpu.load_program(program)
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        if not cpu.step():
+            break
+        steps += 1
+    return cpu.get_state(), steps
+
+
+def run_block(program, max_steps=None):
+    cpu = Y86CPU()
+    cpu.load_program(program)
+    return cpu.run(max_steps, engine='block')
+
+
+PROGRAMS = {
+    # 调用、压栈出栈与返回
+    'call_ret': bytes.fromhex(
+        '30f40001000000000000'  # irmovq $0x100, %rsp
+        '30f00500000000000000'  # irmovq $5, %rax
+        'a00f'                  # pushq %rax
+        '802000000000000000'    # call 0x20
+        '00'                    # halt
+        '6000'                  # 0x20: addq %rax, %rax
+        '2003'                  # rrmovq %rax, %rbx
+        '90'                    # ret
+    ),
+    # 条件码控制的循环: 所有OPq都设置条件码
+    'cc_loop': bytes.fromhex(
+        '30f10300000000000000'  # irmovq $3, %rcx
+        '30f60100000000000000'  # irmovq $1, %rsi
+        '6300'                  # xorq %rax, %rax
+        '6010'                  # 0x16: addq %rcx, %rax
+        '6161'                  # subq %rsi, %rcx
+        '741600000000000000'    # jne 0x16
+        '30f2ffffffffffffff7f'  # irmovq $0x7fffffffffffffff, %rdx
+        '6062'                  # addq %rsi, %rdx (溢出)
+        '6222'                  # andq %rdx, %rdx
+        '00'
+    ),
+    # 访问非法地址
+    'fault': bytes.fromhex(
+        '30f0ffffffffffffffff'  # irmovq $-1, %rax
+        '30f30100000000000000'  # irmovq $1, %rbx
+        '50300000000000000000'  # mrmovq 0(%rax), %rbx
+        '00'
+    ),
+    # 自修改代码: 把下一条nop改写为halt之外的非法指令
+    'self_modify': bytes.fromhex(
+        '30f0f000000000000000'  # irmovq $0xf0, %rax
+        '30f31e00000000000000'  # irmovq $0x1e, %rbx
+        '40030000000000000000'  # rmmovq %rax, 0(%rbx)
+        '10'                    # 0x1e: nop (被改写)
+        '00'
+    ),
+    # 非法指令
+    'invalid': bytes.fromhex('30f00100000000000000' 'c0'),
+}
+
+
+class TestBlockEngine(unittest.TestCase):
+    def test_matches_step(self):
+        """基本块引擎与逐条执行结果完全一致"""
+        for name, code in PROGRAMS.items():
+            with self.subTest(program=name):
+                program = dict(enumerate(code))
+                self.assertEqual(run_block(program), run_reference(program))
+
+    def test_max_steps(self):
+        """限制步数时与逐条执行停在同一位置"""
+        program = dict(enumerate(PROGRAMS['call_ret']))
+        for limit in range(0, 9):
+            with self.subTest(max_steps=limit):
+                self.assertEqual(run_block(program, limit),
+                                 run_reference(program, limit))
+
+    def test_blocks_cached_and_invalidated(self):
+        """基本块按入口地址缓存，改写代码后失效"""
+        cpu = Y86CPU()
+        cpu.load_program(dict(enumerate(PROGRAMS['call_ret'])))
+        cpu.run(engine='block')
+        stats = cpu.block_engine.get_stats()
+        self.assertGreater(stats['compiled'], 0)
+
+        cpu.rewind()
+        compiled = cpu.block_engine.compiled
+        cpu.memory.write_quad(0x20, 0x901010)  # 改写函数体为nop; nop; ret
+        state, _ = cpu.run(engine='block')
+        self.assertEqual(state['status'], 'HLT')
+        self.assertGreater(cpu.block_engine.compiled, compiled)
+
+
+if __name__ == '__main__':
+    unittest.main()
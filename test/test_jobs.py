@@ -0,0 +1,83 @@
+# test/test_jobs.py
+
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.jobs import JobManager, execute_job
+from src.utils import JobError
+
+PROGRAM = assemble("""
+    irmovq $0x100, %rsp
+    irmovq $3, %rcx
+    call double
+    halt
+double:
+    addq %rcx, %rcx
+    pushq %rcx
+    popq %rax
+    ret
+""")
+
+LOOP = assemble("l: irmovq $1, %rax\naddq %rax, %rbx\njmp l\n")
+
+
+class TestJobs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.manager = JobManager(max_workers=1, cpu_time=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.manager.shutdown()
+
+    def test_execute_job_matches_run(self):
+        result = execute_job('local', PROGRAM.to_bytes(), None, 'interp', None)
+        cpu = Y86CPU()
+        cpu.load_program(PROGRAM)
+        state, steps = cpu.run()
+        self.assertEqual(result['state'], state)
+        self.assertEqual((result['reason'], result['steps']), ('halt', steps))
+
+    def test_submit_and_cache(self):
+        job = self.manager.submit(PROGRAM, max_steps=1000)
+        self.manager.wait(job.job_id, 30)
+        self.assertEqual(job.status, 'done')
+        self.assertFalse(job.cached)
+        self.assertEqual(job.result['status'], 'HLT')
+
+        again = self.manager.submit(PROGRAM, max_steps=1000)
+        self.assertTrue(again.done.is_set())
+        self.assertTrue(again.cached)
+        self.assertEqual(again.result, job.result)
+
+    def test_step_limit(self):
+        job = self.manager.wait(self.manager.submit(LOOP, max_steps=100).job_id, 30)
+        self.assertEqual((job.status, job.result['reason'], job.steps), ('done', 'limit', 100))
+        self.assertNotIn('checkpoint', job.result)
+        self.assertTrue(job.to_dict()['resumable'])
+
+    def test_resume_from_checkpoint(self):
+        """未执行完的作业返回检查点，提交检查点从中断处继续执行"""
+        first = execute_job('local', PROGRAM.to_bytes(), 3, 'interp', None)
+        self.assertEqual(first['reason'], 'limit')
+        second = execute_job('local', first['checkpoint'], None, 'interp', None)
+        self.assertEqual(second['reason'], 'halt')
+        self.assertNotIn('checkpoint', second)
+
+        complete = execute_job('local', PROGRAM.to_bytes(), None, 'interp', None)
+        self.assertEqual(second['state'], complete['state'])
+        self.assertEqual(first['steps'] + second['steps'], complete['steps'])
+
+    def test_cpu_time_limit(self):
+        job = self.manager.wait(self.manager.submit(LOOP, max_steps=None).job_id, 30)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.result['reason'], 'cpu_time')
+        self.assertGreater(job.steps, 0)
+
+    def test_unknown_job(self):
+        with self.assertRaises(JobError):
+            self.manager.get('missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
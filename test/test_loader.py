@@ -0,0 +1,76 @@
+# test/test_loader.py
+
+import io
+import os
+import tempfile
+import unittest
+from src.cpu import Y86CPU
+from src.loader import ProgramImage, ImageCache, parse_yo
+from src.utils import ParseError, parse_yo_file
+
+YO_SOURCE = """\
+                            | # 注释行
+0x000:                      | .pos 0
+0x000: 30f40001000000000000 |   irmovq $0x100, %rsp
+0x00a: 10                   |   nop
+0x00b: 00                   |   halt
+0x020:                      | .align 8
+0x020: 0d000d000d000000     | data: .quad 0x000d000d000d
+"""
+
+
+class TestLoader(unittest.TestCase):
+    def test_segments(self):
+        image = parse_yo(io.StringIO(YO_SOURCE))
+        self.assertEqual(image.segments, [
+            (0x0, bytes.fromhex('30f40001000000000000' '10' '00')),
+            (0x20, bytes.fromhex('0d000d000d000000'))
+        ])
+        self.assertEqual(image.entry, 0)
+        self.assertEqual(image.to_dict(), parse_yo_file(YO_SOURCE))
+
+    def test_parse_error(self):
+        with self.assertRaisesRegex(ParseError, 'line 2'):
+            parse_yo("0x000: 10\n0x001: zz\n")
+        # 旧接口出错时返回空字典
+        self.assertEqual(parse_yo_file("0x001: zz\n"), {})
+
+    def test_odd_length_hex(self):
+        """与原先的解析一致，忽略末尾多出的半个字节"""
+        source = "0x000: 30f4000100000000000 | irmovq\n0x00a: 1\n0x00b: 00\n"
+        self.assertEqual(parse_yo(source).segments,
+                         [(0x0, bytes.fromhex('30f400010000000000')), (0xb, b'\x00')])
+        self.assertEqual(parse_yo(source).to_dict(), parse_yo_file(source))
+
+    def test_binary_round_trip(self):
+        image = parse_yo(YO_SOURCE)
+        self.assertEqual(ProgramImage.from_bytes(image.to_bytes()), image)
+        with self.assertRaises(ParseError):
+            ProgramImage.from_bytes(image.to_bytes()[:-1])
+
+    def test_image_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'prog.yo')
+            with open(path, 'w') as file:
+                file.write(YO_SOURCE)
+
+            cache = ImageCache(os.path.join(directory, 'images'))
+            first = cache.load_file(path)
+            second = cache.load_file(path)
+            self.assertEqual(first, second)
+            self.assertEqual(cache.load_text(YO_SOURCE), first)
+            self.assertEqual(cache.get_stats(), {'hits': 2, 'misses': 1})
+
+    def test_load_image(self):
+        # 按段加载与逐字节加载的结果一致
+        image = parse_yo(YO_SOURCE)
+        cpu = Y86CPU()
+        cpu.load_program(image)
+        reference = Y86CPU()
+        reference.load_program(image.to_dict())
+        self.assertEqual(cpu.get_state(), reference.get_state())
+        self.assertEqual(cpu.run()[0], reference.run()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# test/test_memory.py
+
+import unittest
+from src.memory import Memory, SparseMemory, PAGE_SIZE
+from src.utils import MemoryError
+
+
+class MemoryBackendTests:
+    """两种内存实现共用的测试"""
+    memory_class = None
+
+    def setUp(self):
+        self.memory = self.memory_class()
+
+    def test_quad_roundtrip(self):
+        """测试八字节读写及小端序"""
+        self.memory.write_quad(0x100, 0x1122334455667788)
+        self.assertEqual(self.memory.read_quad(0x100), 0x1122334455667788)
+        self.assertEqual(self.memory.read_byte(0x100), 0x88)
+        self.assertEqual(self.memory.read_byte(0x107), 0x11)
+
+        # 负数按64位补码存储
+        self.memory.write_quad(0x200, -1)
+        self.assertEqual(self.memory.read_quad(0x200), (1 << 64) - 1)
+
+    def test_cross_page_quad(self):
+        """测试跨页的八字节访问"""
+        addr = PAGE_SIZE - 3
+        self.memory.write_quad(addr, 0x0102030405060708)
+        self.assertEqual(self.memory.read_quad(addr), 0x0102030405060708)
+
+    def test_zero_write_clears(self):
+        """写入0应覆盖原有的非零值"""
+        self.memory.write_quad(0x10, 0xFFFF)
+        self.memory.write_quad(0x10, 0)
+        self.assertEqual(self.memory.read_quad(0x10), 0)
+        self.assertEqual(self.memory.get_nonzero_memory(), {})
+
+    def test_nonzero_memory_format(self):
+        """get_nonzero_memory返回按地址排序的字节字典"""
+        self.memory.write_bytes(0x2000, b'\x01\x00\x02')
+        self.memory.write_byte(0x10, 0x30)
+        self.assertEqual(self.memory.get_nonzero_memory(),
+                         {0x10: 0x30, 0x2000: 0x01, 0x2002: 0x02})
+
+    def test_invalid_address(self):
+        """测试越界访问"""
+        with self.assertRaises(MemoryError):
+            self.memory.read_byte(-1)
+        with self.assertRaises(MemoryError):
+            self.memory.write_quad((1 << 64) - 4, 1)
+
+    def test_observers(self):
+        """写入时通知观察者"""
+        writes = []
+        self.memory.observers.append(lambda addr, size: writes.append((addr, size)))
+        self.memory.write_byte(0x8, 1)
+        self.memory.write_quad(0x10, 2)
+        self.assertEqual(writes, [(0x8, 1), (0x10, 8)])
+        # 向未分配的页写0不分配页，但同样通知
+        self.memory.write_byte(0x20000, 0)
+        self.memory.write_quad(0x30000, 0)
+        self.assertEqual(writes[2:], [(0x20000, 1), (0x30000, 8)])
+
+    def test_snapshot_restore(self):
+        """快照恢复后内容回到快照时刻，快照可重复使用"""
+        self.memory.write_quad(0x100, 1)
+        snap = self.memory.snapshot()
+        self.memory.write_quad(0x100, 2)
+        self.memory.write_quad(0x9000, 3)
+        self.memory.restore(snap)
+        self.assertEqual(self.memory.read_quad(0x100), 1)
+        self.assertEqual(self.memory.read_quad(0x9000), 0)
+
+        self.memory.write_quad(0x100, 4)
+        self.memory.restore(snap)
+        self.assertEqual(self.memory.read_quad(0x100), 1)
+
+    def test_fork(self):
+        """分叉出的内存互不影响"""
+        self.memory.write_quad(0x100, 1)
+        child = self.memory.fork()
+        child.write_quad(0x100, 2)
+        self.memory.write_quad(0x108, 3)
+        self.assertEqual(self.memory.read_quad(0x100), 1)
+        self.assertEqual(child.read_quad(0x100), 2)
+        self.assertEqual(child.read_quad(0x108), 0)
+
+
+class TestMemory(MemoryBackendTests, unittest.TestCase):
+    memory_class = Memory
+
+    def test_sparse_allocation(self):
+        """只为非零数据分配页"""
+        self.memory.write_quad(0x5000, 0)
+        self.assertEqual(len(self.memory.pages), 0)
+        self.memory.write_quad(1 << 40, 7)
+        self.assertEqual(len(self.memory.pages), 1)
+
+    def test_copy_on_write(self):
+        """快照与内存共享未修改的页"""
+        self.memory.write_quad(0x0, 1)
+        self.memory.write_quad(0x1000, 2)
+        snap = self.memory.snapshot()
+        self.memory.write_quad(0x0, 5)
+        self.assertIsNot(self.memory.pages[0], snap.data[0])
+        self.assertIs(self.memory.pages[1], snap.data[1])
+
+
+class TestSparseMemory(MemoryBackendTests, unittest.TestCase):
+    memory_class = SparseMemory
+
+
+if __name__ == '__main__':
+    unittest.main()
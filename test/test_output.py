@@ -0,0 +1,28 @@
+# test/test_output.py
+
+import unittest
+from src.output import format_memory_dump, dump_yaml_output
+
+
+class TestOutput(unittest.TestCase):
+    def test_format_memory_dump(self):
+        # 小端序按8字节对齐合并，最高位为1时按有符号数输出
+        memory = {8: 0x01, 9: 0x02, 16 + 7: 0xFF}
+        self.assertEqual(format_memory_dump(memory), {8: 0x0201, 16: -(1 << 56)})
+
+    def test_dump_yaml_output(self):
+        state = {
+            'pc': 41,
+            'registers': {'rax': -1},
+            'flags': {'ZF': 1},
+            'memory': {0: 0x10},
+            'status': 'HLT'
+        }
+        text = dump_yaml_output(state)
+        self.assertTrue(text.startswith('- PC: 41\n  REG:\n    rax: -1\n    rcx: 0\n'))
+        self.assertIn('  CC:\n    ZF: 1\n    SF: 0\n    OF: 0\n', text)
+        self.assertIn('  MEM:\n    0: 16\n  STAT: 1\n', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
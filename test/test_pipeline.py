@@ -0,0 +1,77 @@
+# test/test_pipeline.py
+
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.pipeline import PipelineModel
+
+# addq的结果非零(ZF=0): je不跳转（预测错误），jne跳转
+PROGRAM = assemble("""
+    irmovq $0x100, %rsp
+    irmovq $8, %rbx
+    mrmovq 0(%rbx), %rax
+    addq %rax, %rcx         # 加载/使用冒险
+    popq %rdx
+    rrmovq %rdx, %rsi       # 加载/使用冒险
+    je skip                 # 预测错误
+    jne next                # 预测正确
+next:
+    call f
+    halt
+f:
+    ret
+skip:
+    halt
+""")
+
+
+def run(engine):
+    cpu = Y86CPU()
+    cpu.load_program(PROGRAM)
+    state, steps = cpu.run(engine=engine)
+    return cpu, state, steps
+
+
+class TestPipeline(unittest.TestCase):
+    def test_same_state_as_sequential(self):
+        _, expected, expected_steps = run('interp')
+        _, state, steps = run('pipe')
+        self.assertEqual(state, expected)
+        self.assertEqual(steps, expected_steps)
+
+    def test_decode_stats(self):
+        """每条指令只查找一次解码缓存，统计与解释执行相同"""
+        expected, _, _ = run('interp')
+        cpu, _, _ = run('pipe')
+        self.assertEqual(cpu.get_decode_stats(), expected.get_decode_stats())
+        stats = cpu.get_decode_stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 11)
+
+    def test_hazard_counts(self):
+        cpu, _, _ = run('pipe')
+        stats = cpu.pipeline.get_stats()
+        self.assertEqual(stats['instructions'], 11)
+        self.assertEqual(stats['bubbles'], {'load_use': 2, 'mispredict': 2, 'ret': 3})
+        self.assertEqual(stats['cycles'], 11 + 7 + 4)
+        self.assertAlmostEqual(stats['cpi'], 18 / 11)
+        self.assertEqual(stats['classes']['mrmovq']['load_use'], 1)
+        self.assertEqual(stats['classes']['popq']['load_use'], 1)
+        self.assertEqual(stats['classes']['jXX'], {'count': 2, 'load_use': 0,
+                                                   'mispredict': 2, 'ret': 0})
+
+        # 重新加载后统计清零
+        cpu.rewind()
+        self.assertEqual(cpu.pipeline.get_stats()['instructions'], 0)
+
+    def test_forwarding_without_stall(self):
+        model = PipelineModel()
+        model.feed(0x3, 0, 0xF, 0)   # irmovq -> %rax
+        model.feed(0x6, 0, 0, 1)     # addq %rax, %rcx: 转发，无气泡
+        model.feed(0x5, 0, 2, 4)     # mrmovq -> %rdx
+        model.feed(0x1, 0, 0xF, 0xF) # nop隔开
+        model.feed(0x6, 0, 2, 1)     # 使用%rdx: 已可转发
+        self.assertEqual(sum(model.get_stats()['bubbles'].values()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
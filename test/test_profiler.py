@@ -0,0 +1,114 @@
+# test/test_profiler.py
+
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.profiler import format_hot_spots
+
+# 0x00 main, 0x1d f, 0x2b g
+PROGRAM = assemble("""
+    irmovq $0x200, %rsp
+    call f
+    call f
+    halt
+f:
+    pushq %rax
+    call g
+    popq %rax
+    ret
+g:
+    rmmovq %rax, 0x100(%rsp)
+    mrmovq 0x100(%rsp), %rbx
+    ret
+""")
+
+
+def load():
+    cpu = Y86CPU()
+    cpu.load_program(PROGRAM)
+    return cpu
+
+
+class TestProfiler(unittest.TestCase):
+    def test_same_state_as_unprofiled(self):
+        expected, expected_steps = load().run()
+        cpu = load()
+        cpu.enable_profiling()
+        state, steps = cpu.run()
+        self.assertEqual(state, expected)
+        self.assertEqual(steps, expected_steps)
+
+    def test_step_matches_run(self):
+        cpu = load()
+        profiler = cpu.enable_profiling()
+        while cpu.step():
+            pass
+        stepped = profiler.to_dict()
+        cpu = load()
+        profiler = cpu.enable_profiling()
+        cpu.run()
+        profiled = profiler.to_dict()
+        for data in (stepped, profiled):
+            data.pop('time_ns')
+            for entry in data['pcs'] + data['opcodes']:
+                entry.pop('time_ns')
+        self.assertEqual(stepped, profiled)
+
+    def test_counts(self):
+        cpu = load()
+        profiler = cpu.enable_profiling()
+        cpu.run()
+        data = profiler.to_dict()
+        # main的3条指令与halt、2次f(各4条)、2次g(各3条)
+        self.assertEqual(data['instructions'], 3 + 8 + 6 + 1)
+        counts = {entry['pc']: entry['count'] for entry in data['pcs']}
+        self.assertEqual(counts[0x1d], 2)
+        self.assertEqual(counts[0x2b], 2)
+        opcodes = {entry['instruction']: entry['count'] for entry in data['opcodes']}
+        self.assertEqual(opcodes['call'], 4)
+        self.assertEqual(opcodes['ret'], 4)
+        # 读: popq、mrmovq、ret；写: pushq、rmmovq、call
+        self.assertEqual(data['memory'], {'reads': 2 + 2 + 4, 'writes': 2 + 2 + 4})
+
+    def test_call_graph(self):
+        cpu = load()
+        profiler = cpu.enable_profiling()
+        cpu.run()
+        data = profiler.to_dict()
+        self.assertEqual(data['calls'], [
+            {'caller': 0x0, 'callee': 0x1d, 'count': 2},
+            {'caller': 0x1d, 'callee': 0x2b, 'count': 2},
+        ])
+        self.assertEqual(data['functions'], [
+            {'entry': 0x0, 'instructions': 4},
+            {'entry': 0x1d, 'instructions': 8},
+            {'entry': 0x2b, 'instructions': 6},
+        ])
+
+    def test_hot_spots(self):
+        cpu = load()
+        profiler = cpu.enable_profiling()
+        cpu.run()
+        rows = profiler.hot_spots(limit=3)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([row['count'] for row in rows], [2, 2, 2])
+        self.assertEqual(rows[0]['pc'], 0x1d)
+        self.assertAlmostEqual(rows[0]['percent'], 100 * 2 / 18)
+        table = format_hot_spots(rows).splitlines()
+        self.assertEqual(len(table), 4)
+        self.assertIn('pushq', table[1])
+
+    def test_disable_and_rewind(self):
+        cpu = load()
+        profiler = cpu.enable_profiling()
+        cpu.run(max_steps=2)
+        self.assertEqual(profiler.instructions, 2)
+        cpu.rewind()
+        self.assertEqual(profiler.instructions, 0)
+        self.assertIs(cpu.disable_profiling(), profiler)
+        cpu.run()
+        self.assertEqual(profiler.instructions, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# test/test_results.py
+
+import os
+import tempfile
+import time
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.output import dump_yaml_output
+from src.results import ResultCache, result_key
+
+PROGRAM = assemble("irmovq $5, %rax\nrmmovq %rax, 0x40(%rax)\nhalt\n")
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_program(self):
+        cpu = Y86CPU()
+        cpu.load_program(PROGRAM)
+        return cpu.run()
+
+    def test_round_trip(self):
+        state, steps = self.run_program()
+        key = result_key(PROGRAM)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, state, steps, dump_yaml_output(state))
+
+        entry = self.cache.get(key)
+        self.assertEqual(entry['steps'], steps)
+        self.assertEqual(entry['yaml'], dump_yaml_output(state))
+        self.assertEqual(entry['state']['registers'], state['registers'])
+        self.assertEqual(self.cache.get_stats()['hits'], 1)
+
+    def test_key(self):
+        other = assemble("irmovq $6, %rax\nhalt\n")
+        self.assertEqual(result_key(PROGRAM), result_key(assemble("irmovq $5, %rax\n"
+                                                                  "rmmovq %rax, 0x40(%rax)\n"
+                                                                  "halt\n")))
+        self.assertNotEqual(result_key(PROGRAM), result_key(other))
+        self.assertNotEqual(result_key(PROGRAM), result_key(PROGRAM, max_steps=1))
+
+    def test_traces_are_merged(self):
+        state, steps = self.run_program()
+        key = result_key(PROGRAM)
+        self.cache.put(key, state, steps, '', 'full', {'states': [1]})
+        self.cache.put(key, state, steps, '', 'delta', {'states': [2]})
+        self.assertEqual(self.cache.get(key)['traces'],
+                         {'full': {'states': [1]}, 'delta': {'states': [2]}})
+
+    def test_lru_eviction(self):
+        state, steps = self.run_program()
+        keys = ['a' * 64, 'b' * 64, 'c' * 64]
+        for index, key in enumerate(keys[:2]):
+            self.cache.put(key, state, steps, 'x')
+            os.utime(self.cache.path_for(key), (index, index))
+        self.cache.get(keys[0])  # keys[0]成为最近使用
+
+        size = os.path.getsize(self.cache.path_for(keys[0]))
+        self.cache.max_bytes = size * 2
+        time.sleep(0.01)
+        self.cache.put(keys[2], state, steps, 'x')
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# test/test_sessions.py
+
+import threading
+import unittest
+from src.sessions import SimulatorPool
+from src.utils import SessionError
+
+
+class FakeSimulator:
+    def __init__(self):
+        self.size = 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSimulatorPool(unittest.TestCase):
+    def make_pool(self, **kwargs):
+        self.clock = FakeClock()
+        return SimulatorPool(FakeSimulator, clock=self.clock,
+                             sizeof=lambda simulator: simulator.size, **kwargs)
+
+    def open(self, pool):
+        with pool.create() as simulator:
+            pass
+        return next(reversed(pool.entries)), simulator
+
+    def test_sessions_are_isolated(self):
+        pool = self.make_pool()
+        first, a = self.open(pool)
+        second, b = self.open(pool)
+        self.assertIsNot(a, b)
+        with pool.session(first) as simulator:
+            self.assertIs(simulator, a)
+        with self.assertRaises(SessionError):
+            pool.session('missing')
+
+    def test_ttl(self):
+        pool = self.make_pool(ttl=60)
+        session_id, _ = self.open(pool)
+        self.clock.now = 61
+        with self.assertRaises(SessionError):
+            pool.session(session_id)
+        self.assertEqual(pool.get_stats()['evictions'], 1)
+
+    def test_lru_and_memory_budget(self):
+        pool = self.make_pool(max_sessions=2, memory_budget=100)
+        first, _ = self.open(pool)
+        second, _ = self.open(pool)
+        with pool.session(first):
+            pass  # first成为最近使用
+        third, _ = self.open(pool)
+        self.assertNotIn(second, pool)
+        self.assertIn(first, pool)
+
+        # 超出内存预算时淘汰最久未使用的会话
+        with pool.session(third) as simulator:
+            simulator.size = 150
+        self.assertNotIn(first, pool)
+        self.assertEqual(len(pool), 0)
+
+    def test_active_sessions_are_not_evicted(self):
+        pool = self.make_pool(max_sessions=1, ttl=10)
+        lease = pool.create()
+        session_id = lease.session_id
+        self.clock.now = 100
+        self.open(pool)
+        self.assertIn(session_id, pool)
+        lease.close()
+        lease.close()
+        self.assertEqual(pool.get_stats()['active'], 0)
+
+    def test_per_session_lock(self):
+        pool = self.make_pool()
+        session_id, _ = self.open(pool)
+        order = []
+
+        def worker(name):
+            with pool.session(session_id):
+                order.append(name + '-in')
+                order.append(name + '-out')
+
+        with pool.session(session_id):
+            thread = threading.Thread(target=worker, args=('t',))
+            thread.start()
+            thread.join(0.05)
+            # 会话被占用时另一个线程等待
+            self.assertEqual(order, [])
+        thread.join()
+        self.assertEqual(order, ['t-in', 't-out'])
+
+    def test_sizeof_under_lock(self):
+        """归还时在持有会话锁的情况下估算大小"""
+        held = []
+        pool = SimulatorPool(FakeSimulator, clock=FakeClock(),
+                             sizeof=lambda simulator: held.append(entry.lock.locked()) or 10)
+        lease = pool.create()
+        entry = lease.entry
+        with lease:
+            pass
+        self.assertEqual(held, [True])
+        self.assertEqual(pool.get_stats()['memory'], 10)
+
+        # 没有获得锁的租用不估算大小
+        pool.session(entry.session_id).close()
+        self.assertEqual(held, [True])
+        self.assertEqual(pool.get_stats()['memory'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# test/test_stream.py
+
+import json
+import threading
+import unittest
+from src.cpu import Y86CPU
+from src.stream import iter_run_batches, to_ndjson, to_sse
+
+# 0x0: irmovq $1, %rax
+# 0xa: addq %rax, %rbx
+# 0xc: jmp 0xa
+LOOP = bytes.fromhex('30f00100000000000000' '6003' '700a00000000000000')
+
+# 0x0: irmovq $5, %rax; 0xa: nop; 0xb: halt
+SHORT = bytes.fromhex('30f00500000000000000' '10' '00')
+
+
+def load(program):
+    cpu = Y86CPU()
+    cpu.load_program(dict(enumerate(program)))
+    return cpu
+
+
+class TestStream(unittest.TestCase):
+    def test_batches_until_halt(self):
+        messages = list(iter_run_batches(load(SHORT), batch_steps=2, batch_interval=60))
+        self.assertEqual([m['type'] for m in messages], ['start', 'batch', 'batch', 'end'])
+        self.assertEqual([m['first'] for m in messages[1:3]], [0, 2])
+        self.assertEqual(messages[1]['deltas'][0]['registers'], {'rax': 5})
+        end = messages[-1]
+        self.assertEqual((end['reason'], end['steps']), ('halt', 2))
+        self.assertEqual(end['state']['status'], 'HLT')
+
+    def test_step_limit(self):
+        cpu = load(LOOP)
+        messages = list(iter_run_batches(cpu, max_steps=1001, batch_steps=100, batch_interval=60))
+        end = messages[-1]
+        self.assertEqual((end['reason'], end['steps']), ('limit', 1001))
+        self.assertEqual(sum(len(m['deltas']) for m in messages if m['type'] == 'batch'), 1001)
+        # 流式执行结束后不再监听内存写入
+        self.assertEqual(cpu.memory.observers, [cpu.decode_cache.invalidate])
+
+    def test_cancel(self):
+        cancelled = threading.Event()
+        stream = iter_run_batches(load(LOOP), max_steps=None, batch_steps=10,
+                                  batch_interval=60, cancelled=cancelled)
+        next(stream)
+        next(stream)
+        cancelled.set()
+        messages = list(stream)
+        self.assertEqual(messages[-1]['reason'], 'cancelled')
+        self.assertEqual(messages[-1]['steps'], 10)
+
+    def test_encoding(self):
+        messages = list(iter_run_batches(load(SHORT)))
+        lines = list(to_ndjson(messages))
+        self.assertEqual([json.loads(line) for line in lines], json.loads(json.dumps(messages)))
+        events = list(to_sse(messages))
+        self.assertTrue(events[0].startswith('event: start\ndata: {'))
+        self.assertTrue(events[-1].endswith('\n\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
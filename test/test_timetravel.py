@@ -0,0 +1,150 @@
+# test/test_timetravel.py
+
+import random
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.fuzz import generate_program, program_source
+from src.memory import Memory, SparseMemory
+from src.timetravel import History
+from src.utils import Y86Error
+
+# 循环中写内存、调用与压栈，最后改写自身代码
+PROGRAM = """
+    irmovq stack, %rsp
+    irmovq data, %rbx
+    irmovq $5, %rcx
+    irmovq $1, %rsi
+loop:
+    rmmovq %rcx, 0(%rbx)
+    call inc
+    pushq %rcx
+    popq %rdx
+    subq %rsi, %rcx
+    jne loop
+    irmovq $0x10, %rax
+    rmmovq %rax, patch(%rcx)
+patch:
+    halt
+    halt
+inc:
+    mrmovq 0(%rbx), %rdi
+    addq %rsi, %rdi
+    rmmovq %rdi, 8(%rbx)
+    ret
+    .pos 0x200
+data:
+    .quad 0
+    .quad 0
+    .pos 0x300
+stack:
+"""
+
+
+def reference_states(image, memory_factory=Memory, max_steps=200):
+    """逐条执行，返回每一步之后的状态（下标0为初始状态）"""
+    cpu = Y86CPU(memory_factory)
+    cpu.load_program(image)
+    states = [cpu.get_state()]
+    while cpu.status == 'AOK' and len(states) <= max_steps:
+        cpu.step()
+        states.append(cpu.get_state())
+    return states
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.image = assemble(PROGRAM)
+        self.states = reference_states(self.image)
+        self.cpu = Y86CPU()
+        self.cpu.load_program(self.image)
+        self.history = History(self.cpu, interval=4)
+
+    def test_step_back(self):
+        """前进到程序结束，再逐步后退，每一步都与顺序执行的状态一致"""
+        while self.history.step():
+            pass
+        self.assertEqual(self.history.position, len(self.states) - 1)
+        self.assertFalse(self.history.step())
+        for index in range(len(self.states) - 1, 0, -1):
+            self.assertEqual(self.cpu.get_state(), self.states[index])
+            self.assertTrue(self.history.step_back())
+        self.assertEqual(self.cpu.get_state(), self.states[0])
+        self.assertFalse(self.history.step_back())
+
+    def test_decode_stats(self):
+        """每步只统计一次解码缓存的命中或未命中，与不记录历史时相同"""
+        while self.history.step():
+            pass
+        cpu = Y86CPU()
+        cpu.load_program(self.image)
+        while cpu.step():
+            pass
+        self.assertEqual(self.cpu.get_decode_stats(), cpu.get_decode_stats())
+        stats = self.cpu.get_decode_stats()
+        self.assertEqual(stats['hits'] + stats['misses'], len(self.states) - 1)
+
+    def test_goto(self):
+        end = len(self.states) - 1
+        self.assertEqual(self.history.goto(end), end)
+        rng = random.Random(0)
+        for step in [0, end, 1, end - 1, 9, 8, 3] + [rng.randint(0, end) for _ in range(30)]:
+            self.assertEqual(self.history.goto(step), step)
+            self.assertEqual(self.cpu.get_state(), self.states[step])
+            # 跳转后仍可以继续单步执行
+            if step < end:
+                self.history.step()
+                self.assertEqual(self.cpu.get_state(), self.states[step + 1])
+
+    def test_goto_past_end(self):
+        """跳转到尚未执行的步会继续执行，程序停止时停在最后一步"""
+        end = len(self.states) - 1
+        self.assertEqual(self.history.goto(7), 7)
+        self.assertEqual(self.history.goto(end + 100), end)
+        self.assertEqual(self.cpu.status, 'HLT')
+        self.assertEqual(self.history.instruction_count(), end - 1)
+        with self.assertRaises(Y86Error):
+            self.history.goto(-1)
+
+    def test_seek_cost(self):
+        """从关键帧重新执行，跳转的步数不超过关键帧间隔"""
+        end = self.history.goto(len(self.states))
+        executed = []
+        step = self.history.step
+        self.history.step = lambda: executed.append(1) or step()
+        self.history.goto(10)
+        self.assertLessEqual(len(executed), self.history.interval)
+        self.assertEqual(self.history.end, end)
+
+    def test_origin(self):
+        """历史可以从任意一步开始，之前的步不可回退"""
+        self.cpu.run(6)
+        history = History(self.cpu, interval=4, origin=6)
+        history.goto(12)
+        self.assertEqual(self.cpu.get_state(), self.states[12])
+        self.assertEqual(history.goto(6), 6)
+        self.assertEqual(self.cpu.get_state(), self.states[6])
+        self.assertFalse(history.step_back())
+        with self.assertRaises(Y86Error):
+            history.goto(5)
+
+    def test_random_programs(self):
+        """随机程序（含越界访存与出错）在两种内存实现上都能准确回退"""
+        for seed in range(20):
+            rng = random.Random(seed)
+            image = assemble(program_source(generate_program(rng, 24)))
+            for memory_factory in (Memory, SparseMemory):
+                states = reference_states(image, memory_factory)
+                cpu = Y86CPU(memory_factory)
+                cpu.load_program(image)
+                history = History(cpu, interval=8)
+                history.goto(len(states) - 1)
+                indices = list(range(len(states)))
+                rng.shuffle(indices)
+                for index in indices:
+                    self.assertEqual(history.goto(index), index)
+                    self.assertEqual(cpu.get_state(), states[index], (seed, index))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# test/test_trace.py
+
+import json
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.trace import DeltaTrace
+
+
+# 0x0: irmovq $0x100, %rsp
+# 0xa: irmovq $5, %rax
+# 0x14: pushq %rax
+# 0x16: rmmovq %rax, 0x20(%rsp)
+# 0x20: popq %rbx
+# 0x22: halt
+PROGRAM = bytes.fromhex(
+    '30f40001000000000000'
+    '30f00500000000000000'
+    'a00f'
+    '40042000000000000000'
+    'b03f'
+    '00'
+)
+
+
+class TestDeltaTrace(unittest.TestCase):
+    def setUp(self):
+        self.cpu = Y86CPU()
+        self.cpu.load_program(dict(enumerate(PROGRAM)))
+
+    def test_reconstruct_matches_full_states(self):
+        """重建的每一步状态应与get_state完全一致"""
+        trace = DeltaTrace(self.cpu)
+        full_states = [self.cpu.get_state()]
+        while True:
+            success = self.cpu.step()
+            trace.record()
+            full_states.append(self.cpu.get_state())
+            if not success:
+                break
+
+        self.assertEqual(len(trace), len(full_states))
+        for index, state in enumerate(full_states):
+            self.assertEqual(trace.state_at(index), state)
+        self.assertEqual(trace.state_at(-1), full_states[-1])
+
+    def test_from_states(self):
+        """由完整状态生成的增量轨迹经过JSON往返后能重建出同样的状态"""
+        # 第二次写入把中间的字节清零
+        self.cpu.load_program(assemble("""
+            irmovq $-1, %rax
+            rmmovq %rax, 0x100(%rcx)
+            irmovq $0xff0000ff, %rbx
+            rmmovq %rbx, 0x100(%rcx)
+            halt
+        """))
+        full_states = [self.cpu.get_state()]
+        while self.cpu.step():
+            full_states.append(self.cpu.get_state())
+        full_states.append(self.cpu.get_state())
+
+        trace = DeltaTrace.from_states(full_states)
+        self.assertEqual(trace.deltas[3]['memory'], [[0x101, 2, 0], [0x104, 4, 0]])
+        restored = DeltaTrace.from_dict(json.loads(json.dumps(trace.to_dict())))
+        self.assertEqual(list(restored.states()), full_states)
+        self.assertEqual(restored.state_at(2), full_states[2])
+
+    def test_deltas_only_hold_changes(self):
+        """每步只记录发生变化的部分"""
+        for _ in range(3):
+            self.cpu.step()
+
+        trace = DeltaTrace(self.cpu)
+        self.cpu.step()  # rmmovq
+        delta = trace.record()
+        self.assertNotIn('registers', delta)
+        self.assertEqual(delta['memory'], [[0x118, 8, 5]])
+        trace.close()
+        self.assertEqual(self.cpu.memory.observers, [self.cpu.decode_cache.invalidate])
+
+
+if __name__ == '__main__':
+    unittest.main()
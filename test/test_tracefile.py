@@ -0,0 +1,139 @@
+# test/test_tracefile.py
+
+import os
+import random
+import tempfile
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.fuzz import generate_program, program_source
+from src.tracefile import (TraceReader, TraceWriter, record_trace, COMPRESSIONS, RECORD_SIZE,
+                           lzma)
+from src.utils import ParseError, Y86Error
+
+# 包含内存写入、调用、出栈（同时改变两个寄存器）与负数
+PROGRAM = """
+    irmovq stack, %rsp
+    irmovq $-3, %rcx
+    irmovq $1, %rsi
+loop:
+    pushq %rcx
+    call f
+    popq %rdx
+    addq %rsi, %rcx
+    jne loop
+    halt
+f:
+    rmmovq %rcx, data(%rsi)
+    ret
+    .pos 0x200
+data:
+    .quad 0
+    .quad 0
+    .pos 0x300
+stack:
+"""
+
+
+def reference_states(image, max_steps=500):
+    cpu = Y86CPU()
+    cpu.load_program(image)
+    states = [cpu.get_state()]
+    while cpu.status == 'AOK' and len(states) <= max_steps:
+        cpu.step()
+        states.append(cpu.get_state())
+    return states
+
+
+class TestTraceFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'run.y86t')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def record(self, image, compression='zlib', block_steps=4, max_steps=500):
+        cpu = Y86CPU()
+        cpu.load_program(image)
+        return record_trace(cpu, self.path, max_steps, compression, block_steps)
+
+    def test_replay(self):
+        """各种压缩方式下，任意一步重建的状态都与逐条执行一致"""
+        image = assemble(PROGRAM)
+        states = reference_states(image)
+        for compression in COMPRESSIONS:
+            if compression == 'lzma' and lzma is None:
+                continue
+            final, steps = self.record(image, compression)
+            self.assertEqual(final, states[-1])
+            self.assertEqual(steps, len(states) - 2)
+            with TraceReader(self.path) as reader:
+                self.assertEqual(reader.compression, compression)
+                self.assertEqual(len(reader), len(states) - 1)
+                for step in range(len(states)):
+                    self.assertEqual(reader.state_at(step), states[step])
+                    expected = {key: states[step][key]
+                                for key in ('registers', 'flags', 'pc', 'status')}
+                    self.assertEqual(reader.registers_at(step), expected)
+
+    def test_records(self):
+        image = assemble(PROGRAM)
+        self.record(image)
+        with TraceReader(self.path) as reader:
+            first = reader.record(0)
+            self.assertEqual((first['icode'], first['register'], first['value']),
+                             (3, 'rsp', 0x300))
+            push = reader.record(3)
+            self.assertEqual((push['icode'], push['memory']), (0xA, [0x2f8, (1 << 64) - 3]))
+            self.assertEqual(reader.record(len(reader) - 1)['status'], 'HLT')
+            self.assertEqual(len(list(reader.records(2, 9))), 7)
+            self.assertEqual(len(list(reader.records(len(reader) - 2, 10 ** 6))), 2)
+            with self.assertRaises(Y86Error):
+                reader.record(len(reader))
+            with self.assertRaises(Y86Error):
+                reader.state_at(len(reader) + 1)
+
+    def test_random_programs(self):
+        """随机程序（含出错与改写代码）的轨迹可以准确重放"""
+        for seed in range(20):
+            image = assemble(program_source(generate_program(random.Random(seed), 24)))
+            states = reference_states(image, 200)
+            self.record(image, block_steps=16, max_steps=200)
+            with TraceReader(self.path) as reader:
+                for step in (0, len(states) // 2, len(states) - 1):
+                    self.assertEqual(reader.state_at(step), states[step], (seed, step))
+
+    def test_fixed_size_records(self):
+        image = assemble(PROGRAM)
+        _, steps = self.record(image, 'none', block_steps=1000)
+        with TraceReader(self.path) as reader:
+            self.assertEqual(reader.index[0][1], len(reader) * RECORD_SIZE)
+
+    def test_empty_trace(self):
+        cpu = Y86CPU()
+        cpu.load_program(assemble("halt\n"))
+        cpu.step()
+        with TraceWriter(self.path, cpu):
+            pass
+        with TraceReader(self.path) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertEqual(reader.state_at(0), cpu.get_state())
+
+    def test_malformed(self):
+        self.record(assemble(PROGRAM))
+        with open(self.path, 'rb') as file:
+            blob = file.read()
+        for bad in (b'', blob[:10], blob[:-4], b'XXXX' + blob[4:]):
+            with open(self.path, 'wb') as file:
+                file.write(bad)
+            with self.assertRaises(ParseError):
+                TraceReader(self.path)
+
+        cpu = Y86CPU()
+        with self.assertRaises(Y86Error):
+            TraceWriter(self.path, cpu, compression='bz2')
+
+
+if __name__ == '__main__':
+    unittest.main()
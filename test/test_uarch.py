@@ -0,0 +1,211 @@
+# test/test_uarch.py
+
+import os
+import random
+import tempfile
+import unittest
+from src.assembler import assemble
+from src.cpu import Y86CPU
+from src.fuzz import generate_program, program_source
+from src.tracefile import record_trace
+from src.uarch import (BranchPredictor, Cache, DataCache, Microarchitecture, StaticPredictor,
+                       OneBitPredictor, TwoBitPredictor, parse_machine, replay_trace, sweep)
+from src.utils import Y86Error
+
+# jne执行4次，前3次跳转
+LOOP = """
+    irmovq $4, %rcx
+    irmovq $1, %rsi
+loop:
+    subq %rsi, %rcx
+    jne loop
+    halt
+"""
+
+# 对同一数组读两遍，第二遍全部命中
+ARRAY = """
+    irmovq data, %rbx
+    irmovq $2, %rdi
+    irmovq $1, %rsi
+outer:
+    mrmovq 0(%rbx), %rax
+    mrmovq 64(%rbx), %rax
+    mrmovq 128(%rbx), %rax
+    rmmovq %rax, 192(%rbx)
+    subq %rsi, %rdi
+    jne outer
+    halt
+    .pos 0x400
+data:
+    .quad 1
+"""
+
+SPECS = ('predictor=taken,icache=256:2:16,dcache=256:2:64',
+         'predictor=2bit:4,dcache=128:1:64:5',
+         'predictor=btfn', 'predictor=1bit:8,icache=64:1:8')
+
+
+def run(source, uarch, max_steps=None):
+    cpu = Y86CPU()
+    cpu.load_program(assemble(source))
+    cpu.attach_uarch(uarch)
+    return cpu.run(max_steps)
+
+
+class TestPredictors(unittest.TestCase):
+    def test_loop(self):
+        expected = {'taken': 1, 'not-taken': 3, 'btfn': 1}
+        for policy, mispredictions in expected.items():
+            predictor = StaticPredictor(policy)
+            run(LOOP, Microarchitecture([predictor]))
+            self.assertEqual((predictor.branches, predictor.mispredictions),
+                             (4, mispredictions), policy)
+        for cls in (OneBitPredictor, TwoBitPredictor):
+            predictor = cls()
+            uarch = Microarchitecture([predictor])
+            run(LOOP, uarch)
+            self.assertEqual(predictor.mispredictions, 1)
+            stats = uarch.get_stats()
+            self.assertEqual(stats['instructions'], 11)
+            self.assertEqual(stats['cycles'], 11 + 2)
+
+    def test_two_bit_hysteresis(self):
+        """交替的跳转结果: 1位预测全错，2位计数器保持在跳转一侧"""
+        one, two = OneBitPredictor(4), TwoBitPredictor(4)
+        for taken in (True, False) * 4:
+            for predictor in (one, two):
+                predictor.branch(0x10, 4, 0x0, taken)
+        self.assertEqual(one.mispredictions, 7)
+        self.assertEqual(two.mispredictions, 4)
+
+    def test_invalid(self):
+        for bad in (lambda: StaticPredictor('maybe'), lambda: OneBitPredictor(3),
+                    lambda: TwoBitPredictor(0)):
+            with self.assertRaises(Y86Error):
+                bad()
+        # 基类没有预测策略
+        with self.assertRaises(TypeError):
+            BranchPredictor()
+
+
+class TestCache(unittest.TestCase):
+    def test_lru(self):
+        cache = Cache(size=128, ways=2, line_size=32)  # 2组
+        self.assertEqual(cache.sets, 2)
+        for addr in (0x00, 0x40, 0x00, 0x80, 0x00, 0x40):
+            cache.lookup(addr, 8)
+        # 0x80替换了最久未用的0x40，再访问0x40时替换0x80
+        self.assertEqual((cache.accesses, cache.misses, cache.evictions), (6, 4, 2))
+
+    def test_crossing_lines(self):
+        cache = Cache(size=64, ways=1, line_size=16)
+        self.assertEqual(cache.lookup(0x0c, 8), 2)
+        self.assertEqual(cache.lookup(0x10, 8), 0)
+        self.assertEqual(cache.accesses, 3)
+        cache.flush()
+        self.assertEqual(cache.lookup(0x10, 8), 1)
+        self.assertEqual(cache.misses, 3)
+
+    def test_program(self):
+        dcache = DataCache(size=1024, ways=2, line_size=64)
+        uarch = Microarchitecture([dcache])
+        run(ARRAY, uarch)
+        stats = dcache.get_stats()
+        # 第一遍4个缓存行各未命中一次
+        self.assertEqual((stats['accesses'], stats['misses']), (8, 4))
+        self.assertEqual((stats['writes'], stats['write_misses']), (2, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertEqual(uarch.cycles(), uarch.instructions + 4 * dcache.miss_penalty)
+
+    def test_invalid(self):
+        for args in ((1000, 2, 64), (4096, 2, 48), (192, 1, 64), (0, 1, 64)):
+            with self.assertRaises(Y86Error):
+                Cache(*args)
+
+
+class TestMicroarchitecture(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_dispatch(self):
+        """只把事件分发给覆盖了对应方法的模型"""
+        uarch = parse_machine('predictor=2bit,icache=1024:2:64')
+        self.assertFalse(uarch.needs_access)
+        self.assertTrue(parse_machine('dcache=1024').needs_access)
+        self.assertEqual(parse_machine('').models, [])
+
+    def test_state_unchanged(self):
+        """挂载模型不改变执行结果；reset与rewind清空统计"""
+        for seed in range(10):
+            image = assemble(program_source(generate_program(random.Random(seed), 24)))
+            plain = Y86CPU()
+            plain.load_program(image)
+            expected = plain.run(200)
+            cpu = Y86CPU()
+            cpu.load_program(image)
+            uarch = cpu.attach_uarch(parse_machine(SPECS[0]))
+            self.assertEqual(cpu.run(200), expected, seed)
+        cpu.rewind()
+        self.assertEqual(uarch.instructions, 0)
+        self.assertIs(cpu.detach_uarch(), uarch)
+        self.assertIsNone(cpu.uarch)
+
+    def test_profiling_conflict(self):
+        cpu = Y86CPU()
+        cpu.attach_uarch(Microarchitecture())
+        with self.assertRaises(Y86Error):
+            cpu.enable_profiling()
+        cpu.detach_uarch()
+        cpu.enable_profiling()
+        with self.assertRaises(Y86Error):
+            cpu.attach_uarch(Microarchitecture())
+
+    def test_replay_matches_live(self):
+        """在轨迹上重放的统计与挂在CPU上执行时完全一致（含出错的随机程序）"""
+        path = os.path.join(self.tmpdir.name, 'run.y86t')
+        sources = [LOOP, ARRAY] + [program_source(generate_program(random.Random(seed), 24))
+                                   for seed in range(20)]
+        for source in sources:
+            live = []
+            for spec in SPECS:
+                uarch = parse_machine(spec)
+                run(source, uarch, 300)
+                live.append(uarch.get_stats())
+            cpu = Y86CPU()
+            cpu.load_program(assemble(source))
+            record_trace(cpu, path, 300, block_steps=16)
+            machines = [parse_machine(spec) for spec in SPECS]
+            replay_trace(path, machines)
+            self.assertEqual([machine.get_stats() for machine in machines], live, source)
+
+    def test_sweep(self):
+        for name, source in (('loop.y86t', LOOP), ('array.y86t', ARRAY)):
+            cpu = Y86CPU()
+            cpu.load_program(assemble(source))
+            record_trace(cpu, os.path.join(self.tmpdir.name, name))
+        with open(os.path.join(self.tmpdir.name, 'bad.y86t'), 'wb') as file:
+            file.write(b'not a trace')
+
+        machines, errors = sweep([self.tmpdir.name], ['predictor=not-taken', 'dcache=1024'])
+        self.assertEqual(len(errors), 1)
+        predictor = machines[0].models[0]
+        # loop中的jne与array中的jne各有3次与1次跳转
+        self.assertEqual((predictor.branches, predictor.mispredictions), (6, 4))
+        self.assertEqual(machines[1].models[0].misses, 4)
+        self.assertEqual(machines[0].instructions, 11 + 16)
+
+        with self.assertRaises(Y86Error):
+            sweep([self.tmpdir.name], ['l2cache=1024'])
+
+    def test_parse_errors(self):
+        for spec in ('predictor=3bit', 'predictor=taken:4', 'dcache=1024:2:64:10:1',
+                     'dcache=big', 'predictor=1bit,predictor=2bit', 'l2=1'):
+            with self.assertRaises(Y86Error):
+                parse_machine(spec)
+
+
+if __name__ == '__main__':
+    unittest.main()